@@ -1,6 +1,7 @@
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import tempfile
 
 load_dotenv()
 
@@ -13,7 +14,8 @@ DEBUG = os.getenv('DEBUG', 'False') == 'True'
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '').split(',')
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # No autodiscovery at startup: core.urls loads the admin modules when /admin/ is first hit
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -25,12 +27,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Request id for log correlation, and one access log record per request
+    'organizations.logs.RequestIdMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Staff-only, on request; see organizations.profiling
+    'organizations.profiling.ProfilingMiddleware',
+    # Repeated (N+1) query detection; see QUERY_PATTERN_MODE
+    'organizations.querypatterns.QueryPatternMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,9 +71,28 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '3306'),
+        # Keep connections open between requests, so serverless instances reuse them while warm
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Process-local by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# cache (e.g. django.core.cache.backends.redis.RedisCache) in production
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'cpms'),
+    }
+}
+
+# Sessions are read from the cache and written through to the database, so a
+# cache miss (cold instance, eviction) falls back to the sessions table
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Seconds a user's check_auth payload is cached; membership changes invalidate it
+CHECK_AUTH_CACHE_SECONDS = int(os.getenv('CHECK_AUTH_CACHE_SECONDS', '300'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -125,8 +152,81 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-match',
+    'idempotency-key',
+    'x-profile',
+    'x-request-id',
+]
+
+CORS_EXPOSE_HEADERS = [
+    'x-sync-cursor',
+    'etag',
+    'idempotent-replayed',
+    'x-profile-id',
+    'x-request-id',
+]
+
+# Days deletion tombstones are kept for delta-sync clients
+TOMBSTONE_RETENTION_DAYS = int(os.getenv('TOMBSTONE_RETENTION_DAYS', '90'))
+
+# Hours a stored Idempotency-Key response is replayed; `manage.py purge_idempotency_keys` removes older ones
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
+# Seconds a process keeps its costing rate history without checking for changes made elsewhere
+COSTING_RATES_CACHE_SECONDS = int(os.getenv('COSTING_RATES_CACHE_SECONDS', '300'))
+
+# Staff request profiling (X-Profile: 1), off unless enabled; profiles are kept on
+# local disk, newest PROFILE_STORE_MAX only
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILE_STORE_DIR = os.getenv('PROFILE_STORE_DIR', os.path.join(tempfile.gettempdir(), 'cpms-profiles'))
+PROFILE_STORE_MAX = int(os.getenv('PROFILE_STORE_MAX', '50'))
+
+# Repeated-query detection: 'warn' logs requests running one statement more than
+# QUERY_PATTERN_THRESHOLD times (staging), 'strict' raises so tests fail, 'off' disables it
+QUERY_PATTERN_MODE = os.getenv('QUERY_PATTERN_MODE', 'off')
+QUERY_PATTERN_THRESHOLD = int(os.getenv('QUERY_PATTERN_THRESHOLD', '5'))
+QUERY_PATTERN_IGNORE = [
+    r'^(RELEASE |ROLLBACK TO )?SAVEPOINT ',
 ]
 
+# Time-to-first-response budget for a cold process, checked by `manage.py profile_startup`
+COLD_START_BUDGET_MS = float(os.getenv('COLD_START_BUDGET_MS', '1500'))
+
+# JSON log lines on stdout, written by a background thread (see organizations.logs)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# Share of the records below WARNING that are kept
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {'()': 'organizations.logs.RequestIdFilter'},
+        'sampling': {'()': 'organizations.logs.SamplingFilter'},
+    },
+    'handlers': {
+        'queue': {
+            '()': 'organizations.logs.QueueHandler',
+            'filters': ['request_id', 'sampling'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': LOG_LEVEL,
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        # Requests are already logged once by RequestIdMiddleware
+        'django.server': {
+            'level': 'WARNING',
+        },
+    },
+}
+
 # Cookie settings
 CSRF_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -144,4 +244,15 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'organizations.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'organizations.renderers.MessagePackParser',
+    ],
 }
\ No newline at end of file
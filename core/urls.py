@@ -1,16 +1,33 @@
 from django.contrib import admin
-from django.urls import path, include
-from django.views.decorators.csrf import ensure_csrf_cookie
-from django.views.generic import TemplateView
+from django.urls import path, re_path, include
+from django.urls.resolvers import URLResolver, RoutePattern
+from django.utils.functional import cached_property
+from .views import spa_shell, static_asset
+
+
+class LazyAdminURLConf:
+    """
+    Admin URLconf that imports the apps' admin modules on first use (an
+    /admin/ request or the first reverse()). The admin app is installed as
+    SimpleAdminConfig, so API cold starts skip registering every ModelAdmin.
+    """
+
+    @cached_property
+    def urlpatterns(self):
+        admin.autodiscover()
+        return admin.site.get_urls()
+
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # Built by hand because include() would read the patterns straight away
+    URLResolver(RoutePattern('admin/'), LazyAdminURLConf(), app_name='admin', namespace=admin.site.name),
     path('api/', include('organizations.urls')),
+    re_path(r'^static/(?P<path>.+)$', static_asset, name='static-asset'),
     # Serve the frontend for all routes
-    path('', ensure_csrf_cookie(TemplateView.as_view(template_name='index.html'))),
-    path('login/', ensure_csrf_cookie(TemplateView.as_view(template_name='index.html'))),
-    path('dashboard/', ensure_csrf_cookie(TemplateView.as_view(template_name='index.html'))),
-    path('planning/', ensure_csrf_cookie(TemplateView.as_view(template_name='index.html'))),
+    path('', spa_shell),
+    path('login/', spa_shell),
+    path('dashboard/', spa_shell),
+    path('planning/', spa_shell),
     # Catch all other routes and serve the frontend
-    path('<path:path>', ensure_csrf_cookie(TemplateView.as_view(template_name='index.html'))),
+    path('<path:path>', spa_shell),
 ]
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+Frontend shell and static asset views.
+
+The SPA shell (templates/index.html) has no per-request content, so it is
+rendered once and kept in memory. Each request only sets the CSRF cookie
+and answers If-None-Match with 304.
+
+Static files are served from STATIC_ROOT, preferring the .br/.gz variants
+written by `manage.py compress_static`. Content-hashed build assets never
+change under the same name, so they are cached as immutable for a year.
+
+Only the shell is gzipped on the fly. API responses are not compressed:
+they carry user data next to attacker-influenced input, which would expose
+them to BREACH-style compression side channels.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+
+# Vite build output (assets/name-<hash>.js) and ManifestStaticFilesStorage names (name.<md5 prefix>.js)
+HASHED_ASSET_RE = re.compile(r'(^|/)assets/.+-[\w-]{8}\.\w+$|\.[0-9a-f]{12}\.\w+$')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_MAX_AGE = 60 * 60
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+_shell = None
+
+
+def accepted_encodings(header):
+    """Content-codings from an Accept-Encoding header mapped to their q-values"""
+    encodings = {}
+    for item in header.split(','):
+        token, *params = [part.strip() for part in item.split(';')]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        encodings[token.lower()] = q
+    return encodings
+
+
+def _encoding_order(header):
+    """ENCODINGS the client accepts (q > 0), most preferred first"""
+    accepted = accepted_encodings(header)
+    default = accepted.get('*', 0.0)
+    candidates = [
+        (accepted.get(name, default), -index, name, suffix)
+        for index, (name, suffix) in enumerate(ENCODINGS)
+    ]
+    return [(name, suffix) for q, _, name, suffix in sorted(candidates, reverse=True) if q > 0]
+
+
+def _render_shell():
+    global _shell
+    # Re-render in development so template edits show up
+    if _shell is None or settings.DEBUG:
+        content = render_to_string('index.html')
+        _shell = (content, quote_etag(hashlib.md5(content.encode()).hexdigest()))
+    return _shell
+
+
+@require_safe
+@gzip_page
+@ensure_csrf_cookie
+def spa_shell(request, path=None):
+    content, etag = _render_shell()
+    response = get_conditional_response(request, etag=etag) or HttpResponse(content)
+    response['ETag'] = etag
+    # Always revalidate: the shell changes whenever the frontend is rebuilt
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_safe
+def static_asset(request, path):
+    root = os.path.realpath(settings.STATIC_ROOT)
+    full_path = os.path.realpath(os.path.join(root, path))
+    if not full_path.startswith(root + os.sep) or not os.path.isfile(full_path):
+        raise Http404('Static file not found')
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    served_path, encoding = full_path, None
+    for name, suffix in _encoding_order(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        if os.path.isfile(full_path + suffix):
+            served_path, encoding = full_path + suffix, name
+            break
+
+    response = FileResponse(open(served_path, 'rb'), content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if HASHED_ASSET_RE.search(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=STATIC_MAX_AGE)
+    return response
@@ -0,0 +1,32 @@
+"""
+WSGI entry point.
+
+On serverless deployments every cold start imports this module before the
+first request. `warm_up()` does the per-process work the first request
+would otherwise pay for: loading the URLconf (and with it the API views and
+serializers) and opening the database connection, which CONN_MAX_AGE then
+keeps open across invocations of a warm instance.
+"""
+import os
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+application = get_wsgi_application()
+
+
+def warm_up():
+    from django.db import connections, DatabaseError
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            # The first request will retry and report the failure properly
+            pass
+
+
+if os.getenv('WARM_UP_ON_START', 'True') == 'True':
+    warm_up()
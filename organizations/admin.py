@@ -1,11 +1,127 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from django import forms
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from .models import (
     Organization, OrganizationUser, StrategicObjective, 
     Program, SubProgram, StrategicInitiative, PerformanceMeasure, MainActivity,
-    ActivityBudget, ActivityCostingAssumption
+    ActivityBudget, ActivityCostingAssumption, BudgetLineItem
 )
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses MySQL's table statistics instead of COUNT(*) for unfiltered
+    changelists of large tables. Filtered lists, small tables and other
+    databases still get an exact count.
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'mysql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                        [queryset.model._meta.db_table]
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] and row[0] > self.exact_count_threshold:
+                    return row[0]
+        return super().count
+
+class AutocompleteFilter(admin.ListFilter):
+    """
+    Sidebar filter on a foreign key that searches the related rows over AJAX
+    (the admin's autocomplete view) instead of listing every one of them.
+    Use autocomplete_filter('field') in list_filter.
+    """
+    template = 'admin/organizations/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.field = model._meta.get_field(self.field_name)
+        self.title = self.field.verbose_name
+        self.parameter_name = f'{self.field_name}__id__exact'
+        super().__init__(request, params, model, model_admin)
+        self.value = params.pop(self.parameter_name, None)
+        self.admin_site = model_admin.admin_site
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def queryset(self, request, queryset):
+        if self.value:
+            return queryset.filter(**{self.parameter_name: self.value})
+        return queryset
+
+    def choices(self, changelist):
+        # Consumed by the template: the query string to extend with the picked id
+        yield {
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'parameter_name': self.parameter_name,
+        }
+
+    def widget(self):
+        field = forms.ModelChoiceField(
+            queryset=self.field.related_model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(self.field, self.admin_site)
+        )
+        return field.widget.render(self.parameter_name, self.value, attrs={'id': f'filter_{self.parameter_name}'})
+
+def autocomplete_filter(field_name):
+    return type(f'{field_name.title()}AutocompleteFilter', (AutocompleteFilter,), {'field_name': field_name})
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Changelist defaults for tables that grow to hundreds of thousands of rows"""
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT(*) shown next to filtered results
+    show_full_result_count = False
+    list_per_page = 50
+    # Primary key order is index-backed and keeps autocomplete pages stable
+    ordering = ('-pk',)
+
+    @property
+    def media(self):
+        # Select2 assets for the autocomplete sidebar filters
+        media = super().media
+        if any(isinstance(f, type) and issubclass(f, AutocompleteFilter) for f in self.list_filter):
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
+
+class PaginatedTabularInline(admin.TabularInline):
+    """
+    Tabular inline showing one page of related rows at a time
+    (?<model name>_page=N) instead of all of them
+    """
+    template = 'admin/organizations/paginated_tabular.html'
+    per_page = 20
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset_class = super().get_formset(request, obj, **kwargs)
+        page_parameter = f'{self.model._meta.model_name}_page'
+        per_page = self.per_page
+
+        class PaginatedFormSet(formset_class):
+            def get_queryset(self):
+                if not hasattr(self, 'page'):
+                    paginator = Paginator(super().get_queryset(), per_page)
+                    self.page = paginator.get_page(request.GET.get(page_parameter))
+                    self.page_parameter = page_parameter
+                    self._queryset = list(self.page.object_list)
+                return self._queryset
+
+        return PaginatedFormSet
+
 class OrganizationAdminForm(forms.ModelForm):
     core_values_text = forms.CharField(
         widget=forms.Textarea(attrs={'rows': 5}),
@@ -38,6 +154,7 @@ class OrganizationAdminForm(forms.ModelForm):
 class OrganizationAdmin(admin.ModelAdmin):
     form = OrganizationAdminForm
     list_display = ('name', 'type', 'parent', 'created_at', 'updated_at')
+    list_select_related = ('parent',)
     list_filter = ('type',)
     search_fields = ('name',)
     ordering = ('type', 'name')
@@ -58,6 +175,7 @@ class OrganizationAdmin(admin.ModelAdmin):
 @admin.register(OrganizationUser)
 class OrganizationUserAdmin(admin.ModelAdmin):
     list_display = ('user', 'organization', 'role', 'created_at')
+    list_select_related = ('user', 'organization')
     list_filter = ('role', 'organization')
     search_fields = ('user__username', 'user__email', 'organization__name')
     ordering = ('organization', 'user')
@@ -68,39 +186,48 @@ class StrategicObjectiveAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description')
 
 @admin.register(Program)
-class ProgramAdmin(admin.ModelAdmin):
+class ProgramAdmin(ScalableAdmin):
     list_display = ('name', 'strategic_objective', 'weight', 'created_at', 'updated_at')
+    list_select_related = ('strategic_objective',)
     list_filter = ('strategic_objective',)
     search_fields = ('name', 'description')
+    autocomplete_fields = ('strategic_objective',)
 
 @admin.register(SubProgram)
-class SubProgramAdmin(admin.ModelAdmin):
+class SubProgramAdmin(ScalableAdmin):
     list_display = ('name', 'program', 'weight', 'created_at', 'updated_at')
-    list_filter = ('program',)
+    list_select_related = ('program',)
+    list_filter = (autocomplete_filter('program'),)
     search_fields = ('name', 'description')
+    autocomplete_fields = ('program',)
 
-class PerformanceMeasureInline(admin.TabularInline):
+class PerformanceMeasureInline(PaginatedTabularInline):
     model = PerformanceMeasure
     extra = 1
     fields = ('name', 'weight', 'baseline', 'q1_target', 'q2_target', 'q3_target', 'q4_target', 'annual_target')
 
-class MainActivityInline(admin.TabularInline):
+class MainActivityInline(PaginatedTabularInline):
     model = MainActivity
     extra = 1
     fields = ('name', 'weight', 'selected_months', 'selected_quarters')
 
 @admin.register(StrategicInitiative)
-class StrategicInitiativeAdmin(admin.ModelAdmin):
+class StrategicInitiativeAdmin(ScalableAdmin):
     list_display = ('name', 'strategic_objective', 'weight', 'created_at', 'updated_at')
-    list_filter = ('strategic_objective',)
+    list_select_related = ('strategic_objective',)
+    list_filter = (autocomplete_filter('strategic_objective'), 'fiscal_year')
     search_fields = ('name',)
+    autocomplete_fields = ('strategic_objective', 'program', 'subprogram')
+    raw_id_fields = ('rolled_over_from',)
     inlines = [PerformanceMeasureInline, MainActivityInline]
 
 @admin.register(PerformanceMeasure)
-class PerformanceMeasureAdmin(admin.ModelAdmin):
+class PerformanceMeasureAdmin(ScalableAdmin):
     list_display = ('name', 'initiative', 'weight', 'annual_target', 'created_at', 'updated_at')
-    list_filter = ('initiative',)
+    list_select_related = ('initiative',)
+    list_filter = (autocomplete_filter('initiative'),)
     search_fields = ('name',)
+    autocomplete_fields = ('initiative',)
     fieldsets = (
         (None, {
             'fields': ('initiative', 'name', 'weight', 'baseline')
@@ -111,10 +238,12 @@ class PerformanceMeasureAdmin(admin.ModelAdmin):
     )
 
 @admin.register(MainActivity)
-class MainActivityAdmin(admin.ModelAdmin):
+class MainActivityAdmin(ScalableAdmin):
     list_display = ('name', 'initiative', 'weight', 'created_at', 'updated_at')
-    list_filter = ('initiative',)
+    list_select_related = ('initiative',)
+    list_filter = (autocomplete_filter('initiative'),)
     search_fields = ('name',)
+    autocomplete_fields = ('initiative',)
     fieldsets = (
         (None, {
             'fields': ('initiative', 'name', 'weight')
@@ -125,8 +254,10 @@ class MainActivityAdmin(admin.ModelAdmin):
     )
 
 @admin.register(ActivityBudget)
-class ActivityBudgetAdmin(admin.ModelAdmin):
+class ActivityBudgetAdmin(ScalableAdmin):
     list_display = ('activity', 'budget_calculation_type', 'activity_type', 'created_at')
+    list_select_related = ('activity',)
+    autocomplete_fields = ('activity',)
     list_filter = ('budget_calculation_type', 'activity_type')
     search_fields = ('activity__name',)
     fieldsets = (
@@ -151,7 +282,22 @@ class ActivityBudgetAdmin(admin.ModelAdmin):
 
 @admin.register(ActivityCostingAssumption)
 class ActivityCostingAssumptionAdmin(admin.ModelAdmin):
-    list_display = ('activity_type', 'location', 'cost_type', 'amount', 'created_at')
+    list_display = ('activity_type', 'location', 'cost_type', 'amount', 'effective_from', 'created_at')
     list_filter = ('activity_type', 'location', 'cost_type')
     search_fields = ('description',)
-    ordering = ('activity_type', 'location', 'cost_type')
\ No newline at end of file
+    ordering = ('activity_type', 'location', 'cost_type', '-effective_from')
+    date_hierarchy = 'effective_from'
+
+    def has_delete_permission(self, request, obj=None):
+        # Rates in effect are kept, or the budgets costed with them would change
+        if obj is not None and obj.in_effect():
+            return False
+        return super().has_delete_permission(request, obj)
+
+@admin.register(BudgetLineItem)
+class BudgetLineItemAdmin(ScalableAdmin):
+    list_display = ('budget', 'cost_type', 'location', 'quantity', 'unit_rate', 'amount')
+    list_select_related = ('budget__activity',)
+    list_filter = ('cost_type', 'location')
+    search_fields = ('budget__activity__name', 'description')
+    raw_id_fields = ('budget',)
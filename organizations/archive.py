@@ -0,0 +1,165 @@
+"""
+Fiscal-year archival.
+
+Rows of a closed fiscal year (its plans with their reviews and revisions,
+and the initiatives dated to it with their measures, activities, budgets
+and line items) are moved from the hot tables into archive tables with the
+same columns and primary keys (see models.archive_model), so the hot tables
+and their indexes only hold the years being worked on.
+
+Rows move in batches; each batch is copied and deleted in one transaction,
+so an interrupted run can simply be started again. Archival goes from the
+leaves up and restore from the roots down, so every batch's foreign keys
+still resolve on the hot side.
+
+MySQL partitioning by fiscal year is not an option here: partitioned InnoDB
+tables cannot have foreign keys, and every unique key would have to include
+the fiscal year.
+"""
+from django.db import transaction
+from django.db.models import Q
+from .models import (
+    Plan, PlanReview, PlanRevision, StrategicInitiative, PerformanceMeasure,
+    MainActivity, ActivityBudget, BudgetLineItem, ArchivedPlan, ArchivedStrategicInitiative,
+    Tombstone, ARCHIVE_MODELS, SYNC_MODELS
+)
+from . import search
+
+BATCH_SIZE = 500
+
+# Plan statuses that keep a fiscal year open
+OPEN_STATUSES = ('DRAFT', 'SUBMITTED')
+
+# Archived models in archival order, each with the foreign key to the parent
+# its fiscal year comes from (None for rows carrying their own fiscal_year)
+SCOPES = [
+    (BudgetLineItem, 'budget'),
+    (ActivityBudget, 'activity'),
+    (MainActivity, 'initiative'),
+    (PerformanceMeasure, 'initiative'),
+    (PlanReview, 'plan'),
+    (PlanRevision, 'plan'),
+    (Plan, None),
+    (StrategicInitiative, None),
+]
+PARENTS = {model: parent for model, parent in SCOPES}
+
+HOT_MODELS = {archived: hot for hot, archived in ARCHIVE_MODELS.items()}
+
+
+def in_fiscal_year(model, fiscal_year):
+    """
+    Q for rows of `model` (hot or archived) in a fiscal year. Parents are
+    matched in both tables, since during a run some have moved already.
+    """
+    model = HOT_MODELS.get(model, model)
+    parent = PARENTS[model]
+    if parent is None:
+        return Q(fiscal_year=fiscal_year)
+    parent_model = model._meta.get_field(parent).related_model
+    scope = in_fiscal_year(parent_model, fiscal_year)
+    return (
+        Q(**{f'{parent}_id__in': parent_model.objects.filter(scope).values('pk')}) |
+        Q(**{f'{parent}_id__in': ARCHIVE_MODELS[parent_model].objects.filter(scope).values('pk')})
+    )
+
+
+def open_plans(fiscal_year):
+    return Plan.objects.filter(fiscal_year=fiscal_year, status__in=OPEN_STATUSES)
+
+
+def counts(fiscal_year, archived=False):
+    """Rows of the fiscal year per model, in the hot tables or the archive"""
+    return {
+        model._meta.model_name: (ARCHIVE_MODELS[model] if archived else model).objects.filter(
+            in_fiscal_year(model, fiscal_year)
+        ).count()
+        for model, _ in SCOPES
+    }
+
+
+def _move(source, target, ids):
+    """Copy rows `ids` of `source` into `target`, keeping every column as is, then delete them"""
+    fields = target._meta.concrete_fields
+    queryset = source.objects.filter(pk__in=ids)
+    rows = queryset.values_list(*[field.attname for field in fields])
+    objs = [target(**dict(zip([field.attname for field in fields], row))) for row in rows]
+    # A raw insert skips pre_save, so auto_now timestamps keep their values
+    target._base_manager._insert(objs, fields=fields, raw=True)
+    # Children have moved already, so a plain DELETE will do. Skipping the
+    # ORM collector keeps the rolled_over_from lineage of the next year's
+    # rows (which still point at the same primary keys) and sends no
+    # per-row signals, so tombstones and the search index are batched here
+    if source in SYNC_MODELS:
+        Tombstone.objects.bulk_create(
+            [Tombstone(model=source._meta.model_name, object_id=obj.pk) for obj in objs]
+        )
+    queryset._raw_delete(queryset.db)
+    search.rebuild_on_commit()
+    return len(objs)
+
+
+def _batches(source, target, fiscal_year, batch_size):
+    queryset = source.objects.filter(in_fiscal_year(source, fiscal_year)).order_by('pk')
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return
+            yield _move(source, target, ids)
+
+
+def archive_fiscal_year(fiscal_year, batch_size=BATCH_SIZE):
+    """Move a fiscal year into the archive, yielding (model name, rows moved) per batch"""
+    for model, _ in SCOPES:
+        for moved in _batches(model, ARCHIVE_MODELS[model], fiscal_year, batch_size):
+            yield model._meta.model_name, moved
+
+
+def restore_fiscal_year(fiscal_year, batch_size=BATCH_SIZE):
+    """Move an archived fiscal year back into the hot tables"""
+    for model, _ in reversed(SCOPES):
+        for moved in _batches(ARCHIVE_MODELS[model], model, fiscal_year, batch_size):
+            yield model._meta.model_name, moved
+
+
+def is_archived(fiscal_year):
+    return (
+        ArchivedPlan.objects.filter(fiscal_year=fiscal_year).exists() or
+        ArchivedStrategicInitiative.objects.filter(fiscal_year=fiscal_year).exists()
+    )
+
+
+def _prefetched(model, rows):
+    queryset = model.objects.none()
+    queryset._result_cache = rows
+    queryset._prefetch_done = True
+    return queryset
+
+
+def as_hot(instance, memo=None):
+    """
+    An archived row as an instance of its hot model, so the hot serializers,
+    properties and methods apply. Related rows loaded with select_related or
+    prefetch_related are converted along with it. Read only: never save it.
+    """
+    memo = {} if memo is None else memo
+    key = (type(instance), instance.pk)
+    if key in memo:
+        return memo[key]
+
+    model = HOT_MODELS[type(instance)]
+    fields = model._meta.concrete_fields
+    hot = model.from_db(
+        instance._state.db, [field.attname for field in fields],
+        [getattr(instance, field.attname) for field in fields]
+    )
+    memo[key] = hot
+
+    for name, value in instance._state.fields_cache.items():
+        hot._state.fields_cache[name] = as_hot(value, memo) if type(value) in HOT_MODELS else value
+    for name, queryset in getattr(instance, '_prefetched_objects_cache', {}).items():
+        rows = [as_hot(row, memo) for row in queryset]
+        hot._prefetched_objects_cache = getattr(hot, '_prefetched_objects_cache', {})
+        hot._prefetched_objects_cache[name] = _prefetched(HOT_MODELS[queryset.model], rows)
+    return hot
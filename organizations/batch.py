@@ -0,0 +1,156 @@
+"""
+In-process dispatch of batched API calls.
+
+Each sub-request is resolved against the URLconf and handed straight to its
+DRF view, reusing the batch request's already authenticated user, session
+and headers, so authentication and the middleware stack run once per batch
+instead of once per call. Sub-requests run in order. When `parallel` is set,
+each run of consecutive GET requests is spread over a thread pool; writes
+act as barriers, so reads never race the writes listed before them.
+
+Preconditions are per call: a call's `if_match` becomes its If-Match
+header, and the batch request's own If-Match is not passed on.
+"""
+import contextvars
+import io
+import json
+import logging
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.urls import resolve, Resolver404
+
+MAX_REQUESTS = 25
+MAX_WORKERS = 4
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Headers that describe the batch request itself, not its calls: one
+# idempotency key would collide across the calls, and one ETag would check
+# unrelated rows against the same version
+BATCH_ONLY_HEADERS = ('HTTP_IDEMPOTENCY_KEY', 'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH', 'HTTP_X_PROFILE')
+
+logger = logging.getLogger(__name__)
+
+
+def _sub_request(request, method, url, body, if_match=None):
+    """A copy of the batch request aimed at another URL"""
+    parts = urlsplit(url)
+    content = json.dumps(body).encode() if body is not None else b''
+
+    sub = HttpRequest()
+    sub.method = method
+    sub.path = sub.path_info = parts.path
+    sub.META = dict(request.META)
+    for header in BATCH_ONLY_HEADERS:
+        sub.META.pop(header, None)
+    if if_match is not None:
+        sub.META['HTTP_IF_MATCH'] = str(if_match)
+    sub.META.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+    })
+    sub.GET = QueryDict(parts.query)
+    sub.COOKIES = request.COOKIES
+    sub._stream = io.BytesIO(content)
+    sub._read_started = False
+    sub.session = request.session
+    sub.user = request.user
+    # DRF skips authentication for requests carrying a resolved user
+    sub._force_auth_user = request.user
+    return sub
+
+
+def _body(response):
+    data = getattr(response, 'data', None)
+    if data is not None:
+        return data
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    try:
+        return json.loads(content or b'null')
+    except ValueError:
+        return content.decode(errors='replace')
+
+
+def _run(request, call, threaded=False):
+    try:
+        match = resolve(urlsplit(call['url']).path)
+    except Resolver404:
+        return {'status': 404, 'body': {'detail': 'Not found.'}}
+
+    # Only API views can be batched, and batches cannot nest
+    if getattr(match.func, 'cls', None) is None or match.url_name == 'batch':
+        return {'status': 400, 'body': {'detail': 'This URL cannot be batched'}}
+
+    sub = _sub_request(request, call['method'], call['url'], call.get('body'), call.get('if_match'))
+    sub.resolver_match = match
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+    except Exception:
+        # One failing call must not take the rest of the batch down with it
+        logger.exception(
+            'Batched request failed: %s %s', call['method'], call['url'],
+            extra={'method': call['method'], 'path': call['url']}
+        )
+        return {'status': 500, 'body': {'detail': 'Server error'}}
+    finally:
+        if threaded:
+            connections.close_all()
+
+    return {
+        'status': response.status_code,
+        'body': _body(response),
+    }
+
+
+def validate(calls):
+    """Error message for a malformed list of sub-requests, or None"""
+    if not isinstance(calls, list) or not calls:
+        return 'requests must be a non-empty list'
+    if len(calls) > MAX_REQUESTS:
+        return f'A batch can hold at most {MAX_REQUESTS} requests'
+    for index, call in enumerate(calls):
+        if not isinstance(call, dict) or not isinstance(call.get('url'), str):
+            return f'Request {index} needs a url'
+        call['method'] = str(call.get('method', 'GET')).upper()
+        if call['method'] not in METHODS:
+            return f'Request {index} has an unsupported method'
+        if not isinstance(call.get('if_match', ''), (str, int)):
+            return f'Request {index} has an invalid if_match'
+    return None
+
+
+def dispatch(request, calls, parallel=False):
+    """
+    Run validated sub-requests against the Django request `request`.
+    Returns one {id, status, body} per call, in order.
+    """
+    results = [None] * len(calls)
+    index = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) if parallel else nullcontext() as pool:
+        while index < len(calls):
+            end = index + 1
+            if parallel and calls[index]['method'] == 'GET':
+                while end < len(calls) and calls[end]['method'] == 'GET':
+                    end += 1
+
+            if end - index > 1:
+                # Each worker runs in a copy of this context, so logs keep the request id
+                futures = [
+                    pool.submit(contextvars.copy_context().run, _run, request, calls[i], True)
+                    for i in range(index, end)
+                ]
+                for i, future in zip(range(index, end), futures):
+                    results[i] = future.result()
+            else:
+                results[index] = _run(request, calls[index])
+            index = end
+
+    for call, result in zip(calls, results):
+        result['id'] = call.get('id')
+    return results
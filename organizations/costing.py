@@ -0,0 +1,292 @@
+"""
+Server-side mirror of the frontend costing tools.
+
+Breaks the *_details JSON stored on an ActivityBudget into typed line items
+(cost type, location, quantity, unit rate, amount) priced from the costing
+assumptions table, falling back to the same default rates the frontend uses.
+
+Costing assumptions are effective-dated: each row is the rate of an
+(activity type, location, cost type) from its effective_from until the next
+version starts. RateTable.load(as_of=...) prices with the rates in effect on
+a date, resolved from an in-memory RateHistory that is loaded once per
+process and reloaded when a rate changes, so lookups never query.
+"""
+import bisect
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+# Default rates mirroring COST_ASSUMPTIONS in src/types/costing.ts
+DEFAULT_RATES = {
+    'per_diem': {
+        'Addis_Ababa': 1200, 'Adama': 1000, 'Bahirdar': 1100, 'Mekele': 1100,
+        'Hawassa': 1000, 'Gambella': 1200, 'Afar': 1200, 'Somali': 1200,
+    },
+    'accommodation': {
+        'Addis_Ababa': 1500, 'Adama': 1200, 'Bahirdar': 1300, 'Mekele': 1300,
+        'Hawassa': 1200, 'Gambella': 1400, 'Afar': 1400, 'Somali': 1400,
+    },
+    'venue': {
+        'Addis_Ababa': 5000, 'Adama': 4000, 'Bahirdar': 4500, 'Mekele': 4500,
+        'Hawassa': 4000, 'Gambella': 4500, 'Afar': 4500, 'Somali': 4500,
+    },
+    'transport_land': 1000,
+    'transport_air': 5000,
+    'participant_flash_disk': 500,
+    'participant_stationary': 200,
+    'session_flip_chart': 300,
+    'session_marker': 150,
+    'session_toner_paper': 1000,
+    'supervisor_mobile_card_300': 300,
+    'supervisor_mobile_card_500': 500,
+    'supervisor_stationary': 200,
+    # Cost per page, keyed by document type (DOCUMENT_TYPES in costing.ts)
+    'printing': {'Manual': 50, 'Booklet': 40, 'Leaflet': 30, 'Brochure': 35},
+}
+
+# Default unit prices for procured items (PROCUREMENT_ITEMS in costing.ts)
+PROCUREMENT_PRICES = {
+    'Air_Freshner': 150, 'Air_Time': 100, 'Antivirus': 1500, 'Bag': 800, 'Binding_Ring': 50,
+    'Broom': 100, 'Calculator': 300, 'Camera': 15000, 'Car': 2000000, 'Carbon_Paper': 50,
+    'Car_Part': 5000, 'Carpet': 2000, 'Cassette': 100, 'CD': 50, 'CDMA': 2000, 'Chair': 3000,
+    'Cloth': 1000, 'Cloth_Accessory': 500, 'Coat_Hanger': 200, 'Computer': 30000,
+    'Copier': 50000, 'Curtain': 3000, 'Detergent': 100, 'Disinfectant': 200, 'Divider': 100,
+    'D_Link': 1000, 'Dust_Bin': 300, 'Envelope': 10, 'External_Hard_Drive': 3000,
+    'Fantastic_Glue': 50, 'Fax_Machine': 10000, 'File_Cabinet': 5000, 'File_Holder': 200,
+    'Flash_Disk': 500, 'Gawn_Tetron': 2000, 'Generator': 50000, 'Glove': 100,
+    'Hard_Disk': 2000, 'Laminator': 5000, 'Marker': 50, 'Mop': 200, 'Network_Cable': 1000,
+    'Note_Book': 100, 'Note_Pad': 50, 'Paper': 200, 'Paper_Clip': 20, 'Paper_Fastener': 30,
+    'Paper_Punch': 300, 'Paper_Ream': 400, 'Stationary': 500, 'Printer': 20000,
+    'Projector': 30000, 'Rope': 100, 'Scanner': 15000, 'Scouring_Powder': 100, 'Shelf': 3000,
+    'Shoe': 2000, 'Soap': 50, 'Surge_Arrestor': 1000, 'Table': 4000, 'Textile': 1000,
+    'Toilet_Paper': 100, 'Toner': 5000, 'T_Shirt': 500, 'Uhu': 100, 'UPS': 3000,
+    'Vacuum_Cleaner': 10000, 'Water_Filter': 5000,
+}
+
+PARTICIPANT_COSTS = {
+    'Flash_Disk': 'participant_flash_disk',
+    'Stationary': 'participant_stationary',
+}
+SESSION_COSTS = {
+    'Flip_Chart': 'session_flip_chart',
+    'Marker': 'session_marker',
+    'Toner_Paper': 'session_toner_paper',
+}
+SUPERVISOR_COSTS = {
+    'MobileCard300': 'supervisor_mobile_card_300',
+    'MobileCard500': 'supervisor_mobile_card_500',
+    'Stationary': 'supervisor_stationary',
+}
+
+LineItem = namedtuple('LineItem', ['cost_type', 'location', 'quantity', 'unit_rate', 'amount', 'description'])
+
+
+def to_decimal(value):
+    """Coerce a JSON number (or numeric string) to Decimal, treating junk as 0"""
+    if value is None or value == '':
+        return Decimal('0')
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return Decimal('0')
+
+
+class RateHistory:
+    """
+    Every version of every costing assumption, indexed for as-of lookups:
+    per (activity_type, location, cost_type), the dates its versions start
+    in order and their amounts, so the rate on a date is one bisection.
+    """
+
+    def __init__(self, versions):
+        self.starts = defaultdict(list)
+        self.amounts = defaultdict(list)
+        for activity_type, location, cost_type, effective_from, amount in sorted(versions, key=lambda row: row[3]):
+            key = (activity_type, location, cost_type)
+            self.starts[key].append(effective_from)
+            self.amounts[key].append(amount)
+
+    @classmethod
+    def load(cls):
+        from .models import ActivityCostingAssumption
+
+        return cls(ActivityCostingAssumption.objects.values_list(
+            'activity_type', 'location', 'cost_type', 'effective_from', 'amount'
+        ))
+
+    def rate(self, key, as_of):
+        """The amount of `key` in effect on `as_of`, or None if no version had started"""
+        index = bisect.bisect_right(self.starts.get(key, ()), as_of) - 1
+        return self.amounts[key][index] if index >= 0 else None
+
+    def as_of(self, as_of):
+        """{(activity_type, location, cost_type): amount} of the rates in effect on `as_of`"""
+        rates = {key: self.rate(key, as_of) for key in self.starts}
+        return {key: amount for key, amount in rates.items() if amount is not None}
+
+
+RATES_STAMP_KEY = 'costing:rates_stamp'
+
+_history = None
+_history_stamp = None
+_history_loaded_at = 0
+
+
+def rate_history():
+    """
+    The process's RateHistory. Reloaded when a costing assumption changes
+    (see invalidate_rate_history) or, in case that change was made in
+    another process and the cache is not shared, after COSTING_RATES_CACHE_SECONDS.
+    """
+    global _history, _history_stamp, _history_loaded_at
+
+    stamp = cache.get(RATES_STAMP_KEY)
+    if (
+        _history is None or stamp != _history_stamp or
+        time.monotonic() - _history_loaded_at > settings.COSTING_RATES_CACHE_SECONDS
+    ):
+        _history, _history_stamp, _history_loaded_at = RateHistory.load(), stamp, time.monotonic()
+    return _history
+
+
+def invalidate_rate_history():
+    cache.set(RATES_STAMP_KEY, uuid.uuid4().hex, None)
+
+
+class RateTable:
+    """
+    Resolves unit rates by (activity_type, location, cost_type).
+
+    Rates come from ActivityCostingAssumption rows when present, then from
+    DEFAULT_RATES. `overrides` take precedence over both and may be keyed by
+    (activity_type, location, cost_type), (location, cost_type) or cost_type.
+    """
+
+    def __init__(self, assumptions=None, overrides=None):
+        self.assumptions = assumptions or {}
+        self.overrides = overrides or {}
+
+    @classmethod
+    def load(cls, overrides=None, as_of=None):
+        """The costing assumptions in effect on `as_of` (default today)"""
+        return cls(rate_history().as_of(as_of or timezone.localdate()), overrides)
+
+    def rate(self, activity_type, cost_type, location=None):
+        for key in ((activity_type, location, cost_type), (location, cost_type), cost_type):
+            if key in self.overrides:
+                return to_decimal(self.overrides[key])
+
+        if (activity_type, location, cost_type) in self.assumptions:
+            return to_decimal(self.assumptions[(activity_type, location, cost_type)])
+
+        default = DEFAULT_RATES.get(cost_type, 0)
+        if isinstance(default, dict):
+            default = default.get(location, 0)
+        return to_decimal(default)
+
+
+def _expand(selected, mapping):
+    """Expand a multi-select list where 'All' means every option"""
+    selected = selected or []
+    if 'All' in selected:
+        return list(mapping.values())
+    return [mapping[value] for value in selected if value in mapping]
+
+
+def _item(cost_type, location, quantity, unit_rate, description=''):
+    return LineItem(cost_type, location, quantity, unit_rate, quantity * unit_rate, description)
+
+
+def _attendance_items(activity_type, details, rates, location, attendees_key, land_key, air_key):
+    """Per diem, accommodation and transport, shared by every travel-based tool"""
+    days = to_decimal(details.get('numberOfDays'))
+    attendees = to_decimal(details.get(attendees_key))
+    items = [
+        _item('per_diem', location, attendees * days, rates.rate(activity_type, 'per_diem', location)),
+        _item(
+            'accommodation', location, attendees * max(days - 1, Decimal('0')),
+            rates.rate(activity_type, 'accommodation', location)
+        ),
+    ]
+    if details.get('transportRequired'):
+        items.append(_item(
+            'transport_land', location, to_decimal(details.get(land_key)),
+            rates.rate(activity_type, 'transport_land', location)
+        ))
+        items.append(_item(
+            'transport_air', location, to_decimal(details.get(air_key)),
+            rates.rate(activity_type, 'transport_air', location)
+        ))
+    return items
+
+
+def _event_items(activity_type, details, rates, location, sessions):
+    """Items for trainings, meetings and workshops"""
+    participants = to_decimal(details.get('numberOfParticipants'))
+    items = _attendance_items(
+        activity_type, details, rates, location,
+        'numberOfParticipants', 'landTransportParticipants', 'airTransportParticipants'
+    )
+    items.append(_item(
+        'venue', location, to_decimal(details.get('numberOfDays')),
+        rates.rate(activity_type, 'venue', location)
+    ))
+    for cost_type in _expand(details.get('additionalParticipantCosts'), PARTICIPANT_COSTS):
+        items.append(_item(cost_type, location, participants, rates.rate(activity_type, cost_type, location)))
+    for cost_type in _expand(details.get('additionalSessionCosts'), SESSION_COSTS):
+        items.append(_item(cost_type, location, sessions, rates.rate(activity_type, cost_type, location)))
+    return items
+
+
+def line_items(activity_type, details, rates):
+    """
+    Break one costing-tool details payload into LineItems. Zero-amount items
+    are dropped; `otherCosts` becomes a single 'other' item.
+    """
+    if not details or not isinstance(details, dict):
+        return []
+
+    items = []
+    if activity_type == 'Training':
+        location = details.get('trainingLocation')
+        sessions = to_decimal(details.get('numberOfSessions') or 1)
+        items = _event_items(activity_type, details, rates, location, sessions)
+    elif activity_type in ('Meeting', 'Workshop'):
+        location = details.get('location')
+        items = _event_items(activity_type, details, rates, location, Decimal('1'))
+    elif activity_type == 'Supervision':
+        location = details.get('trainingLocation')
+        supervisors = to_decimal(details.get('numberOfSupervisors'))
+        items = _attendance_items(
+            activity_type, details, rates, location,
+            'numberOfSupervisors', 'landTransportSupervisors', 'airTransportSupervisors'
+        )
+        for cost_type in _expand(details.get('additionalSupervisorCosts'), SUPERVISOR_COSTS):
+            items.append(_item(cost_type, location, supervisors, rates.rate(activity_type, cost_type, location)))
+    elif activity_type == 'Printing':
+        location = None
+        document_type = details.get('documentType')
+        quantity = to_decimal(details.get('numberOfPages')) * to_decimal(details.get('numberOfCopies'))
+        # Printing rates vary by document type, which takes the place of the location
+        unit_rate = rates.rate(activity_type, 'printing', document_type)
+        items.append(_item('printing', location, quantity, unit_rate, document_type or ''))
+    elif activity_type == 'Procurement':
+        location = None
+        for item in details.get('items') or []:
+            if not isinstance(item, dict):
+                continue
+            item_type = item.get('itemType') or ''
+            unit_price = item.get('unitPrice') or PROCUREMENT_PRICES.get(item_type, 0)
+            items.append(_item('procurement', location, to_decimal(item.get('quantity')), to_decimal(unit_price), item_type))
+    else:
+        location = None
+
+    other_costs = to_decimal(details.get('otherCosts'))
+    if other_costs:
+        items.append(_item('other', location, Decimal('1'), other_costs))
+
+    return [item for item in items if item.amount]
@@ -0,0 +1,111 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+A client that may retry a request sends the same Idempotency-Key header
+with each attempt. The first attempt runs normally and its response is
+stored; retries get the stored response back without running the view
+again, so they touch only the idempotency table. Reusing a key for a
+different request is rejected, as is a retry that arrives while the first
+attempt is still running. Server errors are not stored, so the request can
+be retried. Replays carry the first response's ETag and Location headers. Keys expire after IDEMPOTENCY_KEY_TTL_HOURS and are removed by
+`manage.py purge_idempotency_keys`.
+"""
+import datetime
+import functools
+import hashlib
+import json
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Response headers stored with the response and sent again on replay
+STORED_HEADERS = ('ETag', 'Location')
+
+
+def request_hash(request):
+    """Fingerprint of the method, path and body, to catch a key reused for another request"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps([request.method, request.get_full_path(), data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response, status=record.status_code, headers=record.headers)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view_method):
+    """Decorate a viewset method so requests carrying an Idempotency-Key run at most once"""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        # Nested calls (a create calling super().create) are covered by the outer one
+        if not key or getattr(request, '_idempotency_checked', False) or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        request._idempotency_checked = True
+
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'{HEADER} cannot be longer than {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        now = timezone.now()
+        fingerprint = request_hash(request)
+        IdempotencyKey.objects.filter(user=request.user, key=key, expires_at__lte=now).delete()
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=request.user,
+                    key=key,
+                    request_hash=fingerprint,
+                    expires_at=now + datetime.timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+                )
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if existing is None:
+                # Purged between the insert and this read; let the client retry
+                return Response(
+                    {'detail': f'A request with this {HEADER} is still being processed'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            if existing.request_hash != fingerprint:
+                return Response(
+                    {'detail': f'This {HEADER} was already used for a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if existing.status_code is None:
+                return Response(
+                    {'detail': f'A request with this {HEADER} is still being processed'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            return _replay(existing)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500 or getattr(response, 'streaming', False):
+            record.delete()
+        else:
+            # Headers such as the ETag are only added once the viewset finalizes
+            # the response; doing that here (again) stores them as sent
+            response = self.finalize_response(request, response, *args, **kwargs)
+            record.status_code = response.status_code
+            record.response = response.data
+            record.headers = {name: response[name] for name in STORED_HEADERS if response.has_header(name)}
+            record.save(update_fields=['status_code', 'response', 'headers'])
+        return response
+    return wrapper
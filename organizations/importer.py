@@ -0,0 +1,428 @@
+"""
+Bulk import of initiatives, performance measures and main activities from
+CSV or XLSX spreadsheets.
+
+The sheet has a header row followed by one row per record. The `type`
+column says what a row is:
+
+    initiative   name, weight and its parent by name: objective, program
+                 and/or subprogram (the most specific one given is the parent)
+    measure      initiative, name, weight, baseline, q1_target..q4_target,
+                 annual_target
+    activity     initiative, name, weight, months and/or quarters
+                 (comma-separated, e.g. "JUL, AUG" or "Q1")
+
+Measures and activities name their initiative, which may be a row earlier in
+the same sheet or one already in the database. The objective/program/
+subprogram columns may be filled in on those rows too, to pick between
+initiatives sharing a name.
+
+Rows are read one at a time and checked in a single pass against in-memory
+lookup maps and running weight totals, so nothing is written unless the
+whole sheet is valid. Valid sheets are written with bulk_create inside one
+transaction.
+"""
+import codecs
+import csv
+import zipfile
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Sum
+from .models import (
+    StrategicObjective, Program, SubProgram, StrategicInitiative,
+    PerformanceMeasure, MainActivity, normalize_month, months_to_mask,
+    quarters_to_mask, fiscal_year_filter, FISCAL_QUARTERS
+)
+from . import search
+
+BATCH_SIZE = 500
+
+MEASURES_WEIGHT_CAP = Decimal('35')
+ACTIVITIES_WEIGHT_CAP = Decimal('65')
+
+ROW_TYPES = {
+    'initiative': 'initiative',
+    'strategic_initiative': 'initiative',
+    'measure': 'measure',
+    'performance_measure': 'measure',
+    'activity': 'activity',
+    'main_activity': 'activity',
+}
+
+COLUMN_ALIASES = {
+    'strategic_objective': 'objective',
+    'sub_program': 'subprogram',
+    'selected_months': 'months',
+    'selected_quarters': 'quarters',
+}
+
+TARGET_COLUMNS = ['q1_target', 'q2_target', 'q3_target', 'q4_target', 'annual_target']
+
+
+def _column(header):
+    column = str(header or '').strip().lower().replace(' ', '_')
+    return COLUMN_ALIASES.get(column, column)
+
+
+def _read_csv(upload):
+    # Iterating the upload yields lines without loading the whole file
+    try:
+        yield from csv.reader(codecs.iterdecode(upload, 'utf-8-sig'))
+    except (UnicodeDecodeError, csv.Error):
+        raise ValidationError('The CSV file could not be read, save it as UTF-8')
+
+
+def _read_xlsx(upload):
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = openpyxl.load_workbook(upload, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError):
+        raise ValidationError('The XLSX file could not be read')
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(upload):
+    """Yield (row number, {column: value}) for each non-blank data row"""
+    name = (getattr(upload, 'name', '') or '').lower()
+    if name.endswith('.csv'):
+        rows = _read_csv(upload)
+    elif name.endswith('.xlsx'):
+        rows = _read_xlsx(upload)
+    else:
+        raise ValidationError('Upload a .csv or .xlsx file')
+
+    header = next(rows, None)
+    if not header:
+        raise ValidationError('The file is empty')
+    columns = [_column(value) for value in header]
+    if 'type' not in columns or 'name' not in columns:
+        raise ValidationError('The header row must include "type" and "name" columns')
+
+    for number, values in enumerate(rows, start=2):
+        row = {
+            column: (value.strip() if isinstance(value, str) else value)
+            for column, value in zip(columns, values)
+            if column
+        }
+        if any(value not in (None, '') for value in row.values()):
+            yield number, row
+
+
+def _decimal(row, column, default=None):
+    value = row.get(column)
+    if value in (None, ''):
+        if default is None:
+            raise ValueError(f'{column} is required')
+        return default
+    try:
+        value = Decimal(str(value).rstrip('%').strip())
+    except InvalidOperation:
+        raise ValueError(f'{column} must be a number')
+    if not value.is_finite():
+        raise ValueError(f'{column} must be a number')
+    return value.quantize(Decimal('0.01'))
+
+
+def _split(value):
+    return [part.strip() for part in str(value or '').split(',') if part.strip()]
+
+
+class _Lookups:
+    """Name -> id maps for the hierarchy, loaded with one query per level"""
+
+    def __init__(self, fiscal_year=None):
+        self.objectives = {}
+        self.objective_weights = {}
+        for pk, title, weight in StrategicObjective.objects.values_list('id', 'title', 'weight'):
+            self.objectives.setdefault(title.strip().lower(), []).append(pk)
+            self.objective_weights[pk] = weight
+
+        self.programs = {}
+        self.program_parents = {}
+        self.program_weights = {}
+        for pk, name, objective_id, weight in Program.objects.values_list(
+            'id', 'name', 'strategic_objective_id', 'weight'
+        ):
+            self.programs.setdefault(name.strip().lower(), []).append(pk)
+            self.program_parents[pk] = objective_id
+            self.program_weights[pk] = weight
+
+        self.subprograms = {}
+        self.subprogram_parents = {}
+        self.subprogram_weights = {}
+        for pk, name, program_id, weight in SubProgram.objects.values_list('id', 'name', 'program_id', 'weight'):
+            self.subprograms.setdefault(name.strip().lower(), []).append(pk)
+            self.subprogram_parents[pk] = program_id
+            self.subprogram_weights[pk] = weight
+
+        # Existing initiatives keyed by (parent field, parent id, lowercased name).
+        # With a fiscal year, only that year's initiatives count, as in
+        # Plan.initiatives(), so rolled-over copies do not clash.
+        initiatives = StrategicInitiative.objects.all()
+        if fiscal_year:
+            initiatives = initiatives.filter(fiscal_year_filter(fiscal_year))
+        self.initiatives = {}
+        self.initiative_names = defaultdict(list)
+        self.initiative_totals = defaultdict(Decimal)
+        keys = {}
+        for row in initiatives.values(
+            'id', 'name', 'weight', 'strategic_objective_id', 'program_id', 'subprogram_id'
+        ):
+            parent = self._initiative_parent(row)
+            key = parent + (row['name'].strip().lower(),)
+            self.initiatives[key] = row['id']
+            keys[row['id']] = key
+            self.initiative_names[key[2]].append(key)
+            self.initiative_totals[parent] += row['weight']
+
+        # Measure and activity weight totals, keyed like the initiatives
+        self.measure_totals = defaultdict(Decimal)
+        for initiative_id, total in PerformanceMeasure.objects.filter(initiative__in=initiatives).values('initiative').annotate(
+            total=Sum('weight')
+        ).values_list('initiative', 'total'):
+            self.measure_totals[keys[initiative_id]] += total
+        self.activity_totals = defaultdict(Decimal)
+        for initiative_id, total in MainActivity.objects.filter(initiative__in=initiatives).values('initiative').annotate(
+            total=Sum('weight')
+        ).values_list('initiative', 'total'):
+            self.activity_totals[keys[initiative_id]] += total
+
+    @staticmethod
+    def _initiative_parent(row):
+        if row['subprogram_id']:
+            return ('subprogram', row['subprogram_id'])
+        if row['program_id']:
+            return ('program', row['program_id'])
+        return ('strategic_objective', row['strategic_objective_id'])
+
+    def parent_weight(self, parent):
+        field, pk = parent
+        if field == 'subprogram':
+            return self.subprogram_weights[pk]
+        if field == 'program':
+            return self.program_weights[pk]
+        return self.objective_weights[pk]
+
+    def _one(self, label, name, candidates):
+        if not candidates:
+            raise ValueError(f'{label} "{name}" not found')
+        if len(candidates) > 1:
+            raise ValueError(f'{label} "{name}" is ambiguous, name its parent too')
+        return candidates[0]
+
+    def resolve_parent(self, row):
+        """(parent field, parent id) for the most specific parent named in a row, or None"""
+        objective = str(row.get('objective') or '').strip()
+        program = str(row.get('program') or '').strip()
+        subprogram = str(row.get('subprogram') or '').strip()
+
+        objective_ids = self.objectives.get(objective.lower(), []) if objective else None
+        if objective and not objective_ids:
+            raise ValueError(f'Strategic objective "{objective}" not found')
+
+        program_ids = None
+        if program:
+            program_ids = [
+                pk for pk in self.programs.get(program.lower(), [])
+                if objective_ids is None or self.program_parents[pk] in objective_ids
+            ]
+            if not subprogram:
+                return ('program', self._one('Program', program, program_ids))
+            if not program_ids:
+                raise ValueError(f'Program "{program}" not found')
+
+        if subprogram:
+            subprogram_ids = [
+                pk for pk in self.subprograms.get(subprogram.lower(), [])
+                if (program_ids is None or self.subprogram_parents[pk] in program_ids)
+                and (objective_ids is None or self.program_parents[self.subprogram_parents[pk]] in objective_ids)
+            ]
+            return ('subprogram', self._one('Subprogram', subprogram, subprogram_ids))
+
+        if objective:
+            return ('strategic_objective', self._one('Strategic objective', objective, objective_ids))
+        return None
+
+
+class PlanImport:
+    """Validates spreadsheet rows in one pass and bulk-creates them"""
+
+    def __init__(self, fiscal_year=None):
+        self.fiscal_year = fiscal_year or None
+        self.lookups = _Lookups(self.fiscal_year)
+        self.errors = []
+        # key -> unsaved initiative, for initiatives defined in the sheet
+        self.new_initiatives = {}
+        self.new_names = defaultdict(list)
+        self.measures = []
+        self.activities = []
+
+    def error(self, number, detail):
+        self.errors.append({'row': number, 'detail': detail})
+
+    def validate(self, rows):
+        for number, row in rows:
+            row_type = ROW_TYPES.get(_column(row.get('type')))
+            name = str(row.get('name') or '').strip()
+            try:
+                if row_type is None:
+                    raise ValueError('type must be initiative, measure or activity')
+                if not name:
+                    raise ValueError('name is required')
+                if len(name) > 255:
+                    raise ValueError('name cannot be longer than 255 characters')
+                getattr(self, f'_add_{row_type}')(number, row, name)
+            except ValueError as e:
+                self.error(number, str(e))
+        return self.errors
+
+    def _weight(self, row):
+        weight = _decimal(row, 'weight')
+        if weight <= 0:
+            raise ValueError('Weight must be positive')
+        return weight
+
+    def _add_initiative(self, number, row, name):
+        lookups = self.lookups
+        parent = lookups.resolve_parent(row)
+        if parent is None:
+            raise ValueError('An initiative needs an objective, program or subprogram')
+
+        key = parent + (name.lower(),)
+        if key in lookups.initiatives or key in self.new_initiatives:
+            raise ValueError(f'Initiative "{name}" already exists under this parent')
+
+        # Register the initiative before checking its weight, so its measures and
+        # activities are not also reported as pointing at a missing initiative
+        initiative = StrategicInitiative(name=name, fiscal_year=self.fiscal_year)
+        setattr(initiative, f'{parent[0]}_id', parent[1])
+        self.new_initiatives[key] = initiative
+        self.new_names[key[2]].append(key)
+
+        weight = self._weight(row)
+        initiative.weight = weight
+        total = lookups.initiative_totals[parent] + weight
+        parent_weight = lookups.parent_weight(parent)
+        if total > parent_weight:
+            raise ValueError(
+                f'Total weight of initiatives ({total}%) cannot exceed parent weight ({parent_weight}%)'
+            )
+        lookups.initiative_totals[parent] = total
+
+    def _initiative_key(self, row):
+        name = str(row.get('initiative') or '').strip()
+        if not name:
+            raise ValueError('initiative is required')
+
+        parent = self.lookups.resolve_parent(row)
+        if parent is not None:
+            key = parent + (name.lower(),)
+            if key in self.new_initiatives or key in self.lookups.initiatives:
+                return key
+            raise ValueError(f'Initiative "{name}" not found under the given parent')
+
+        # Initiatives from this sheet take precedence over existing ones with the same name
+        candidates = self.new_names.get(name.lower()) or self.lookups.initiative_names.get(name.lower(), [])
+        return self.lookups._one('Initiative', name, candidates)
+
+    def _add_measure(self, number, row, name):
+        key = self._initiative_key(row)
+        weight = self._weight(row)
+        targets = {column: _decimal(row, column, Decimal('0')) for column in TARGET_COLUMNS}
+        if sum(targets[column] for column in TARGET_COLUMNS[:4]) > targets['annual_target']:
+            raise ValueError('Sum of quarterly targets cannot exceed annual target')
+
+        total = self.lookups.measure_totals[key] + weight
+        if total > MEASURES_WEIGHT_CAP:
+            raise ValueError(f'Total weight of performance measures ({total}%) cannot exceed 35%')
+        self.lookups.measure_totals[key] = total
+
+        self.measures.append((key, PerformanceMeasure(
+            name=name, weight=weight, baseline=str(row.get('baseline') or ''), **targets
+        )))
+
+    def _add_activity(self, number, row, name):
+        key = self._initiative_key(row)
+        weight = self._weight(row)
+
+        months = []
+        for value in _split(row.get('months')):
+            month = normalize_month(value)
+            if month is None:
+                raise ValueError(f'Unknown month "{value}"')
+            if month not in months:
+                months.append(month)
+        quarters = []
+        for value in _split(row.get('quarters')):
+            quarter = value.upper()
+            if quarter not in FISCAL_QUARTERS:
+                raise ValueError(f'Unknown quarter "{value}"')
+            if quarter not in quarters:
+                quarters.append(quarter)
+        if not months and not quarters:
+            raise ValueError('At least one month or quarter must be selected')
+
+        total = self.lookups.activity_totals[key] + weight
+        if total > ACTIVITIES_WEIGHT_CAP:
+            raise ValueError(f'Total weight of activities ({total}%) cannot exceed 65%')
+        self.lookups.activity_totals[key] = total
+
+        self.activities.append((key, MainActivity(
+            name=name, weight=weight,
+            selected_months=months, selected_quarters=quarters,
+            months_mask=months_to_mask(months), quarters_mask=quarters_to_mask(quarters)
+        )))
+
+    def counts(self):
+        return {
+            'initiatives': len(self.new_initiatives),
+            'performance_measures': len(self.measures),
+            'main_activities': len(self.activities),
+        }
+
+    @transaction.atomic
+    def save(self):
+        """Write the validated rows; call only when validate() returned no errors"""
+        StrategicInitiative.objects.bulk_create(self.new_initiatives.values(), batch_size=BATCH_SIZE)
+
+        # MySQL does not return primary keys from bulk inserts, so read the new ids back
+        initiative_ids = dict(self.lookups.initiatives)
+        names = {initiative.name for initiative in self.new_initiatives.values()}
+        existing = [initiative_ids[key] for name in self.new_names for key in self.lookups.initiative_names.get(name, [])]
+        for row in StrategicInitiative.objects.filter(
+            name__in=names, fiscal_year=self.fiscal_year
+        ).exclude(id__in=existing).values(
+            'id', 'name', 'strategic_objective_id', 'program_id', 'subprogram_id'
+        ):
+            key = _Lookups._initiative_parent(row) + (row['name'].strip().lower(),)
+            if key in self.new_initiatives:
+                initiative_ids[key] = row['id']
+
+        for key, measure in self.measures:
+            measure.initiative_id = initiative_ids[key]
+        for key, activity in self.activities:
+            activity.initiative_id = initiative_ids[key]
+        PerformanceMeasure.objects.bulk_create([measure for _, measure in self.measures], batch_size=BATCH_SIZE)
+        MainActivity.objects.bulk_create([activity for _, activity in self.activities], batch_size=BATCH_SIZE)
+        search.rebuild_on_commit()
+        return self.counts()
+
+
+def import_plan(upload, fiscal_year=None, dry_run=False):
+    """
+    Validate and (unless dry_run) import a spreadsheet. Returns
+    (errors, counts); nothing is written when there are errors.
+    Raises ValidationError for unreadable files.
+    """
+    plan_import = PlanImport(fiscal_year)
+    errors = plan_import.validate(read_rows(upload))
+    if errors or dry_run:
+        return errors, plan_import.counts()
+    return [], plan_import.save()
@@ -0,0 +1,195 @@
+"""
+Structured, non-blocking logging.
+
+Log records are turned into one JSON object per line. Handlers never write
+from the request thread: QueueHandler puts the prepared record on a bounded
+queue and a single listener thread per process writes it to stdout. When the
+queue is full the record is dropped and counted instead of blocking the
+request; the count is reported with the next record that gets through.
+
+RequestIdMiddleware gives every request an id, taken from a well-formed
+X-Request-ID header or generated, and returns it in the X-Request-ID
+response header. Every record logged while the request runs carries it as
+`request_id`, including records from the batch endpoint's worker threads.
+
+Records below WARNING are sampled at LOG_SAMPLE_RATE. A call can pass
+`extra={'sample_rate': ...}` to use a different rate. Warnings and errors
+are always kept.
+"""
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from django.conf import settings
+
+REQUEST_ID_HEADER = 'HTTP_X_REQUEST_ID'
+RESPONSE_HEADER = 'X-Request-ID'
+REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+QUEUE_SIZE = 10000
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+logger = logging.getLogger(__name__)
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+_INTERNAL_ATTRIBUTES = {'request_id', 'sample_rate'}
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Adds the current request's id to the record. Django logs 4xx and 5xx
+    responses (django.request) after the middleware has returned, so for
+    those the id is read from the request passed with the record.
+    """
+
+    def filter(self, record):
+        record.request_id = request_id.get() or getattr(getattr(record, 'request', None), 'request_id', None)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a LOG_SAMPLE_RATE share of the records below WARNING"""
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, 'sample_rate', settings.LOG_SAMPLE_RATE)
+        return rate >= 1 or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with the `extra` fields at the top level"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and name not in _INTERNAL_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a listener thread that writes them as JSON lines to
+    stdout. The listener starts with the first record of each process: a
+    forked worker (e.g. gunicorn with --preload) does not inherit the
+    parent's thread, so the child drops the parent's listener and queue and
+    starts its own.
+    """
+
+    def __init__(self, queue_size=QUEUE_SIZE, stream=None):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.target.setFormatter(JSONFormatter())
+        self.listener = None
+        self.start_lock = threading.Lock()
+        self.dropped = 0
+        os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        # Format the message and traceback here, while the arguments and
+        # exception are still current; the listener only serializes
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.target.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        dropped = self.dropped
+        if dropped:
+            record.dropped_records = dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        else:
+            self.dropped -= dropped
+
+    def emit(self, record):
+        if self.listener is None:
+            self.start()
+        super().emit(record)
+
+    def start(self):
+        # Threads logging their first records at once start one listener
+        with self.start_lock:
+            if self.listener is None:
+                listener = logging.handlers.QueueListener(self.queue, self.target)
+                listener.start()
+                self.listener = listener
+
+    def stop(self):
+        with self.start_lock:
+            listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+
+    def _after_fork(self):
+        # Locks may have been held by other threads of the parent at fork
+        # time, and its listener thread does not exist here
+        self.start_lock = threading.Lock()
+        self.queue = queue.Queue(self.queue_size)
+        self.listener = None
+        self.dropped = 0
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+class RequestIdMiddleware:
+    """Sets the request id for the request's log records and logs each response"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        incoming = request.META.get(REQUEST_ID_HEADER, '')
+        request.request_id = incoming if REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+        token = request_id.set(request.request_id)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            response[RESPONSE_HEADER] = request.request_id
+            logger.log(
+                logging.WARNING if response.status_code >= 500 else logging.INFO,
+                '%s %s %s', request.method, request.path, response.status_code,
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round((time.perf_counter() - start) * 1000, 1),
+                }
+            )
+            return response
+        finally:
+            request_id.reset(token)
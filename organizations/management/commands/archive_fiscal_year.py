@@ -0,0 +1,50 @@
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from organizations import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move a closed fiscal year (plans, reviews, revisions and the initiatives dated '
+        'to it with their measures, activities and budgets) into the archive tables, '
+        'in resumable batches'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fiscal_year', help='Fiscal year to archive')
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only report the rows that would move')
+        parser.add_argument(
+            '--restore', action='store_true',
+            help='Move the fiscal year back from the archive into the hot tables'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Archive even if the year still has draft or submitted plans'
+        )
+
+    def handle(self, *args, **options):
+        fiscal_year = options['fiscal_year']
+        restore = options['restore']
+
+        if options['dry_run']:
+            for name, count in archive.counts(fiscal_year, archived=restore).items():
+                self.stdout.write(f'{name:<24}{count:>9}')
+            return
+
+        if not restore and not options['force']:
+            still_open = archive.open_plans(fiscal_year).count()
+            if still_open:
+                raise CommandError(
+                    f'Fiscal year {fiscal_year} still has {still_open} draft or submitted plans; '
+                    'review them first or pass --force'
+                )
+
+        moved = Counter()
+        steps = archive.restore_fiscal_year if restore else archive.archive_fiscal_year
+        for name, count in steps(fiscal_year, options['batch_size']):
+            moved[name] += count
+            self.stdout.write(f'{name}: {moved[name]} moved')
+
+        action = 'Restored' if restore else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{action} {sum(moved.values())} rows of fiscal year {fiscal_year}'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from organizations.costing import RateTable
+from organizations.models import ActivityBudget, BudgetLineItem
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the budget line items of every activity budget from its costing details'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Each budget is priced with the rates of its own rates_as_of date
+        rate_tables = {}
+        batch_size = options['batch_size']
+        budgets = ActivityBudget.objects.order_by('pk')
+        last_pk = 0
+        processed = created = 0
+
+        while True:
+            batch = list(budgets.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+
+            items = []
+            for budget in batch:
+                if budget.rates_as_of not in rate_tables:
+                    rate_tables[budget.rates_as_of] = RateTable.load(as_of=budget.rates_as_of)
+                items.extend(budget.build_line_items(rate_tables[budget.rates_as_of]))
+            with transaction.atomic():
+                BudgetLineItem.objects.filter(budget__in=batch).delete()
+                BudgetLineItem.objects.bulk_create(items, batch_size=1000)
+
+            processed += len(batch)
+            created += len(items)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {created} line items for {processed} budgets'
+        ))
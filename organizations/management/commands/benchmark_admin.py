@@ -0,0 +1,56 @@
+import statistics
+import time
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+
+class Command(BaseCommand):
+    help = 'Measure admin changelist render time and query count for the organizations models'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Staff user the changelists are rendered for')
+        parser.add_argument('--model', action='append', help='Model name to benchmark (repeatable, default all)')
+        parser.add_argument('--query', default='', help='Query string to apply, e.g. "initiative__id__exact=5"')
+        parser.add_argument('--iterations', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'], is_staff=True)
+        except User.DoesNotExist:
+            raise CommandError(f"Staff user '{options['username']}' does not exist")
+
+        # The admin modules load lazily (see core.urls)
+        admin.autodiscover()
+        model_admins = [
+            model_admin for model, model_admin in admin.site._registry.items()
+            if model._meta.app_label == 'organizations'
+            and (not options['model'] or model._meta.model_name in [name.lower() for name in options['model']])
+        ]
+        if not model_admins:
+            raise CommandError('No matching models registered in the admin')
+
+        factory = RequestFactory()
+        for model_admin in model_admins:
+            meta = model_admin.model._meta
+            path = f'/admin/{meta.app_label}/{meta.model_name}/'
+            timings = []
+            for _ in range(options['iterations']):
+                request = factory.get(path, QUERY_STRING=options['query'])
+                request.user = user
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = model_admin.changelist_view(request)
+                    response.render()
+                    timings.append(time.perf_counter() - start)
+
+            if response.status_code != 200:
+                raise CommandError(f'{path} returned {response.status_code}')
+            rows = model_admin.model._default_manager.count()
+            self.stdout.write(
+                f'{meta.model_name:<28} {rows:>9} rows {len(queries):>4} queries '
+                f'{statistics.median(timings) * 1000:>9.2f} ms median'
+            )
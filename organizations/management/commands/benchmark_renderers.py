@@ -0,0 +1,53 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+from organizations.models import Plan
+from organizations.views import PlanViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON and MessagePack response size and latency on plan endpoints'
+
+    MEDIA_TYPES = ['application/json', 'application/msgpack']
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='User whose plans are requested')
+        parser.add_argument('--plan', type=int, help='Plan id for the retrieve benchmark')
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        plan_id = options['plan'] or Plan.objects.values_list('id', flat=True).first()
+        endpoints = [('plan list', PlanViewSet.as_view({'get': 'list'}), '/api/plans/', {})]
+        if plan_id:
+            endpoints.append((
+                'plan retrieve',
+                PlanViewSet.as_view({'get': 'retrieve'}),
+                f'/api/plans/{plan_id}/',
+                {'pk': plan_id}
+            ))
+
+        factory = APIRequestFactory()
+        for label, view, path, kwargs in endpoints:
+            for media_type in self.MEDIA_TYPES:
+                size, elapsed = 0, 0.0
+                for _ in range(options['iterations']):
+                    request = factory.get(path, HTTP_ACCEPT=media_type)
+                    force_authenticate(request, user=user)
+                    start = time.perf_counter()
+                    response = view(request, **kwargs)
+                    response.render()
+                    elapsed += time.perf_counter() - start
+                    size = len(response.content)
+
+                if response.status_code != 200:
+                    raise CommandError(f'{label} returned {response.status_code}')
+                self.stdout.write(
+                    f'{label:<15} {media_type:<20} {size:>10} bytes '
+                    f'{elapsed * 1000 / options["iterations"]:>9.2f} ms/request'
+                )
@@ -0,0 +1,57 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment
+from organizations.querypatterns import QueryPatternDetector, describe
+from organizations.urls import router
+
+
+class Command(BaseCommand):
+    help = (
+        'Request the list and first detail page of every API resource as a user and '
+        'report statements repeated more than the threshold (N+1 queries)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='User the endpoints are requested as')
+        parser.add_argument('--path', action='append', default=[], help='Extra path to check, e.g. "/api/plans/?fiscal_year=2017" (repeatable)')
+        parser.add_argument('--threshold', type=int, help='Repetitions allowed per statement (default QUERY_PATTERN_THRESHOLD)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        # Lets the test client's host through ALLOWED_HOSTS
+        setup_test_environment()
+        client = Client(raise_request_exception=True)
+        client.force_login(user)
+
+        paths = [f'/api/{prefix}/' for prefix, _, _ in router.registry] + options['path']
+        failures = 0
+        while paths:
+            path = paths.pop(0)
+            detector = QueryPatternDetector(options['threshold'])
+            with detector.watching():
+                response = client.get(path, HTTP_ACCEPT='application/json')
+            patterns = detector.repeated()
+
+            if response.status_code != 200:
+                self.stdout.write(self.style.WARNING(f'{path} returned {response.status_code}, skipped'))
+                continue
+            if patterns:
+                failures += 1
+                self.stdout.write(self.style.ERROR(describe(patterns, f'GET {path}')))
+            else:
+                self.stdout.write(f'{path:<60} {sum(detector.counts.values()):>5} queries')
+
+            # Check each resource's detail page too, with the first row of its list
+            rows = response.json()
+            rows = rows.get('results', []) if isinstance(rows, dict) else rows
+            if path.count('/') == 3 and '?' not in path and rows and isinstance(rows[0], dict) and 'id' in rows[0]:
+                paths.insert(0, f'{path}{rows[0]["id"]}/')
+
+        if failures:
+            raise CommandError(f'{failures} endpoints repeat queries')
+        self.stdout.write(self.style.SUCCESS('No repeated queries'))
@@ -0,0 +1,52 @@
+import gzip
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.json', '.map', '.html', '.svg', '.txt', '.xml', '.ico', '.wasm'}
+
+# Smaller files gain nothing once headers are counted
+MIN_SIZE = 256
+
+
+class Command(BaseCommand):
+    help = 'Write precompressed .gz (and .br, if brotli is installed) copies of collected static files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Recompress files whose variants are up to date')
+
+    def handle(self, *args, **options):
+        compressors = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            compressors.append(('.br', brotli.compress))
+        else:
+            self.stdout.write(self.style.WARNING('brotli is not installed, writing gzip variants only'))
+
+        written = 0
+        for directory, _, files in os.walk(settings.STATIC_ROOT):
+            for name in files:
+                if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                    continue
+                path = os.path.join(directory, name)
+                if os.path.getsize(path) < MIN_SIZE:
+                    continue
+
+                data = None
+                for suffix, compress in compressors:
+                    target = path + suffix
+                    if (not options['force'] and os.path.exists(target)
+                            and os.path.getmtime(target) >= os.path.getmtime(path)):
+                        continue
+                    if data is None:
+                        with open(path, 'rb') as f:
+                            data = f.read()
+                    with open(target, 'wb') as f:
+                        f.write(compress(data))
+                    written += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} compressed files'))
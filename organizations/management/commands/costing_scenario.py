@@ -0,0 +1,57 @@
+import datetime
+import json
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from organizations.models import BudgetLineItem
+from organizations.scenarios import parse_overrides, run_scenario
+
+
+class Command(BaseCommand):
+    help = 'Reprice every tool-based budget under rate overrides, without saving, and print the impact'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'overrides',
+            help='JSON list of overrides, e.g. \'[{"cost_type": "per_diem", "location": "Adama", "amount": 1300}]\''
+        )
+        parser.add_argument('--as-of', help='Compare against the rates in effect on this date (YYYY-MM-DD, default today)')
+        parser.add_argument('--json', action='store_true', help='Print the full result as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            overrides = parse_overrides(json.loads(options['overrides']))
+        except ValueError as e:
+            raise CommandError(f'Invalid JSON: {e}')
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+        try:
+            as_of = datetime.date.fromisoformat(options['as_of']) if options['as_of'] else None
+        except ValueError:
+            raise CommandError('--as-of must be a date (YYYY-MM-DD)')
+
+        start = time.perf_counter()
+        result = run_scenario(overrides, as_of=as_of)
+        elapsed = time.perf_counter() - start
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        total = result['total']
+        self.stdout.write(f"{'':<32} {'current':>16} {'scenario':>16} {'delta':>14}")
+        self.stdout.write(f"{'total':<32} {total['current']:>16,.2f} {total['scenario']:>16,.2f} {total['delta']:>+14,.2f}")
+        for row in result['by_activity_type']:
+            self.stdout.write(
+                f"{row['activity_type'] or '-':<32} {row['current']:>16,.2f} {row['scenario']:>16,.2f} {row['delta']:>+14,.2f}"
+            )
+        for row in result['by_organization']:
+            self.stdout.write(
+                f"{row['organization_name'][:32]:<32} {row['current']:>16,.2f} {row['scenario']:>16,.2f} {row['delta']:>+14,.2f}"
+            )
+        for source, delta in result['by_funding_source'].items():
+            self.stdout.write(f"{source:<32} {'':>16} {'':>16} {delta:>+14,.2f}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(result['changed_rates'])} rates changed, {BudgetLineItem.objects.count()} line items "
+            f"repriced in {elapsed * 1000:.0f} ms"
+        ))
@@ -0,0 +1,107 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so every import is cold, as on a new serverless instance
+CHILD_SCRIPT = '''
+import io, json, sys, time
+start = time.perf_counter()
+phases = {}
+
+import django
+django.setup()
+phases['setup'] = time.perf_counter()
+
+from core.wsgi import application, warm_up
+phases['wsgi'] = time.perf_counter()
+
+if %(warm)r:
+    warm_up()
+phases['warm_up'] = time.perf_counter()
+
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': %(path)r, 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+    'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+}
+status = []
+body = b''.join(application(environ, lambda s, h, *a: status.append(s)))
+phases['first_response'] = time.perf_counter()
+
+previous = start
+result = {'status': status[0], 'phases': {}}
+for name, moment in phases.items():
+    result['phases'][name] = round((moment - previous) * 1000, 1)
+    previous = moment
+result['total'] = round((previous - start) * 1000, 1)
+print(json.dumps(result))
+'''
+
+
+def parse_importtime(stderr):
+    """(module, self us, cumulative us, depth) for each `-X importtime` line"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure cold-start time to first response in a fresh process, with an '
+        'import-time breakdown, and fail if it exceeds the budget'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/auth/check/', help='URL requested as the first request')
+        parser.add_argument('--budget', type=float, default=settings.COLD_START_BUDGET_MS,
+                            help='Time-to-first-response budget in milliseconds')
+        parser.add_argument('--top', type=int, default=15, help='Number of slowest modules to list')
+        parser.add_argument('--no-warm-up', action='store_true', help='Skip core.wsgi.warm_up()')
+
+    def handle(self, *args, **options):
+        script = CHILD_SCRIPT % {'path': options['path'], 'warm': not options['no_warm_up']}
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings'),
+            # The child calls warm_up() itself so it is timed as its own phase
+            WARM_UP_ON_START='False'
+        )
+        child = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR
+        )
+        if child.returncode != 0:
+            raise CommandError(child.stderr.splitlines()[-1] if child.stderr else 'Startup failed')
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        modules = parse_importtime(child.stderr)
+
+        self.stdout.write(f'First response: {result["status"]} for {options["path"]}')
+        for name, ms in result['phases'].items():
+            self.stdout.write(f'  {name:<16}{ms:>9.1f} ms')
+
+        # Self time per top-level package shows which dependencies dominate
+        packages = defaultdict(int)
+        for name, self_us, _, _ in modules:
+            packages[name.split('.')[0]] += self_us
+        self.stdout.write('\nImport self time by package:')
+        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {name:<32}{us / 1000:>9.1f} ms')
+
+        self.stdout.write('\nSlowest project modules (cumulative):')
+        project = [row for row in modules if row[0].split('.')[0] in ('core', 'organizations')]
+        for name, _, cumulative_us, _ in sorted(project, key=lambda row: -row[2])[:options['top']]:
+            self.stdout.write(f'  {name:<40}{cumulative_us / 1000:>9.1f} ms')
+
+        total = result['total']
+        if total > options['budget']:
+            raise CommandError(f'Cold start took {total} ms, over the {options["budget"]} ms budget')
+        self.stdout.write(self.style.SUCCESS(f'\nCold start took {total} ms, within the {options["budget"]} ms budget'))
@@ -0,0 +1,20 @@
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from organizations.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete deletion tombstones older than the delta-sync retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.TOMBSTONE_RETENTION_DAYS,
+            help='Keep tombstones newer than this many days'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} tombstones older than {options["days"]} days'))
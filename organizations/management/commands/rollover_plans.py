@@ -0,0 +1,40 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from organizations.models import Plan
+from organizations.rollover import rollover_plan
+
+
+class Command(BaseCommand):
+    help = 'Roll every plan of one fiscal year over into the next, with its full hierarchy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('from_year', help='Fiscal year to copy plans from')
+        parser.add_argument('to_year', help='Fiscal year to create plans in')
+        parser.add_argument('--organization', type=int, help='Only roll over plans of this organization')
+        parser.add_argument(
+            '--include-rejected', action='store_true',
+            help='Also roll over rejected plans (skipped by default)'
+        )
+
+    def handle(self, *args, **options):
+        plans = Plan.objects.filter(fiscal_year=options['from_year']).order_by('organization_id', 'id')
+        if options['organization']:
+            plans = plans.filter(organization_id=options['organization'])
+        if not options['include_rejected']:
+            plans = plans.exclude(status='REJECTED')
+
+        created = skipped = 0
+        for plan in plans:
+            try:
+                new_plan, counts = rollover_plan(plan, options['to_year'])
+            except ValidationError as e:
+                skipped += 1
+                self.stderr.write(f'Skipped plan {plan.id}: {" ".join(e.messages)}')
+                continue
+            created += 1
+            self.stdout.write(
+                f'Plan {plan.id} -> {new_plan.id}: '
+                + ', '.join(f'{count} {name.replace("_", " ")}' for name, count in counts.items())
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Rolled over {created} plans, skipped {skipped}'))
@@ -0,0 +1,58 @@
+from django.db import migrations
+import organizations.models
+
+FISCAL_MONTHS = ['JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC', 'JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN']
+FISCAL_QUARTERS = ['Q1', 'Q2', 'Q3', 'Q4']
+MONTH_ALIASES = {
+    'HAMLE': 'JUL', 'NEHASE': 'AUG', 'MESKEREM': 'SEP', 'TIKIMT': 'OCT',
+    'HIDAR': 'NOV', 'TAHSAS': 'DEC', 'TIR': 'JAN', 'YEKATIT': 'FEB',
+    'MEGABIT': 'MAR', 'MIAZIA': 'APR', 'GINBOT': 'MAY', 'SENE': 'JUN',
+}
+
+def to_mask(values, names, aliases=None):
+    mask = 0
+    for value in values or []:
+        value = str(value).strip().upper()
+        value = (aliases or {}).get(value, value)
+        if value in names:
+            mask |= 1 << names.index(value)
+    return mask
+
+def backfill_schedule_masks(apps, schema_editor):
+    """
+    Compute the bitmasks for existing activities from their JSON selections
+    """
+    MainActivity = apps.get_model('organizations', 'MainActivity')
+    batch = []
+    for activity in MainActivity.objects.only('id', 'selected_months', 'selected_quarters').iterator(chunk_size=1000):
+        activity.months_mask = to_mask(activity.selected_months, FISCAL_MONTHS, MONTH_ALIASES)
+        activity.quarters_mask = to_mask(activity.selected_quarters, FISCAL_QUARTERS)
+        batch.append(activity)
+        if len(batch) >= 1000:
+            MainActivity.objects.bulk_update(batch, ['months_mask', 'quarters_mask'])
+            batch = []
+    if batch:
+        MainActivity.objects.bulk_update(batch, ['months_mask', 'quarters_mask'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0005_update_baseline_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mainactivity',
+            name='months_mask',
+            field=organizations.models.BitmaskField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mainactivity',
+            name='quarters_mask',
+            field=organizations.models.BitmaskField(default=0),
+        ),
+        migrations.RunPython(
+            backfill_schedule_masks,
+            reverse_code=migrations.RunPython.noop
+        ),
+    ]
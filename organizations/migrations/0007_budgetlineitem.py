@@ -0,0 +1,56 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0006_mainactivity_schedule_masks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetLineItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cost_type', models.CharField(choices=[
+                    ('per_diem', 'Per Diem'),
+                    ('accommodation', 'Accommodation'),
+                    ('venue', 'Venue'),
+                    ('transport_land', 'Land Transport'),
+                    ('transport_air', 'Air Transport'),
+                    ('participant_flash_disk', 'Flash Disk (per participant)'),
+                    ('participant_stationary', 'Stationary (per participant)'),
+                    ('session_flip_chart', 'Flip Chart (per session)'),
+                    ('session_marker', 'Marker (per session)'),
+                    ('session_toner_paper', 'Toner and Paper (per session)'),
+                    ('supervisor_mobile_card_300', 'Mobile Card 300 (per supervisor)'),
+                    ('supervisor_mobile_card_500', 'Mobile Card 500 (per supervisor)'),
+                    ('supervisor_stationary', 'Stationary (per supervisor)'),
+                    ('printing', 'Printing (per page)'),
+                    ('procurement', 'Procurement Item'),
+                    ('other', 'Other Costs')
+                ], max_length=30)),
+                ('location', models.CharField(blank=True, choices=[
+                    ('Addis_Ababa', 'Addis Ababa'),
+                    ('Adama', 'Adama'),
+                    ('Bahirdar', 'Bahirdar'),
+                    ('Mekele', 'Mekele'),
+                    ('Hawassa', 'Hawassa'),
+                    ('Gambella', 'Gambella'),
+                    ('Afar', 'Afar'),
+                    ('Somali', 'Somali')
+                ], max_length=20, null=True)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('unit_rate', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('description', models.CharField(blank=True, default='', max_length=255)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='organizations.activitybudget')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['cost_type', 'location'], name='idx_line_item_cost_location'),
+                    models.Index(fields=['location'], name='idx_line_item_location'),
+                ],
+            },
+        ),
+    ]
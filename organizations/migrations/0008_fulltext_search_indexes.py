@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# (model, index name, columns) for the MySQL FULLTEXT indexes used by search
+FULLTEXT_INDEXES = [
+    ('StrategicObjective', 'ft_objective_text', ['title', 'description']),
+    ('Program', 'ft_program_name', ['name']),
+    ('SubProgram', 'ft_subprogram_name', ['name']),
+    ('StrategicInitiative', 'ft_initiative_name', ['name']),
+    ('PerformanceMeasure', 'ft_measure_name', ['name']),
+    ('MainActivity', 'ft_activity_name', ['name']),
+]
+
+def create_fulltext_indexes(apps, schema_editor):
+    """
+    FULLTEXT indexes only exist on MySQL; other databases search with the
+    in-process trigram index instead
+    """
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    quote = schema_editor.quote_name
+    for model_name, index_name, columns in FULLTEXT_INDEXES:
+        table = apps.get_model('organizations', model_name)._meta.db_table
+        schema_editor.execute(
+            f'CREATE FULLTEXT INDEX {quote(index_name)} ON {quote(table)} '
+            f'({", ".join(quote(column) for column in columns)})'
+        )
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    quote = schema_editor.quote_name
+    for model_name, index_name, _ in FULLTEXT_INDEXES:
+        table = apps.get_model('organizations', model_name)._meta.db_table
+        schema_editor.execute(f'DROP INDEX {quote(index_name)} ON {quote(table)}')
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0007_budgetlineitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_fulltext_indexes,
+            reverse_code=drop_fulltext_indexes
+        ),
+    ]
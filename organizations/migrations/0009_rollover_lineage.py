@@ -0,0 +1,26 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0008_fulltext_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='strategicinitiative',
+            name='fiscal_year',
+            field=models.CharField(blank=True, db_index=True, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='strategicinitiative',
+            name='rolled_over_from',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='organizations.strategicinitiative'),
+        ),
+        migrations.AddField(
+            model_name='mainactivity',
+            name='rolled_over_from',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='organizations.mainactivity'),
+        ),
+    ]
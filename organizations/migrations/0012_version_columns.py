@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0011_planrevision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='strategicinitiative',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='performancemeasure',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='mainactivity',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='activitybudget',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='plan',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
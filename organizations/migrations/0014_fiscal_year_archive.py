@@ -0,0 +1,170 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import organizations.models
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('organizations', '0013_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedStrategicInitiative',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('name', models.CharField(max_length=255)),
+                ('weight', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('fiscal_year', models.CharField(blank=True, db_index=True, max_length=10, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.program')),
+                ('rolled_over_from', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='organizations.archivedstrategicinitiative')),
+                ('strategic_objective', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.strategicobjective')),
+                ('subprogram', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.subprogram')),
+            ],
+            options={
+                'db_table': 'organizations_archived_strategicinitiative',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPerformanceMeasure',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('name', models.CharField(max_length=255)),
+                ('weight', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('baseline', models.CharField(blank=True, default='', max_length=255)),
+                ('q1_target', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Q1 Target (Jul-Sep)')),
+                ('q2_target', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Q2 Target (Oct-Dec)')),
+                ('q3_target', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Q3 Target (Jan-Mar)')),
+                ('q4_target', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Q4 Target (Apr-Jun)')),
+                ('annual_target', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('initiative', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='performance_measures', to='organizations.archivedstrategicinitiative')),
+            ],
+            options={
+                'db_table': 'organizations_archived_performancemeasure',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedMainActivity',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('name', models.CharField(max_length=255)),
+                ('weight', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('selected_months', models.JSONField(blank=True, null=True)),
+                ('selected_quarters', models.JSONField(blank=True, null=True)),
+                ('months_mask', organizations.models.BitmaskField(default=0)),
+                ('quarters_mask', organizations.models.BitmaskField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('initiative', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='main_activities', to='organizations.archivedstrategicinitiative')),
+                ('rolled_over_from', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='organizations.archivedmainactivity')),
+            ],
+            options={
+                'db_table': 'organizations_archived_mainactivity',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedActivityBudget',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('budget_calculation_type', models.CharField(choices=[('WITH_TOOL', 'With Tool'), ('WITHOUT_TOOL', 'Without Tool')], default='WITHOUT_TOOL', max_length=20)),
+                ('activity_type', models.CharField(blank=True, choices=[('Training', 'Training'), ('Meeting', 'Meeting'), ('Workshop', 'Workshop'), ('Printing', 'Printing'), ('Supervision', 'Supervision'), ('Procurement', 'Procurement'), ('Other', 'Other')], max_length=20, null=True)),
+                ('estimated_cost_with_tool', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('estimated_cost_without_tool', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('government_treasury', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('sdg_funding', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('partners_funding', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('other_funding', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('training_details', models.JSONField(blank=True, null=True)),
+                ('meeting_workshop_details', models.JSONField(blank=True, null=True)),
+                ('procurement_details', models.JSONField(blank=True, null=True)),
+                ('printing_details', models.JSONField(blank=True, null=True)),
+                ('supervision_details', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('activity', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='budget', to='organizations.archivedmainactivity')),
+            ],
+            options={
+                'db_table': 'organizations_archived_activitybudget',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedBudgetLineItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('cost_type', models.CharField(choices=[('per_diem', 'Per Diem'), ('accommodation', 'Accommodation'), ('venue', 'Venue'), ('transport_land', 'Land Transport'), ('transport_air', 'Air Transport'), ('participant_flash_disk', 'Flash Disk (per participant)'), ('participant_stationary', 'Stationary (per participant)'), ('session_flip_chart', 'Flip Chart (per session)'), ('session_marker', 'Marker (per session)'), ('session_toner_paper', 'Toner and Paper (per session)'), ('supervisor_mobile_card_300', 'Mobile Card 300 (per supervisor)'), ('supervisor_mobile_card_500', 'Mobile Card 500 (per supervisor)'), ('supervisor_stationary', 'Stationary (per supervisor)'), ('printing', 'Printing (per page)'), ('procurement', 'Procurement Item'), ('other', 'Other Costs')], max_length=30)),
+                ('location', models.CharField(blank=True, choices=[('Addis_Ababa', 'Addis Ababa'), ('Adama', 'Adama'), ('Bahirdar', 'Bahirdar'), ('Mekele', 'Mekele'), ('Hawassa', 'Hawassa'), ('Gambella', 'Gambella'), ('Afar', 'Afar'), ('Somali', 'Somali')], max_length=20, null=True)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('unit_rate', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('description', models.CharField(blank=True, default='', max_length=255)),
+                ('budget', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='line_items', to='organizations.archivedactivitybudget')),
+            ],
+            options={
+                'db_table': 'organizations_archived_budgetlineitem',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPlan',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('planner_name', models.CharField(max_length=255)),
+                ('type', models.CharField(choices=[('LEAD_EXECUTIVE', 'Lead Executive'), ('TEAM_DESK', 'Team/Desk'), ('INDIVIDUAL', 'Individual')], max_length=20)),
+                ('executive_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('fiscal_year', models.CharField(db_index=True, max_length=10)),
+                ('from_date', models.DateField()),
+                ('to_date', models.DateField()),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('SUBMITTED', 'Submitted'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected')], default='DRAFT', max_length=20)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.organization')),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.program')),
+                ('strategic_objective', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.strategicobjective')),
+                ('subprogram', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.subprogram')),
+            ],
+            options={
+                'db_table': 'organizations_archived_plan',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPlanReview',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('APPROVED', 'Approved'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('feedback', models.TextField()),
+                ('reviewed_at', models.DateTimeField()),
+                ('evaluator', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='organizations.organizationuser')),
+                ('plan', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='reviews', to='organizations.archivedplan')),
+            ],
+            options={
+                'db_table': 'organizations_archived_planreview',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPlanRevision',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('number', models.PositiveIntegerField()),
+                ('is_checkpoint', models.BooleanField(default=False)),
+                ('data', models.JSONField()),
+                ('reason', models.CharField(blank=True, default='', max_length=50)),
+                ('created_at', models.DateTimeField()),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('plan', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='revisions', to='organizations.archivedplan')),
+            ],
+            options={
+                'db_table': 'organizations_archived_planrevision',
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+import datetime
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+import django.utils.timezone
+
+
+def record_rates_as_of(apps, schema_editor):
+    # Line items were last priced when the budget was last saved
+    for model_name in ('ActivityBudget', 'ArchivedActivityBudget'):
+        model = apps.get_model('organizations', model_name)
+        model.objects.filter(rates_as_of__isnull=True).update(rates_as_of=TruncDate('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0014_fiscal_year_archive'),
+    ]
+
+    operations = [
+        # Existing rates have always been in effect
+        migrations.AddField(
+            model_name='activitycostingassumption',
+            name='effective_from',
+            field=models.DateField(default=datetime.date(1900, 1, 1)),
+        ),
+        migrations.AlterField(
+            model_name='activitycostingassumption',
+            name='effective_from',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AlterUniqueTogether(
+            name='activitycostingassumption',
+            unique_together={('activity_type', 'location', 'cost_type', 'effective_from')},
+        ),
+        migrations.AddField(
+            model_name='activitybudget',
+            name='rates_as_of',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedactivitybudget',
+            name='rates_as_of',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(record_rates_as_of, migrations.RunPython.noop),
+    ]
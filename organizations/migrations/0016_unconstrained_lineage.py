@@ -0,0 +1,24 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0015_effective_dated_rates'),
+    ]
+
+    operations = [
+        # Archival moves rolled-over sources out of the hot tables without
+        # touching the rows that point at them
+        migrations.AlterField(
+            model_name='strategicinitiative',
+            name='rolled_over_from',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='organizations.strategicinitiative'),
+        ),
+        migrations.AlterField(
+            model_name='mainactivity',
+            name='rolled_over_from',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='organizations.mainactivity'),
+        ),
+    ]
@@ -1,6 +1,134 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from decimal import Decimal
+from . import costing
+
+# Fiscal year months in order (July to June); bit i of a months mask is FISCAL_MONTHS[i]
+FISCAL_MONTHS = ['JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC', 'JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN']
+FISCAL_QUARTERS = ['Q1', 'Q2', 'Q3', 'Q4']
+
+# Ethiopian month names accepted as aliases of the fiscal month codes
+MONTH_ALIASES = {
+    'HAMLE': 'JUL', 'NEHASE': 'AUG', 'MESKEREM': 'SEP', 'TIKIMT': 'OCT',
+    'HIDAR': 'NOV', 'TAHSAS': 'DEC', 'TIR': 'JAN', 'YEKATIT': 'FEB',
+    'MEGABIT': 'MAR', 'MIAZIA': 'APR', 'GINBOT': 'MAY', 'SENE': 'JUN',
+}
+
+def normalize_month(month):
+    """Return the fiscal month code for a code or alias, or None if unknown"""
+    month = str(month).strip().upper()
+    month = MONTH_ALIASES.get(month, month)
+    return month if month in FISCAL_MONTHS else None
+
+def month_bit(month):
+    return 1 << FISCAL_MONTHS.index(month)
+
+def quarter_bit(quarter):
+    return 1 << FISCAL_QUARTERS.index(quarter)
+
+def months_to_mask(months):
+    mask = 0
+    for month in months or []:
+        month = normalize_month(month)
+        if month:
+            mask |= month_bit(month)
+    return mask
+
+def quarters_to_mask(quarters):
+    mask = 0
+    for quarter in quarters or []:
+        quarter = str(quarter).strip().upper()
+        if quarter in FISCAL_QUARTERS:
+            mask |= quarter_bit(quarter)
+    return mask
+
+class BitmaskField(models.PositiveSmallIntegerField):
+    """Small integer holding a set of flags, filterable with `__hasany=<bits>`"""
+
+@BitmaskField.register_lookup
+class HasAnyBits(models.Lookup):
+    lookup_name = 'hasany'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'({lhs} & {rhs}) != 0', lhs_params + rhs_params
+
+def objective_filter(objective_ids, prefix=''):
+    """
+    Q matching initiative rows (or rows below them, via `prefix`) that belong
+    to the given strategic objectives, whichever parent the initiative uses
+    """
+    return (
+        models.Q(**{f'{prefix}strategic_objective__in': objective_ids}) |
+        models.Q(**{f'{prefix}program__strategic_objective__in': objective_ids}) |
+        models.Q(**{f'{prefix}subprogram__program__strategic_objective__in': objective_ids})
+    )
+
+def fiscal_year_filter(fiscal_year, prefix=''):
+    """
+    Q matching the initiatives (or rows below them, via `prefix`) of a fiscal
+    year: those dated to it, and undated ones not rolled over into it yet
+    (there the rolled-over copy takes their place)
+    """
+    rolled_over = StrategicInitiative.objects.filter(
+        fiscal_year=fiscal_year, rolled_over_from__isnull=False
+    ).values('rolled_over_from')
+    return models.Q(**{f'{prefix}fiscal_year': fiscal_year}) | (
+        models.Q(**{f'{prefix}fiscal_year__isnull': True}) & ~models.Q(**{f'{prefix}id__in': rolled_over})
+    )
+
+def in_fiscal_year(rows, fiscal_year):
+    """
+    The initiative rows (dicts with id, fiscal_year and rolled_over_from_id,
+    all under one objective) that fiscal_year_filter() would match
+    """
+    rolled_over = {row['rolled_over_from_id'] for row in rows if row['fiscal_year'] == fiscal_year}
+    return [
+        row for row in rows
+        if row['fiscal_year'] == fiscal_year or (row['fiscal_year'] is None and row['id'] not in rolled_over)
+    ]
+
+class VersionConflict(Exception):
+    """A versioned row was changed by someone else since it was read"""
+
+    def __init__(self, instance):
+        super().__init__(f'{instance._meta.verbose_name} {instance.pk} was changed by someone else')
+        self.instance = instance
+
+class VersionedModel(models.Model):
+    """
+    Optimistic concurrency: every UPDATE is conditional on the version the
+    instance was read with (`UPDATE ... SET version = version + 1 WHERE
+    id = %s AND version = %s`) and raises VersionConflict if the row has
+    moved on. Set `version` to the client's copy to check against that instead.
+    """
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.version = 1
+        super().save(*args, **kwargs)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = self.version
+        values = [value for value in values if value[0].attname != 'version']
+        values.append((self._meta.get_field('version'), None, models.F('version') + 1))
+        updated = super()._do_update(
+            base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update
+        )
+        if updated:
+            self.version = expected + 1
+        elif base_qs.filter(pk=pk_val).exists():
+            raise VersionConflict(self)
+        return updated
 
 class Organization(models.Model):
     ORGANIZATION_TYPES = [
@@ -26,7 +154,7 @@ class Organization(models.Model):
     mission = models.TextField(null=True, blank=True)
     core_values = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return self.name
@@ -61,7 +189,7 @@ class StrategicObjective(models.Model):
         ]
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def clean(self):
         # Validate logic (in addition to field validators)
@@ -84,7 +212,7 @@ class Program(models.Model):
     description = models.TextField(null=True, blank=True)
     weight = models.DecimalField(max_digits=5, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def clean(self):
         super().clean()
@@ -121,7 +249,7 @@ class SubProgram(models.Model):
     description = models.TextField(null=True, blank=True)
     weight = models.DecimalField(max_digits=5, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def clean(self):
         super().clean()
@@ -148,7 +276,7 @@ class SubProgram(models.Model):
     def __str__(self):
         return self.name
 
-class StrategicInitiative(models.Model):
+class StrategicInitiative(VersionedModel):
     name = models.CharField(max_length=255)
     weight = models.DecimalField(max_digits=5, decimal_places=2)
     strategic_objective = models.ForeignKey(
@@ -172,8 +300,19 @@ class StrategicInitiative(models.Model):
         null=True,
         blank=True
     )
+    # Fiscal year the initiative was rolled over into (null for hand-made initiatives)
+    fiscal_year = models.CharField(max_length=10, null=True, blank=True, db_index=True)
+    # Unconstrained: the source row may have been archived (same primary key)
+    rolled_over_from = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         constraints = [
@@ -221,7 +360,7 @@ class StrategicInitiative(models.Model):
     def __str__(self):
         return self.name
 
-class PerformanceMeasure(models.Model):
+class PerformanceMeasure(VersionedModel):
     initiative = models.ForeignKey(
         StrategicInitiative,
         on_delete=models.CASCADE,
@@ -260,7 +399,7 @@ class PerformanceMeasure(models.Model):
         default=0
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def clean(self):
         super().clean()
@@ -291,7 +430,7 @@ class PerformanceMeasure(models.Model):
     def __str__(self):
         return self.name
 
-class MainActivity(models.Model):
+class MainActivity(VersionedModel):
     initiative = models.ForeignKey(
         StrategicInitiative,
         on_delete=models.CASCADE,
@@ -301,8 +440,20 @@ class MainActivity(models.Model):
     weight = models.DecimalField(max_digits=5, decimal_places=2)
     selected_months = models.JSONField(null=True, blank=True)
     selected_quarters = models.JSONField(null=True, blank=True)
+    # Bitmasks mirroring the JSON selections so schedules can be queried in SQL
+    months_mask = BitmaskField(default=0)
+    quarters_mask = BitmaskField(default=0)
+    # Unconstrained: the source row may have been archived (same primary key)
+    rolled_over_from = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def clean(self):
         super().clean()
@@ -333,12 +484,32 @@ class MainActivity(models.Model):
     
     def save(self, *args, **kwargs):
         self.clean()
+        self.months_mask = months_to_mask(self.selected_months)
+        self.quarters_mask = quarters_to_mask(self.selected_quarters)
         super().save(*args, **kwargs)
+
+    @staticmethod
+    def running_in_month(month, prefix=''):
+        """Q matching activities scheduled in a month, directly or via its quarter"""
+        quarter = FISCAL_QUARTERS[FISCAL_MONTHS.index(month) // 3]
+        return (
+            models.Q(**{f'{prefix}months_mask__hasany': month_bit(month)}) |
+            models.Q(**{f'{prefix}quarters_mask__hasany': quarter_bit(quarter)})
+        )
+
+    @staticmethod
+    def running_in_quarter(quarter, prefix=''):
+        """Q matching activities scheduled in any month of a quarter"""
+        months_bits = 0b111 << (FISCAL_QUARTERS.index(quarter) * 3)
+        return (
+            models.Q(**{f'{prefix}months_mask__hasany': months_bits}) |
+            models.Q(**{f'{prefix}quarters_mask__hasany': quarter_bit(quarter)})
+        )
     
     def __str__(self):
         return self.name
 
-class ActivityBudget(models.Model):
+class ActivityBudget(VersionedModel):
     BUDGET_CALCULATION_TYPES = [
         ('WITH_TOOL', 'With Tool'),
         ('WITHOUT_TOOL', 'Without Tool')
@@ -405,8 +576,21 @@ class ActivityBudget(models.Model):
     procurement_details = models.JSONField(null=True, blank=True)
     printing_details = models.JSONField(null=True, blank=True)
     supervision_details = models.JSONField(null=True, blank=True)
+    # Date of the costing rates the line items are priced with; kept on later
+    # saves, so new rate versions do not reprice the budget
+    rates_as_of = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Costing tool details field used by each activity type
+    DETAILS_FIELDS = {
+        'Training': 'training_details',
+        'Meeting': 'meeting_workshop_details',
+        'Workshop': 'meeting_workshop_details',
+        'Procurement': 'procurement_details',
+        'Printing': 'printing_details',
+        'Supervision': 'supervision_details',
+    }
 
     def clean(self):
         super().clean()
@@ -434,11 +618,36 @@ class ActivityBudget(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
-        super().save(*args, **kwargs)
+        if self.rates_as_of is None:
+            self.rates_as_of = timezone.localdate()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.sync_line_items()
 
     def __str__(self):
         return f"Budget for {self.activity.name}"
 
+    @property
+    def tool_details(self):
+        """Details payload of the costing tool matching the activity type"""
+        field = self.DETAILS_FIELDS.get(self.activity_type)
+        return getattr(self, field) if field else None
+
+    def build_line_items(self, rates):
+        """Unsaved BudgetLineItems for this budget (none unless costed with a tool)"""
+        if self.budget_calculation_type != 'WITH_TOOL':
+            return []
+        return [
+            BudgetLineItem(budget=self, **item._asdict())
+            for item in costing.line_items(self.activity_type, self.tool_details, rates)
+        ]
+
+    def sync_line_items(self, rates=None):
+        """Replace this budget's line items with ones derived from its details"""
+        items = self.build_line_items(rates or costing.RateTable.load(as_of=self.rates_as_of))
+        BudgetLineItem.objects.filter(budget=self).delete()
+        BudgetLineItem.objects.bulk_create(items)
+
     @property
     def total_funding(self):
         return (
@@ -460,6 +669,29 @@ class ActivityBudget(models.Model):
     def funding_gap(self):
         return self.estimated_cost - self.total_funding
 
+    @staticmethod
+    def estimated_cost_expression(prefix=''):
+        """SQL expression equivalent to the `estimated_cost` property"""
+        return models.Case(
+            models.When(
+                **{f'{prefix}budget_calculation_type': 'WITH_TOOL'},
+                then=models.F(f'{prefix}estimated_cost_with_tool')
+            ),
+            default=models.F(f'{prefix}estimated_cost_without_tool'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+
+    @staticmethod
+    def total_funding_expression(prefix=''):
+        """SQL expression equivalent to the `total_funding` property"""
+        return models.ExpressionWrapper(
+            models.F(f'{prefix}government_treasury') +
+            models.F(f'{prefix}sdg_funding') +
+            models.F(f'{prefix}partners_funding') +
+            models.F(f'{prefix}other_funding'),
+            output_field=models.DecimalField(max_digits=14, decimal_places=2)
+        )
+
 class ActivityCostingAssumption(models.Model):
     ACTIVITY_TYPES = [
         ('Training', 'Training'),
@@ -500,16 +732,90 @@ class ActivityCostingAssumption(models.Model):
     cost_type = models.CharField(max_length=30, choices=COST_TYPES)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     description = models.TextField(null=True, blank=True)
+    # The rate applies from this date until the next version of it starts
+    effective_from = models.DateField(default=timezone.localdate)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Changing these on a version in effect would reprice the budgets costed with it
+    RATE_FIELDS = ('activity_type', 'location', 'cost_type', 'amount', 'effective_from')
 
     class Meta:
-        unique_together = ('activity_type', 'location', 'cost_type')
-        
+        # Also the index of as-of lookups
+        unique_together = ('activity_type', 'location', 'cost_type', 'effective_from')
+
+    def in_effect(self):
+        return self.effective_from <= timezone.localdate()
+
+    def clean(self):
+        super().clean()
+
+        today = timezone.localdate()
+        stored = None
+        if self.pk is not None:
+            stored = ActivityCostingAssumption.objects.filter(pk=self.pk).values(*self.RATE_FIELDS).first()
+
+        if stored is not None and stored['effective_from'] <= today:
+            if any(stored[field] != getattr(self, field) for field in self.RATE_FIELDS):
+                raise ValidationError(
+                    'A rate in effect cannot be changed; add a version with a later effective_from instead'
+                )
+        elif self.effective_from < today:
+            raise ValidationError('A rate version cannot start in the past')
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        if self.in_effect():
+            raise ValidationError('A rate in effect cannot be deleted')
+        return super().delete(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.activity_type} - {self.location} - {self.cost_type}: {self.amount} from {self.effective_from}"
+
+class BudgetLineItem(models.Model):
+    """
+    One typed cost line of an ActivityBudget, derived from its *_details
+    JSON so costs can be aggregated in SQL
+    """
+    COST_TYPES = ActivityCostingAssumption.COST_TYPES + [
+        ('supervisor_mobile_card_300', 'Mobile Card 300 (per supervisor)'),
+        ('supervisor_mobile_card_500', 'Mobile Card 500 (per supervisor)'),
+        ('supervisor_stationary', 'Stationary (per supervisor)'),
+        ('printing', 'Printing (per page)'),
+        ('procurement', 'Procurement Item'),
+        ('other', 'Other Costs')
+    ]
+
+    budget = models.ForeignKey(
+        ActivityBudget,
+        on_delete=models.CASCADE,
+        related_name='line_items'
+    )
+    cost_type = models.CharField(max_length=30, choices=COST_TYPES)
+    location = models.CharField(
+        max_length=20,
+        choices=ActivityCostingAssumption.LOCATIONS,
+        null=True,
+        blank=True
+    )
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    unit_rate = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    description = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cost_type', 'location'], name='idx_line_item_cost_location'),
+            models.Index(fields=['location'], name='idx_line_item_location'),
+        ]
+
     def __str__(self):
-        return f"{self.activity_type} - {self.location} - {self.cost_type}: {self.amount}"
+        return f"{self.cost_type}: {self.amount}"
 
-class Plan(models.Model):
+class Plan(VersionedModel):
     PLAN_TYPES = [
         ('LEAD_EXECUTIVE', 'Lead Executive'),
         ('TEAM_DESK', 'Team/Desk'),
@@ -560,7 +866,7 @@ class Plan(models.Model):
     )
     submitted_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"{self.organization.name} - {self.strategic_objective} - {self.fiscal_year}"
@@ -579,22 +885,33 @@ class Plan(models.Model):
             
         # If submitting a plan, check for duplicate submissions
         if self.status == 'SUBMITTED' or self.status == 'APPROVED':
-            # Check for existing approved/submitted plans with same organization + objective/program/subprogram
+            # Check for existing approved/submitted plans with same organization + objective for the same year
             existing_plans = Plan.objects.filter(
                 organization=self.organization,
                 strategic_objective=self.strategic_objective,
+                fiscal_year=self.fiscal_year,
                 status__in=['SUBMITTED', 'APPROVED']
             ).exclude(id=self.id)
             
             if existing_plans.exists():
                 raise ValidationError(
-                    'A plan for this organization and strategic objective has already been submitted or approved'
+                    'A plan for this organization and strategic objective has already been submitted or approved for this fiscal year'
                 )
     
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
 
+    def initiatives(self):
+        """
+        Initiatives under this plan's strategic objective for its fiscal year
+        (initiatives not tied to a fiscal year belong to every year they have
+        not been rolled over into)
+        """
+        return StrategicInitiative.objects.filter(
+            objective_filter([self.strategic_objective_id])
+        ).filter(fiscal_year_filter(self.fiscal_year))
+
 class PlanReview(models.Model):
     REVIEW_STATUS = [
         ('APPROVED', 'Approved'),
@@ -617,4 +934,183 @@ class PlanReview(models.Model):
     reviewed_at = models.DateTimeField()
     
     def __str__(self):
-        return f"Review of {self.plan} by {self.evaluator.user.username}" if self.evaluator else f"Review of {self.plan}"
\ No newline at end of file
+        return f"Review of {self.plan} by {self.evaluator.user.username}" if self.evaluator else f"Review of {self.plan}"
+
+class PlanRevision(models.Model):
+    """
+    One revision of a plan and its subtree. Checkpoints store a full
+    snapshot; other revisions store a structural diff against the previous
+    revision (see organizations.revisions).
+    """
+    plan = models.ForeignKey(
+        Plan,
+        on_delete=models.CASCADE,
+        related_name='revisions'
+    )
+    number = models.PositiveIntegerField()
+    is_checkpoint = models.BooleanField(default=False)
+    data = models.JSONField()
+    reason = models.CharField(max_length=50, blank=True, default='')
+    created_by = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('plan', 'number')
+        ordering = ['plan', 'number']
+
+    def __str__(self):
+        return f"Revision {self.number} of plan {self.plan_id}"
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted row, so delta-sync clients can learn about deletions
+    (including cascaded ones) since their last cursor
+    """
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'deleted_at'], name='idx_tombstone_model_deleted'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at {self.deleted_at}"
+
+class IdempotencyKey(models.Model):
+    """
+    Outcome of a mutating request sent with an Idempotency-Key header, so
+    retries of it are answered from here (see organizations.idempotency)
+    """
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='+')
+    request_hash = models.CharField(max_length=64)
+    # Null while the first request is still being processed
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    # Response headers replayed along with the body (ETag, Location)
+    headers = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"Idempotency key {self.key} of user {self.user_id}"
+
+def archive_model(model, parents=None):
+    """
+    Archive table with the columns of `model`, holding its rows for closed
+    fiscal years (see organizations.archive). Rows keep their primary keys.
+    `parents` maps foreign keys to the archive model of their target; those
+    and self-references are unconstrained, because archival and restore move
+    children and parents in separate batches. Other foreign keys keep their
+    target, without reverse accessors. Timestamps are copied, not set.
+    Only fiscal_year (and foreign keys) are indexed.
+    """
+    parents = parents or {}
+    attrs = {'__module__': __name__}
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            attrs[field.name] = models.BigIntegerField(primary_key=True)
+            continue
+        if field.is_relation:
+            target = field.remote_field.model
+            if field.name in parents or target in (model, 'self'):
+                attrs[field.name] = type(field)(
+                    parents.get(field.name, 'self'),
+                    on_delete=models.DO_NOTHING,
+                    db_constraint=False,
+                    null=field.null,
+                    blank=field.blank,
+                    related_name=field.remote_field.related_name if field.name in parents else '+'
+                )
+            else:
+                attrs[field.name] = type(field)(
+                    target,
+                    on_delete=field.remote_field.on_delete,
+                    null=field.null,
+                    blank=field.blank,
+                    related_name='+'
+                )
+            continue
+        name, path, args, kwargs = field.deconstruct()
+        kwargs.pop('auto_now', None)
+        kwargs.pop('auto_now_add', None)
+        # Archive reads are always by fiscal year, so that is the only index
+        kwargs.pop('db_index', None)
+        if name == 'fiscal_year':
+            kwargs['db_index'] = True
+        attrs[name] = type(field)(*args, **kwargs)
+
+    attrs['Meta'] = type('Meta', (), {'db_table': f'organizations_archived_{model._meta.model_name}'})
+    attrs['__str__'] = lambda self: f"Archived {model._meta.verbose_name} {self.pk}"
+    return type(f'Archived{model.__name__}', (models.Model,), attrs)
+
+ArchivedStrategicInitiative = archive_model(StrategicInitiative)
+ArchivedPerformanceMeasure = archive_model(PerformanceMeasure, {'initiative': ArchivedStrategicInitiative})
+ArchivedMainActivity = archive_model(MainActivity, {'initiative': ArchivedStrategicInitiative})
+ArchivedActivityBudget = archive_model(ActivityBudget, {'activity': ArchivedMainActivity})
+ArchivedBudgetLineItem = archive_model(BudgetLineItem, {'budget': ArchivedActivityBudget})
+ArchivedPlan = archive_model(Plan)
+ArchivedPlanReview = archive_model(PlanReview, {'plan': ArchivedPlan})
+ArchivedPlanRevision = archive_model(PlanRevision, {'plan': ArchivedPlan})
+
+# Hot model -> archive model
+ARCHIVE_MODELS = {
+    StrategicInitiative: ArchivedStrategicInitiative,
+    PerformanceMeasure: ArchivedPerformanceMeasure,
+    MainActivity: ArchivedMainActivity,
+    ActivityBudget: ArchivedActivityBudget,
+    BudgetLineItem: ArchivedBudgetLineItem,
+    Plan: ArchivedPlan,
+    PlanReview: ArchivedPlanReview,
+    PlanRevision: ArchivedPlanRevision,
+}
+
+# Models served by delta-sync endpoints; deletions of these leave a tombstone
+SYNC_MODELS = [
+    Organization, StrategicObjective, Program, SubProgram, StrategicInitiative,
+    PerformanceMeasure, MainActivity, ActivityBudget, ActivityCostingAssumption, Plan
+]
+
+def record_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(model=sender._meta.model_name, object_id=instance.pk)
+
+for sync_model in SYNC_MODELS:
+    post_delete.connect(record_tombstone, sender=sync_model, dispatch_uid=f'tombstone_{sync_model.__name__}')
+
+def invalidate_rate_history(sender, instance, **kwargs):
+    """Have every process reload the costing rates once the change is committed"""
+    transaction.on_commit(costing.invalidate_rate_history)
+
+post_save.connect(invalidate_rate_history, sender=ActivityCostingAssumption, dispatch_uid='rate_history_save')
+post_delete.connect(invalidate_rate_history, sender=ActivityCostingAssumption, dispatch_uid='rate_history_delete')
+
+def check_auth_cache_key(user_id):
+    return f'check_auth:{user_id}'
+
+def invalidate_check_auth(sender, instance, **kwargs):
+    """Drop the cached check_auth payloads this user, membership or organization appears in"""
+    if sender is Organization:
+        user_ids = set(OrganizationUser.objects.filter(organization=instance).values_list('user_id', flat=True))
+    elif sender is OrganizationUser:
+        user_ids = {instance.user_id}
+    else:
+        user_ids = {instance.pk}
+    cache.delete_many([check_auth_cache_key(user_id) for user_id in user_ids])
+
+# Senders of the rows a check_auth payload is built from
+CHECK_AUTH_MODELS = {'organization': Organization, 'organizationuser': OrganizationUser, 'user': 'auth.User'}
+
+for name, auth_model in CHECK_AUTH_MODELS.items():
+    post_save.connect(invalidate_check_auth, sender=auth_model, dispatch_uid=f'check_auth_save_{name}')
+    post_delete.connect(invalidate_check_auth, sender=auth_model, dispatch_uid=f'check_auth_delete_{name}')
@@ -0,0 +1,194 @@
+"""
+On-demand request profiling for staff.
+
+A staff user adds `X-Profile: 1` (or `?_profile=1`) to a request and it runs
+under cProfile with every SQL query recorded along with the project code
+that issued it. The profile is stored on disk and its id returned in the
+X-Profile-Id response header; the staff endpoints under /api/profiles/
+list the stored profiles, show one with its queries and slowest functions,
+and download the raw pstats file (for `python -m pstats`, snakeviz or
+flameprof).
+
+Profiling is opt-in per deployment: unless PROFILING_ENABLED is set the
+middleware is not installed at all. When it is, only requests asking for a
+profile with the value 1 go on to the staff check, so other requests never
+load the session. The store keeps the newest PROFILE_STORE_MAX profiles.
+"""
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+import traceback
+import uuid
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_PARAM = '_profile'
+RESPONSE_HEADER = 'X-Profile-Id'
+
+# Queries kept per profile, and project frames kept per query
+MAX_QUERIES = 2000
+STACK_DEPTH = 6
+
+PROFILE_ID_RE = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+
+# Modules whose frames are never a query's origin (the query wrappers themselves)
+WRAPPER_FILES = {__file__}
+
+
+def _store_dir():
+    os.makedirs(settings.PROFILE_STORE_DIR, exist_ok=True)
+    return settings.PROFILE_STORE_DIR
+
+
+def _path(profile_id, extension):
+    if not PROFILE_ID_RE.match(profile_id):
+        raise FileNotFoundError(profile_id)
+    return os.path.join(settings.PROFILE_STORE_DIR, f'{profile_id}.{extension}')
+
+
+def project_stack():
+    """The project frames of the current stack, innermost last, as file:line in function"""
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename
+        and frame.filename not in WRAPPER_FILES
+    ]
+    return [
+        f'{os.path.relpath(frame.filename, base)}:{frame.lineno} in {frame.name}'
+        for frame in frames[-STACK_DEPTH:]
+    ]
+
+
+class QueryRecorder:
+    """execute_wrapper recording each query's SQL, duration and originating code"""
+
+    def __init__(self):
+        self.queries = []
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.total += 1
+            if len(self.queries) < MAX_QUERIES:
+                stack = project_stack()
+                self.queries.append({
+                    'sql': sql,
+                    'many': many,
+                    'duration_ms': round(duration, 3),
+                    'origin': stack[-1] if stack else None,
+                    'stack': stack,
+                })
+
+
+def _prune():
+    """Drop the oldest profiles beyond PROFILE_STORE_MAX"""
+    ids = sorted(name[:-5] for name in os.listdir(_store_dir()) if name.endswith('.json'))
+    for profile_id in ids[:max(len(ids) - settings.PROFILE_STORE_MAX, 0)]:
+        for extension in ('json', 'prof'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(_path(profile_id, extension))
+
+
+def save_profile(profiler, recorder, request, response, duration):
+    profile_id = f'{time.strftime("%Y%m%dT%H%M%S", time.gmtime())}-{uuid.uuid4().hex[:8]}'
+    _store_dir()
+    profiler.dump_stats(_path(profile_id, 'prof'))
+    metadata = {
+        'id': profile_id,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'user': request.user.username,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 1),
+        'query_count': recorder.total,
+        'query_time_ms': round(sum(query['duration_ms'] for query in recorder.queries), 1),
+        'queries': recorder.queries,
+    }
+    with open(_path(profile_id, 'json'), 'w') as f:
+        json.dump(metadata, f)
+    _prune()
+    return profile_id
+
+
+def list_profiles():
+    """Stored profiles, newest first, without their queries"""
+    profiles = []
+    for name in sorted(os.listdir(_store_dir()), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        with contextlib.suppress(FileNotFoundError, ValueError):
+            with open(os.path.join(settings.PROFILE_STORE_DIR, name)) as f:
+                metadata = json.load(f)
+            metadata.pop('queries', None)
+            profiles.append(metadata)
+    return profiles
+
+
+def load_profile(profile_id, top=30):
+    """A stored profile with its queries and the `top` functions by cumulative time"""
+    with open(_path(profile_id, 'json')) as f:
+        metadata = json.load(f)
+    stats = pstats.Stats(_path(profile_id, 'prof'), stream=io.StringIO())
+    functions = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:top]
+    metadata['functions'] = [
+        {
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'own_ms': round(own * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in functions
+    ]
+    return metadata
+
+
+def pstats_path(profile_id):
+    path = _path(profile_id, 'prof')
+    if not os.path.exists(path):
+        raise FileNotFoundError(profile_id)
+    return path
+
+
+class ProfilingMiddleware:
+    """Profiles the rest of the request when a staff user asks for it"""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # The cheap checks come first, so other requests never load the session
+        if request.META.get(HEADER) != '1' and request.GET.get(QUERY_PARAM) != '1':
+            return self.get_response(request)
+        if not (request.user.is_authenticated and request.user.is_staff):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+
+        response[RESPONSE_HEADER] = save_profile(profiler, recorder, request, response, duration)
+        return response
@@ -0,0 +1,172 @@
+"""
+Repeated-query (N+1) detection.
+
+Every SQL statement of a request is fingerprinted, with literals, parameter
+placeholders and IN/VALUES lists collapsed, so the same lookup for different
+rows counts as one pattern. A pattern run more than QUERY_PATTERN_THRESHOLD
+times is reported with the project code that issued it.
+
+QUERY_PATTERN_MODE selects what happens to a request that repeats queries:
+'warn' logs it (staging), 'strict' raises RepeatedQueries so the test client
+fails the test, and 'off' (the default) does not install the middleware.
+Tests can also wrap any block in `detect_repeated_queries()`, and
+`manage.py check_query_patterns` runs the read endpoints through it.
+
+Views that repeat queries on purpose (e.g. the batch endpoint, which runs
+several calls in one request) are marked with @allow_repeated_queries;
+patterns matching QUERY_PATTERN_IGNORE are never counted.
+"""
+import collections
+import contextlib
+import logging
+import re
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from . import profiling
+
+logger = logging.getLogger(__name__)
+
+profiling.WRAPPER_FILES.add(__file__)
+
+MODES = ('off', 'warn', 'strict')
+
+# Call sites kept per repeated pattern
+MAX_ORIGINS = 5
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """The statement with every value replaced, so lookups for different rows match"""
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _LIST.sub('(...)', sql)
+    sql = _ROWS.sub(r'\1', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class RepeatedQueries(AssertionError):
+    """Raised in strict mode; an AssertionError so test runners report it as a failure"""
+
+    def __init__(self, patterns, label=''):
+        self.patterns = patterns
+        super().__init__(describe(patterns, label))
+
+
+def describe(patterns, label=''):
+    lines = [f'{label}{" " if label else ""}repeated {len(patterns)} quer{"y" if len(patterns) == 1 else "ies"}:']
+    for pattern in patterns:
+        lines.append(f'  {pattern["count"]}x {pattern["sql"]}')
+        lines.extend(f'    at {origin}' for origin in pattern['origins'])
+    return '\n'.join(lines)
+
+
+class QueryPatternDetector:
+    """execute_wrapper counting statements per fingerprint"""
+
+    def __init__(self, threshold=None, ignore=None):
+        self.threshold = settings.QUERY_PATTERN_THRESHOLD if threshold is None else threshold
+        ignore = settings.QUERY_PATTERN_IGNORE if ignore is None else ignore
+        self.ignore = [re.compile(pattern, re.IGNORECASE) for pattern in ignore]
+        self.counts = collections.Counter()
+        self.origins = collections.defaultdict(collections.Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        if not any(pattern.search(key) for pattern in self.ignore):
+            self.counts[key] += 1
+            # The stack is only walked once a pattern repeats, so clean requests stay cheap
+            if self.counts[key] > self.threshold:
+                stack = profiling.project_stack()
+                self.origins[key][stack[-1] if stack else '(outside the project)'] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """Patterns run more than `threshold` times, most repeated first"""
+        return [
+            {
+                'sql': sql,
+                'count': count,
+                'origins': [origin for origin, _ in self.origins[sql].most_common(MAX_ORIGINS)],
+            }
+            for sql, count in self.counts.most_common() if count > self.threshold
+        ]
+
+    def check(self, label=''):
+        patterns = self.repeated()
+        if patterns:
+            raise RepeatedQueries(patterns, label)
+
+    @contextlib.contextmanager
+    def watching(self, using=None):
+        aliases = [using] if using else list(connections)
+        with contextlib.ExitStack() as stack:
+            for alias in aliases:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+
+@contextlib.contextmanager
+def detect_repeated_queries(threshold=None, strict=True, using=None):
+    """
+    Count the queries of the block; with strict, raise RepeatedQueries on
+    leaving it if any pattern ran more than `threshold` times.
+
+        with detect_repeated_queries(threshold=3):
+            client.get('/api/plans/1/')
+    """
+    detector = QueryPatternDetector(threshold)
+    with detector.watching(using):
+        yield detector
+    if strict:
+        detector.check()
+
+
+def allow_repeated_queries(view):
+    """Exempt a view function or viewset action from the middleware"""
+    view.allow_repeated_queries = True
+    return view
+
+
+def _allowed(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return False
+    if getattr(match.func, 'allow_repeated_queries', False):
+        return True
+    # Viewset actions carry the flag on the method the router maps the HTTP method to
+    cls, actions = getattr(match.func, 'cls', None), getattr(match.func, 'actions', None) or {}
+    handler = getattr(cls, actions.get(request.method.lower(), ''), None)
+    return getattr(handler, 'allow_repeated_queries', False)
+
+
+class QueryPatternMiddleware:
+    """Reports requests that repeat a query more than QUERY_PATTERN_THRESHOLD times"""
+
+    def __init__(self, get_response):
+        if settings.QUERY_PATTERN_MODE not in MODES:
+            raise ValueError(f'QUERY_PATTERN_MODE must be one of {", ".join(MODES)}')
+        if settings.QUERY_PATTERN_MODE == 'off':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        detector = QueryPatternDetector()
+        with detector.watching():
+            response = self.get_response(request)
+
+        patterns = detector.repeated()
+        if not patterns or _allowed(request):
+            return response
+        label = f'{request.method} {request.path}'
+        if settings.QUERY_PATTERN_MODE == 'strict':
+            raise RepeatedQueries(patterns, label)
+        logger.warning(describe(patterns, label), extra={'repeated_queries': patterns})
+        return response
@@ -0,0 +1,163 @@
+"""
+Whole-plan readiness checks.
+
+Checks every weight and funding rule for a set of plans with a fixed number
+of grouped aggregate queries, however many plans, initiatives or activities
+are involved:
+
+    objectives_total      all strategic objectives must total 100%
+    programs_weight       programs cannot exceed their objective's weight
+    subprograms_weight    subprograms cannot exceed their program's weight
+    no_initiatives        a plan needs at least one initiative
+    measures_weight       each initiative's performance measures must total 35%
+    activities_weight     each initiative's main activities must total 65%
+    budget_funding        a budget's total funding cannot exceed its estimated cost
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from .models import (
+    StrategicObjective, Program, SubProgram, StrategicInitiative,
+    PerformanceMeasure, MainActivity, ActivityBudget, objective_filter, in_fiscal_year
+)
+
+OBJECTIVES_TOTAL = Decimal('100')
+MEASURES_TOTAL = Decimal('35')
+ACTIVITIES_TOTAL = Decimal('65')
+
+
+def _violation(rule, object_type, object_id, name, expected, actual, detail):
+    return {
+        'rule': rule,
+        'object_type': object_type,
+        'object_id': object_id,
+        'name': name,
+        'expected': expected,
+        'actual': actual,
+        'detail': detail,
+    }
+
+
+def _hierarchy_violations(objective_ids):
+    """Objective, program and subprogram weight violations, keyed by objective id"""
+    violations = defaultdict(list)
+
+    objectives = dict(StrategicObjective.objects.filter(id__in=objective_ids).values_list('id', 'weight'))
+    for row in Program.objects.filter(strategic_objective_id__in=objective_ids).values(
+        'strategic_objective_id', 'strategic_objective__title'
+    ).annotate(total=Sum('weight')):
+        objective_id = row['strategic_objective_id']
+        if row['total'] > objectives[objective_id]:
+            violations[objective_id].append(_violation(
+                'programs_weight', 'strategic_objective', objective_id, row['strategic_objective__title'],
+                objectives[objective_id], row['total'],
+                f'Total weight of programs ({row["total"]}%) exceeds objective weight ({objectives[objective_id]}%)'
+            ))
+
+    for row in SubProgram.objects.filter(program__strategic_objective_id__in=objective_ids).values(
+        'program_id', 'program__name', 'program__weight', 'program__strategic_objective_id'
+    ).annotate(total=Sum('weight')):
+        if row['total'] > row['program__weight']:
+            violations[row['program__strategic_objective_id']].append(_violation(
+                'subprograms_weight', 'program', row['program_id'], row['program__name'],
+                row['program__weight'], row['total'],
+                f'Total weight of subprograms ({row["total"]}%) exceeds program weight ({row["program__weight"]}%)'
+            ))
+
+    return violations
+
+
+def _initiative_violations(initiative_ids):
+    """Measure, activity and funding violations, keyed by initiative id"""
+    violations = defaultdict(list)
+
+    measure_totals = dict(PerformanceMeasure.objects.filter(initiative_id__in=initiative_ids).values(
+        'initiative_id'
+    ).annotate(total=Sum('weight')).values_list('initiative_id', 'total'))
+    activity_totals = dict(MainActivity.objects.filter(initiative_id__in=initiative_ids).values(
+        'initiative_id'
+    ).annotate(total=Sum('weight')).values_list('initiative_id', 'total'))
+
+    for initiative_id, name in StrategicInitiative.objects.filter(id__in=initiative_ids).values_list('id', 'name'):
+        total = measure_totals.get(initiative_id) or Decimal('0')
+        if total != MEASURES_TOTAL:
+            violations[initiative_id].append(_violation(
+                'measures_weight', 'initiative', initiative_id, name, MEASURES_TOTAL, total,
+                f'Total weight of performance measures must be 35%. Current total: {total}%'
+            ))
+        total = activity_totals.get(initiative_id) or Decimal('0')
+        if total != ACTIVITIES_TOTAL:
+            violations[initiative_id].append(_violation(
+                'activities_weight', 'initiative', initiative_id, name, ACTIVITIES_TOTAL, total,
+                f'Total weight of activities must be 65%. Current total: {total}%'
+            ))
+
+    overfunded = ActivityBudget.objects.filter(activity__initiative_id__in=initiative_ids).annotate(
+        estimated_cost=ActivityBudget.estimated_cost_expression(),
+        total_funding=ActivityBudget.total_funding_expression()
+    ).filter(total_funding__gt=F('estimated_cost')).values(
+        'id', 'activity__name', 'activity__initiative_id', 'estimated_cost', 'total_funding'
+    )
+    for row in overfunded:
+        violations[row['activity__initiative_id']].append(_violation(
+            'budget_funding', 'activity_budget', row['id'], row['activity__name'],
+            row['estimated_cost'], row['total_funding'],
+            f'Total funding ({row["total_funding"]}) exceeds estimated cost ({row["estimated_cost"]})'
+        ))
+
+    return violations
+
+
+def validate_plans(plans):
+    """
+    Readiness report for each plan, in order:
+    {'plan': id, 'is_ready': bool, 'violations': [...]}
+    """
+    plans = list(plans)
+    objective_ids = {plan.strategic_objective_id for plan in plans}
+
+    # Initiatives of every plan in one query, with the objective they roll up to
+    initiatives = defaultdict(list)
+    for row in StrategicInitiative.objects.filter(objective_filter(objective_ids)).annotate(
+        objective_id=Coalesce(
+            'strategic_objective_id', 'program__strategic_objective_id',
+            'subprogram__program__strategic_objective_id'
+        )
+    ).values('id', 'objective_id', 'fiscal_year', 'rolled_over_from_id'):
+        initiatives[row['objective_id']].append(row)
+
+    objectives_total = StrategicObjective.objects.aggregate(total=Sum('weight'))['total'] or Decimal('0')
+    hierarchy = _hierarchy_violations(objective_ids)
+    by_initiative = _initiative_violations(
+        [row['id'] for rows in initiatives.values() for row in rows]
+    )
+
+    reports = []
+    for plan in plans:
+        violations = []
+        if objectives_total != OBJECTIVES_TOTAL:
+            violations.append(_violation(
+                'objectives_total', 'plan', plan.id, str(plan.fiscal_year), OBJECTIVES_TOTAL, objectives_total,
+                f'The sum of all strategic objectives weights must be exactly 100%. Current total: {objectives_total}%'
+            ))
+        violations.extend(hierarchy.get(plan.strategic_objective_id, []))
+
+        # Same scope as Plan.initiatives()
+        plan_initiatives = [
+            row['id'] for row in in_fiscal_year(initiatives.get(plan.strategic_objective_id, []), plan.fiscal_year)
+        ]
+        if not plan_initiatives:
+            violations.append(_violation(
+                'no_initiatives', 'plan', plan.id, str(plan.fiscal_year), None, None,
+                'The plan has no initiatives'
+            ))
+        for initiative_id in plan_initiatives:
+            violations.extend(by_initiative.get(initiative_id, []))
+
+        reports.append({'plan': plan.id, 'is_ready': not violations, 'violations': violations})
+    return reports
+
+
+def validate_plan(plan):
+    return validate_plans([plan])[0]
@@ -0,0 +1,93 @@
+import json
+from decimal import Decimal
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# MessagePack extension type carrying a Decimal as its string form, still
+# accepted in request bodies from clients that send it
+DECIMAL_EXT_CODE = 1
+
+
+def iter_ndjson(items):
+    """Yield each item as one line of newline-delimited JSON"""
+    for item in items:
+        yield json.dumps(item, cls=JSONEncoder) + '\n'
+
+
+def iter_json_array(items):
+    """Yield a JSON array fragment by fragment"""
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps(item, cls=JSONEncoder)
+        separator = ','
+    yield ']'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders newline-delimited JSON. Lists become one line per item; any
+    other payload (e.g. an error) is rendered as a single line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return ''.join(iter_ndjson(items)).encode(self.charset)
+
+
+def _msgpack_default(obj):
+    # As strings, like the serializers' decimal fields in the JSON output, so
+    # any standard MessagePack decoder reads them without a custom codec
+    if isinstance(obj, Decimal):
+        return str(obj)
+    # Everything else (dates, UUIDs, lazy strings...) is encoded as in JSON
+    return JSONEncoder().default(obj)
+
+
+def _msgpack_ext_hook(code, data):
+    if code == DECIMAL_EXT_CODE:
+        return Decimal(data.decode('ascii'))
+    return msgpack.ExtType(code, data)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack, a compact binary equivalent of the JSON output.
+    Decimals are sent as strings, so they round-trip exactly.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies, restoring Decimal extension values
+    sent by older clients.
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(
+                stream.read(),
+                ext_hook=_msgpack_ext_hook,
+                raw=False,
+                strict_map_key=False
+            )
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
@@ -0,0 +1,100 @@
+"""
+Bulk plan reviews.
+
+Approves or rejects many submitted plans in one transaction: the plans are
+locked, their status transitions and the duplicate-approval rule from
+Plan.clean() are checked with one grouped query, reviews are inserted with
+bulk_create, statuses change with a single UPDATE and the plans' revisions
+are written with revisions.record_revisions().
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from .models import Plan, PlanReview
+from . import revisions
+
+MAX_PLANS = 500
+
+
+def _outcome(plan_id, ok, detail, status=None):
+    return {'plan': plan_id, 'ok': ok, 'status': status, 'detail': detail}
+
+
+@transaction.atomic
+def bulk_review(plans, plan_ids, decision, feedback, evaluators, user=None):
+    """
+    Apply `decision` ('APPROVED' or 'REJECTED') to the plans in `plan_ids`
+    that `plans` (the reviewer's visible queryset) contains. `evaluators`
+    maps organization id -> the reviewer's OrganizationUser there; plans of
+    any other organization fail.
+    Returns one outcome per requested id, in order.
+    """
+    locked = {
+        plan.id: plan
+        for plan in plans.filter(id__in=plan_ids).order_by().select_for_update()
+    }
+
+    # Approving a plan fails Plan.clean() if another plan for the same
+    # organization, objective and fiscal year is already submitted or approved
+    conflicts = set()
+    if decision == 'APPROVED':
+        candidates = [plan for plan in locked.values() if plan.status == 'SUBMITTED']
+        counts = Plan.objects.filter(
+            organization_id__in={plan.organization_id for plan in candidates},
+            strategic_objective_id__in={plan.strategic_objective_id for plan in candidates},
+            fiscal_year__in={plan.fiscal_year for plan in candidates},
+            status__in=['SUBMITTED', 'APPROVED']
+        ).values('organization_id', 'strategic_objective_id', 'fiscal_year').annotate(plans=Count('id'))
+        conflicts = {
+            (row['organization_id'], row['strategic_objective_id'], row['fiscal_year'])
+            for row in counts if row['plans'] > 1
+        }
+
+    now = timezone.now()
+    outcomes = []
+    reviews = []
+    reviewed = {}
+    for plan_id in plan_ids:
+        plan = locked.get(plan_id)
+        if plan is None:
+            outcomes.append(_outcome(plan_id, False, 'Plan not found'))
+        elif plan.organization_id not in evaluators:
+            # Admins see every plan of their organizations, evaluator or not
+            outcomes.append(_outcome(plan_id, False, 'Not an evaluator for this organization', plan.status))
+        elif plan_id in reviewed:
+            outcomes.append(_outcome(plan_id, False, 'Plan listed more than once', decision))
+        elif plan.status != 'SUBMITTED':
+            outcomes.append(_outcome(
+                plan_id, False,
+                f'Only submitted plans can be reviewed. Current status: {plan.status}', plan.status
+            ))
+        elif (plan.organization_id, plan.strategic_objective_id, plan.fiscal_year) in conflicts:
+            outcomes.append(_outcome(
+                plan_id, False,
+                'A plan for this organization and strategic objective has already been submitted or approved '
+                'for this fiscal year',
+                plan.status
+            ))
+        else:
+            reviews.append(PlanReview(
+                plan=plan,
+                evaluator=evaluators[plan.organization_id],
+                status=decision,
+                feedback=feedback,
+                reviewed_at=now
+            ))
+            reviewed[plan_id] = plan
+            outcomes.append(_outcome(plan_id, True, f'Plan {decision.lower()}', decision))
+
+    PlanReview.objects.bulk_create(reviews)
+    # update() skips auto_now and the version check, so bump both here; the
+    # plans are locked, so no other writer can slip in between
+    Plan.objects.filter(id__in=list(reviewed)).update(
+        status=decision, updated_at=now, version=F('version') + 1
+    )
+
+    for plan in reviewed.values():
+        plan.status = decision
+        plan.version += 1
+    revisions.record_revisions(reviewed.values(), user, decision)
+    return outcomes
@@ -0,0 +1,224 @@
+"""
+Compact revision history for plans.
+
+A revision captures the plan and its subtree (initiatives, performance
+measures, main activities and budgets) as structural JSON keyed by id.
+Most revisions store only the diff against the previous revision. Every
+CHECKPOINT_INTERVAL-th revision stores a full snapshot, so rebuilding any
+revision applies at most CHECKPOINT_INTERVAL - 1 diffs.
+
+Diffs are lists of operations:
+    {'op': 'add' | 'replace', 'path': [...], 'value': ...}
+    {'op': 'remove', 'path': [...]}
+Dicts are diffed key by key. Lists and scalars are replaced as a whole.
+
+record_revisions() stores revisions for many plans at once (e.g. a bulk
+review) with a fixed number of queries, however many plans there are.
+"""
+import json
+from collections import defaultdict
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from .models import (
+    StrategicInitiative, PerformanceMeasure, MainActivity, ActivityBudget, Plan, PlanRevision,
+    objective_filter, in_fiscal_year
+)
+
+CHECKPOINT_INTERVAL = 10
+
+# Columns left out of snapshots because they change without meaning anything to reviewers
+SKIPPED_COLUMNS = {'created_at', 'updated_at', 'version'}
+
+
+def _normalize(data):
+    """Round-trip through JSON so Decimals and dates compare as stored"""
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def _rows(queryset):
+    return [
+        {key: value for key, value in row.items() if key not in SKIPPED_COLUMNS}
+        for row in queryset.values()
+    ]
+
+
+def snapshots(plans):
+    """
+    Structural JSON of each plan and its subtree, keyed by plan id, built
+    with five queries for any number of plans
+    """
+    plan_rows = {row['id']: row for row in _rows(Plan.objects.filter(pk__in=[plan.pk for plan in plans]))}
+
+    # The initiatives of every plan's objective and fiscal year (see
+    # Plan.initiatives()), grouped by the objective whichever parent they use
+    initiatives = {}
+    by_objective = defaultdict(list)
+    queryset = StrategicInitiative.objects.filter(
+        objective_filter({row['strategic_objective_id'] for row in plan_rows.values()})
+    ).filter(
+        Q(fiscal_year__in={row['fiscal_year'] for row in plan_rows.values()}) | Q(fiscal_year__isnull=True)
+    ).annotate(snapshot_objective=Coalesce(
+        'strategic_objective', 'program__strategic_objective', 'subprogram__program__strategic_objective'
+    ))
+    for row in _rows(queryset):
+        row['performance_measures'] = {}
+        row['main_activities'] = {}
+        initiatives[row['id']] = row
+        by_objective[(row.pop('snapshot_objective'), row['fiscal_year'])].append(row)
+
+    for row in _rows(PerformanceMeasure.objects.filter(initiative_id__in=list(initiatives))):
+        initiatives[row['initiative_id']]['performance_measures'][str(row['id'])] = row
+
+    activities = {}
+    for row in _rows(MainActivity.objects.filter(initiative_id__in=list(initiatives))):
+        row['budget'] = None
+        activities[row['id']] = row
+        initiatives[row['initiative_id']]['main_activities'][str(row['id'])] = row
+
+    for row in _rows(ActivityBudget.objects.filter(activity_id__in=list(activities))):
+        activities[row['activity_id']]['budget'] = row
+
+    result = {}
+    for plan_id, plan_row in plan_rows.items():
+        objective_id, fiscal_year = plan_row['strategic_objective_id'], plan_row['fiscal_year']
+        rows = in_fiscal_year(by_objective[(objective_id, fiscal_year)] + by_objective[(objective_id, None)], fiscal_year)
+        result[plan_id] = _normalize({'plan': plan_row, 'initiatives': {str(row['id']): row for row in rows}})
+    return result
+
+
+def snapshot(plan):
+    """Structural JSON of a plan and its subtree"""
+    return snapshots([plan])[plan.pk]
+
+
+def diff(old, new, path=None):
+    """Operations turning `old` into `new`"""
+    path = path or []
+    if isinstance(old, dict) and isinstance(new, dict):
+        operations = []
+        for key in old:
+            if key not in new:
+                operations.append({'op': 'remove', 'path': path + [key]})
+        for key, value in new.items():
+            if key not in old:
+                operations.append({'op': 'add', 'path': path + [key], 'value': value})
+            else:
+                operations.extend(diff(old[key], value, path + [key]))
+        return operations
+    if old != new:
+        return [{'op': 'replace', 'path': path, 'value': new}]
+    return []
+
+
+def apply_diff(data, operations):
+    """Apply operations from diff() to a copy of `data`"""
+    data = json.loads(json.dumps(data))
+    for operation in operations:
+        path = operation['path']
+        if not path:
+            data = operation['value']
+            continue
+        target = data
+        for key in path[:-1]:
+            target = target[key]
+        if operation['op'] == 'remove':
+            del target[path[-1]]
+        else:
+            target[path[-1]] = operation['value']
+    return data
+
+
+def reconstruct(plan, number):
+    """Full snapshot of revision `number`, from the nearest checkpoint before it"""
+    revisions = list(
+        PlanRevision.objects.filter(plan=plan, number__lte=number)
+        .filter(number__gte=_checkpoint_number(plan, number))
+        .order_by('number')
+    )
+    if not revisions or revisions[-1].number != number:
+        raise PlanRevision.DoesNotExist(f'Plan {plan.pk} has no revision {number}')
+
+    data = revisions[0].data
+    for revision in revisions[1:]:
+        data = apply_diff(data, revision.data)
+    return data
+
+
+def _checkpoint_number(plan, number):
+    checkpoint = PlanRevision.objects.filter(
+        plan=plan, number__lte=number, is_checkpoint=True
+    ).order_by('-number').values_list('number', flat=True).first()
+    return checkpoint or 1
+
+
+def _latest(plan_ids):
+    """{plan id: (number, full snapshot)} of each plan's last revision, in one query"""
+    checkpoint = PlanRevision.objects.filter(
+        plan=OuterRef('plan'), is_checkpoint=True
+    ).order_by('-number').values('number')[:1]
+    rows = PlanRevision.objects.filter(plan_id__in=plan_ids).annotate(
+        checkpoint=Coalesce(Subquery(checkpoint), 1)
+    ).filter(number__gte=F('checkpoint')).order_by('plan_id', 'number')
+
+    latest = {}
+    for plan_id, number, data in rows.values_list('plan_id', 'number', 'data'):
+        if plan_id in latest:
+            data = apply_diff(latest[plan_id][1], data)
+        latest[plan_id] = (number, data)
+    return latest
+
+
+def _next_revision(plan, last, current, user, reason):
+    """Unsaved revision after `last` ((number, snapshot) or None), or None if nothing changed"""
+    number, previous = last or (0, None)
+    if previous == current:
+        return None
+
+    number += 1
+    is_checkpoint = (number - 1) % CHECKPOINT_INTERVAL == 0
+    return PlanRevision(
+        plan=plan,
+        number=number,
+        is_checkpoint=is_checkpoint,
+        data=current if is_checkpoint else diff(previous, current),
+        reason=reason,
+        created_by=user
+    )
+
+
+@transaction.atomic
+def record_revision(plan, user=None, reason=''):
+    """
+    Store the plan's current state as its next revision. Returns the new
+    revision, or None when nothing changed since the last one.
+    """
+    # Lock the plan row so concurrent revisions get distinct numbers
+    Plan.objects.select_for_update().filter(pk=plan.pk).first()
+
+    revision = _next_revision(plan, _latest([plan.pk]).get(plan.pk), snapshot(plan), user, reason)
+    if revision is not None:
+        revision.save()
+    return revision
+
+
+@transaction.atomic
+def record_revisions(plans, user=None, reason=''):
+    """
+    record_revision() for many plans, which the caller has locked, with one
+    bulk insert. Returns the new revisions.
+    """
+    plans = list(plans)
+    if not plans:
+        return []
+    current = snapshots(plans)
+    latest = _latest([plan.pk for plan in plans])
+    new_revisions = [
+        revision for revision in (
+            _next_revision(plan, latest.get(plan.pk), current[plan.pk], user, reason) for plan in plans
+        )
+        if revision is not None
+    ]
+    PlanRevision.objects.bulk_create(new_revisions)
+    return new_revisions
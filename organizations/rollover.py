@@ -0,0 +1,154 @@
+"""
+Fiscal-year rollover of plans.
+
+A plan is cloned into a new fiscal year together with its initiatives,
+performance measures, main activities, budgets and budget line items. Each
+level is copied with one bulk_create. Foreign keys are remapped through the
+`rolled_over_from` lineage columns, because MySQL does not return primary
+keys from bulk inserts. The source rows are never modified.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .models import (
+    Plan, StrategicInitiative, PerformanceMeasure, MainActivity,
+    ActivityBudget, BudgetLineItem
+)
+from . import search
+
+BATCH_SIZE = 500
+
+# Columns never copied to a clone
+SKIPPED_COLUMNS = {'id', 'created_at', 'updated_at', 'version'}
+
+
+def _clone(model, rows, **overrides):
+    """Build unsaved instances of `model` from values() rows"""
+    clones = []
+    for row in rows:
+        values = {key: value for key, value in row.items() if key not in SKIPPED_COLUMNS}
+        values.update({key: value(row) if callable(value) else value for key, value in overrides.items()})
+        clones.append(model(**values))
+    return clones
+
+
+def shift_year(date, years=1):
+    """Move a date by whole years, mapping 29 February to 28 February"""
+    try:
+        return date.replace(year=date.year + years)
+    except ValueError:
+        return date.replace(year=date.year + years, day=28)
+
+
+@transaction.atomic
+def rollover_plan(plan, fiscal_year, from_date=None, to_date=None, planner_name=None):
+    """
+    Clone `plan` and its subtree into `fiscal_year` as a new draft plan.
+    Initiatives already rolled into `fiscal_year` through another plan on
+    the same objective are not cloned again.
+    Returns (new plan, counts of cloned rows per level).
+    """
+    if fiscal_year == plan.fiscal_year:
+        raise ValidationError('The new fiscal year must differ from the plan\'s fiscal year')
+    if Plan.objects.filter(
+        organization_id=plan.organization_id,
+        strategic_objective_id=plan.strategic_objective_id,
+        fiscal_year=fiscal_year
+    ).exists():
+        raise ValidationError(
+            f'A plan for this organization and strategic objective already exists for {fiscal_year}'
+        )
+
+    new_plan = Plan(
+        organization_id=plan.organization_id,
+        planner_name=planner_name or plan.planner_name,
+        type=plan.type,
+        executive_name=plan.executive_name,
+        strategic_objective_id=plan.strategic_objective_id,
+        program_id=plan.program_id,
+        subprogram_id=plan.subprogram_id,
+        fiscal_year=fiscal_year,
+        from_date=from_date or shift_year(plan.from_date),
+        to_date=to_date or shift_year(plan.to_date),
+    )
+    new_plan.save()
+
+    # Undated initiatives are shared by every year's plans, so they are left
+    # as they are: their copies take their place in the new year only (see
+    # fiscal_year_filter())
+    source_initiatives = plan.initiatives()
+
+    # Initiatives hang off the objective, which other organizations' plans may
+    # share: those already rolled into the year by such a plan are reused
+    already_cloned = StrategicInitiative.objects.filter(
+        fiscal_year=fiscal_year, rolled_over_from__isnull=False
+    ).values('rolled_over_from')
+    source_ids = list(source_initiatives.exclude(id__in=already_cloned).values_list('id', flat=True))
+
+    # Initiatives
+    StrategicInitiative.objects.bulk_create(
+        _clone(
+            StrategicInitiative, StrategicInitiative.objects.filter(id__in=source_ids).values(),
+            fiscal_year=fiscal_year, rolled_over_from_id=lambda row: row['id']
+        ),
+        batch_size=BATCH_SIZE
+    )
+    initiative_map = dict(
+        StrategicInitiative.objects.filter(
+            fiscal_year=fiscal_year,
+            rolled_over_from__in=source_ids
+        ).values_list('rolled_over_from_id', 'id')
+    )
+
+    # Performance measures
+    measures = PerformanceMeasure.objects.filter(initiative_id__in=initiative_map)
+    PerformanceMeasure.objects.bulk_create(
+        _clone(PerformanceMeasure, measures.values(), initiative_id=lambda row: initiative_map[row['initiative_id']]),
+        batch_size=BATCH_SIZE
+    )
+
+    # Main activities
+    activities = MainActivity.objects.filter(initiative_id__in=initiative_map)
+    MainActivity.objects.bulk_create(
+        _clone(
+            MainActivity, activities.values(),
+            initiative_id=lambda row: initiative_map[row['initiative_id']],
+            rolled_over_from_id=lambda row: row['id']
+        ),
+        batch_size=BATCH_SIZE
+    )
+    activity_map = dict(
+        MainActivity.objects.filter(
+            initiative_id__in=initiative_map.values(),
+            rolled_over_from__isnull=False
+        ).values_list('rolled_over_from_id', 'id')
+    )
+
+    # Budgets
+    budgets = ActivityBudget.objects.filter(activity_id__in=activity_map)
+    ActivityBudget.objects.bulk_create(
+        _clone(ActivityBudget, budgets.values(), activity_id=lambda row: activity_map[row['activity_id']]),
+        batch_size=BATCH_SIZE
+    )
+    new_budget_ids = dict(
+        ActivityBudget.objects.filter(activity_id__in=activity_map.values()).values_list('activity_id', 'id')
+    )
+    budget_map = {
+        budget_id: new_budget_ids[activity_map[activity_id]]
+        for budget_id, activity_id in budgets.values_list('id', 'activity_id')
+    }
+
+    # Budget line items
+    line_items = BudgetLineItem.objects.filter(budget_id__in=budget_map)
+    BudgetLineItem.objects.bulk_create(
+        _clone(BudgetLineItem, line_items.values(), budget_id=lambda row: budget_map[row['budget_id']]),
+        batch_size=BATCH_SIZE
+    )
+
+    search.rebuild_on_commit()
+
+    return new_plan, {
+        'initiatives': len(initiative_map),
+        'performance_measures': measures.count(),
+        'main_activities': len(activity_map),
+        'budgets': len(budget_map),
+    }
@@ -0,0 +1,234 @@
+"""
+What-if costing scenarios.
+
+Prices every tool-based budget under a set of rate overrides without
+writing anything, and reports the change by organization, activity type
+and funding source.
+
+`current` is what the plans show: the budgets' stored estimated cost. The
+change is the overrides' effect, i.e. each line item's quantity times the
+difference between its scenario rate and its rate in effect on `as_of`,
+and `scenario` is the stored cost plus that change.
+
+The quantities come from the budget line items (rebuilt from each budget's
+*_details on save, or by `manage.py backfill_budget_line_items`), so no
+details JSON is parsed per request. The rate in effect and the scenario
+rate of every (activity type, location, cost type) in use are resolved
+once, with costing.RateTable, over one GROUP BY query that sums the line
+items per objective, activity type, cost type and location: the database
+does the work per budget and only the groups are priced in Python.
+Procurement and other costs do not come from rates and do not change.
+
+A scenario's change to a budget is split over its funding sources in
+proportion to what each source funds today; the part not covered by any
+source (the budget's current funding gap) is reported as `unfunded`.
+Organizations are attributed through their plans, as with ?organization=:
+an objective planned by several organizations counts toward each of them.
+"""
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Case, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+from .costing import RateTable, to_decimal
+from .models import ActivityBudget, ActivityCostingAssumption, BudgetLineItem, Plan
+
+# Cost types priced from rates; procurement and other costs are entered as amounts
+RATED_COST_TYPES = [
+    cost_type for cost_type, _ in BudgetLineItem.COST_TYPES if cost_type not in ('procurement', 'other')
+]
+ACTIVITY_TYPES = [activity_type for activity_type, _ in ActivityBudget.ACTIVITY_TYPES]
+LOCATIONS = [location for location, _ in ActivityCostingAssumption.LOCATIONS]
+FUNDING_SOURCES = ('government_treasury', 'sdg_funding', 'partners_funding', 'other_funding')
+
+MAX_OVERRIDES = 500
+
+
+def _objective(prefix):
+    """The objective of the initiative at `prefix`, whichever parent it uses"""
+    return Coalesce(
+        f'{prefix}strategic_objective',
+        f'{prefix}program__strategic_objective',
+        f'{prefix}subprogram__program__strategic_objective',
+    )
+
+
+def parse_overrides(overrides):
+    """
+    RateTable overrides from a list of {cost_type, amount[, location][, activity_type]}.
+    With an activity type the override applies to that type at that location
+    only; without one, to every activity type. Printing rates use the
+    document type as their location.
+    """
+    if not isinstance(overrides, list) or not overrides:
+        raise ValidationError('overrides must be a non-empty list')
+    if len(overrides) > MAX_OVERRIDES:
+        raise ValidationError(f'A scenario can have at most {MAX_OVERRIDES} overrides')
+
+    parsed = {}
+    for index, override in enumerate(overrides, start=1):
+        if not isinstance(override, dict):
+            raise ValidationError(f'Override {index} must be an object')
+        cost_type = override.get('cost_type')
+        location = override.get('location') or None
+        activity_type = override.get('activity_type') or None
+        if cost_type not in RATED_COST_TYPES:
+            raise ValidationError(f'Override {index}: cost_type must be one of {", ".join(RATED_COST_TYPES)}')
+        if activity_type is not None and activity_type not in ACTIVITY_TYPES:
+            raise ValidationError(f'Override {index}: unknown activity_type {activity_type}')
+        if location is not None and cost_type != 'printing' and location not in LOCATIONS:
+            raise ValidationError(f'Override {index}: unknown location {location}')
+        amount = to_decimal(override.get('amount'))
+        if override.get('amount') in (None, '') or amount < 0:
+            raise ValidationError(f'Override {index}: amount must be a non-negative number')
+
+        if activity_type is not None:
+            key = (activity_type, location, cost_type)
+        elif location is not None:
+            key = (location, cost_type)
+        else:
+            key = cost_type
+        parsed[key] = amount
+    return parsed
+
+
+# Printing rates are keyed by document type, which printing line items keep as description
+RATE_LOCATION = Case(
+    When(cost_type='printing', then=F('description')),
+    default=F('location'),
+    output_field=models.CharField()
+)
+
+
+def _funded_quantity(source):
+    """A line item's quantity times the share of its budget's estimated cost funded by `source`"""
+    return Case(
+        When(
+            budget__estimated_cost_with_tool__gt=0,
+            # In floating point, so SQLite does not divide integers
+            then=ExpressionWrapper(
+                F('quantity') * F(f'budget__{source}') * Value(1.0) / F('budget__estimated_cost_with_tool'),
+                output_field=models.FloatField()
+            )
+        ),
+        default=Value(0.0),
+        output_field=models.FloatField()
+    )
+
+
+def _stored(budgets):
+    """Stored estimated costs per objective and activity type"""
+    return budgets.annotate(
+        objective=_objective('activity__initiative__')
+    ).values('objective', 'activity_type').annotate(
+        stored=Sum('estimated_cost_with_tool')
+    ).order_by()
+
+
+def _grouped(line_items):
+    """Rated line item quantities per objective, activity type, cost type and rate location"""
+    return line_items.filter(cost_type__in=RATED_COST_TYPES).annotate(
+        objective=_objective('budget__activity__initiative__'), rate_location=RATE_LOCATION
+    ).values(
+        'objective', 'budget__activity_type', 'cost_type', 'rate_location'
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        **{source: Sum(_funded_quantity(source)) for source in FUNDING_SOURCES}
+    ).order_by()
+
+
+def _add(totals, key, current, change):
+    entry = totals.setdefault(key, [Decimal('0'), Decimal('0')])
+    entry[0] += current
+    entry[1] += change
+
+
+def _totals(current, change):
+    return {
+        'current': float(current),
+        'scenario': float(current + change),
+        'delta': float(change),
+    }
+
+
+def run_scenario(overrides, budgets=None, as_of=None, organization_ids=None):
+    """
+    Totals of the tool-based budgets under `overrides` (RateTable keys, see
+    parse_overrides) against the rates in effect on `as_of` (default today).
+    `budgets` limits the budgets, e.g. to an organization's plans, and
+    `organization_ids` the organizations reported in by_organization.
+    """
+    budgets = ActivityBudget.objects.all() if budgets is None else budgets
+    budgets = budgets.filter(budget_calculation_type='WITH_TOOL')
+    zero = Decimal('0')
+
+    current_rates = RateTable.load(as_of=as_of)
+    scenario_rates = RateTable(current_rates.assumptions, overrides)
+    rates = {}
+    total, by_activity_type, by_objective = {}, {}, {}
+    by_source = dict.fromkeys(FUNDING_SOURCES, zero)
+
+    for row in _stored(budgets):
+        stored = row['stored'] or zero
+        _add(total, None, stored, zero)
+        _add(by_activity_type, row['activity_type'], stored, zero)
+        _add(by_objective, row['objective'], stored, zero)
+
+    # One aggregate query; the rates are applied to its (few) groups here
+    for row in _grouped(BudgetLineItem.objects.filter(budget__in=budgets)):
+        activity_type, cost_type = row['budget__activity_type'], row['cost_type']
+        key = (activity_type, cost_type, row['rate_location'])
+        if key not in rates:
+            rates[key] = (
+                current_rates.rate(activity_type, cost_type, row['rate_location']),
+                scenario_rates.rate(activity_type, cost_type, row['rate_location'])
+            )
+        current_rate, scenario_rate = rates[key]
+        change = row['total_quantity'] * (scenario_rate - current_rate)
+        for source in FUNDING_SOURCES:
+            by_source[source] += Decimal(str(row[source] or 0)) * (scenario_rate - current_rate)
+
+        _add(total, None, zero, change)
+        _add(by_activity_type, activity_type, zero, change)
+        _add(by_objective, row['objective'], zero, change)
+
+    organizations = {}
+    planned = Plan.objects.filter(strategic_objective__in=list(by_objective))
+    if organization_ids is not None:
+        planned = planned.filter(organization__in=organization_ids)
+    planned = planned.values_list(
+        'organization_id', 'organization__name', 'strategic_objective_id'
+    ).distinct()
+    for organization_id, name, objective_id in planned:
+        entry = organizations.setdefault(organization_id, {
+            'organization': organization_id, 'organization_name': name, 'objectives': set(),
+        })
+        entry['objectives'].add(objective_id)
+    by_organization = []
+    for entry in sorted(organizations.values(), key=lambda entry: entry['organization_name']):
+        sums = {}
+        for objective_id in entry.pop('objectives'):
+            _add(sums, None, *by_objective[objective_id])
+        by_organization.append({**entry, **_totals(*sums[None])})
+
+    current, change = total.get(None, (Decimal('0'), Decimal('0')))
+    return {
+        'changed_rates': [
+            {
+                'activity_type': activity_type, 'cost_type': cost_type, 'location': location,
+                'current': float(current_rate), 'scenario': float(scenario_rate),
+            }
+            for (activity_type, cost_type, location), (current_rate, scenario_rate) in sorted(rates.items(), key=str)
+            if scenario_rate != current_rate
+        ],
+        'total': _totals(current, change),
+        'by_organization': by_organization,
+        'by_activity_type': [
+            {'activity_type': activity_type, **_totals(*sums)}
+            for activity_type, sums in sorted(by_activity_type.items(), key=lambda item: item[0] or '')
+        ],
+        'by_funding_source': {
+            **{source: float(amount) for source, amount in by_source.items()},
+            'unfunded': float(change - sum(by_source.values(), Decimal('0'))),
+        },
+    }
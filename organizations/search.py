@@ -0,0 +1,236 @@
+"""
+Search across the planning hierarchy.
+
+On MySQL, searches use the FULLTEXT indexes created by migration 0008 and
+rank rows by MATCH ... AGAINST relevance. Other databases (SQLite in
+development) use an in-process trigram inverted index. That index is built
+on the first search and then kept current by save/delete signals; bulk
+writes, which send no signals, call rebuild_on_commit() to have it rebuilt.
+
+Results can be limited to the strategic objectives a user's organizations
+plan, and the rows under them, as the list endpoints' ?organization= does.
+"""
+import re
+import threading
+from collections import defaultdict
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+from django.db.models import Q
+from .models import (
+    StrategicObjective, Program, SubProgram, StrategicInitiative,
+    PerformanceMeasure, MainActivity, objective_filter
+)
+
+# Result type -> (model, searched fields, title field, parent fields)
+SEARCH_TARGETS = {
+    'objective': (StrategicObjective, ['title', 'description'], 'title', []),
+    'program': (Program, ['name'], 'name', ['strategic_objective']),
+    'subprogram': (SubProgram, ['name'], 'name', ['program']),
+    'initiative': (StrategicInitiative, ['name'], 'name', ['strategic_objective', 'program', 'subprogram']),
+    'performance_measure': (PerformanceMeasure, ['name'], 'name', ['initiative']),
+    'main_activity': (MainActivity, ['name'], 'name', ['initiative']),
+}
+
+# Result type -> Q limiting its rows to those under the given objectives
+SCOPE_FILTERS = {
+    'objective': lambda objective_ids: Q(id__in=objective_ids),
+    'program': lambda objective_ids: Q(strategic_objective__in=objective_ids),
+    'subprogram': lambda objective_ids: Q(program__strategic_objective__in=objective_ids),
+    'initiative': lambda objective_ids: objective_filter(objective_ids),
+    'performance_measure': lambda objective_ids: objective_filter(objective_ids, prefix='initiative__'),
+    'main_activity': lambda objective_ids: objective_filter(objective_ids, prefix='initiative__'),
+}
+
+# Trigram matches scoring below this fraction of the query's trigrams are dropped
+MIN_TRIGRAM_SCORE = 0.3
+
+
+def _words(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def trigrams(text):
+    """Trigrams of each word, padded so short words and word starts still match"""
+    grams = set()
+    for word in _words(text):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Inverted index of trigram -> document keys, safe to share between threads"""
+
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self.documents = {}
+        self.lock = threading.Lock()
+        self.built = False
+
+    def _remove(self, key):
+        for gram in self.documents.pop(key, ()):
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+    def update(self, key, text):
+        grams = trigrams(text)
+        with self.lock:
+            self._remove(key)
+            self.documents[key] = grams
+            for gram in grams:
+                self.postings[gram].add(key)
+
+    def remove(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def invalidate(self):
+        """Rebuild on the next search"""
+        with self.lock:
+            self.built = False
+
+    def build(self):
+        with self.lock:
+            if self.built:
+                return
+            self.postings.clear()
+            self.documents.clear()
+            for result_type, (model, fields, _, _) in SEARCH_TARGETS.items():
+                for row in model.objects.values_list('id', *fields).iterator():
+                    grams = trigrams(' '.join(str(value) for value in row[1:] if value))
+                    key = (result_type, row[0])
+                    self.documents[key] = grams
+                    for gram in grams:
+                        self.postings[gram].add(key)
+            self.built = True
+
+    def search(self, query, result_types):
+        """Return {key: score}, scoring by the fraction of query trigrams matched"""
+        self.build()
+        query_grams = trigrams(query)
+        if not query_grams:
+            return {}
+
+        counts = defaultdict(int)
+        with self.lock:
+            for gram in query_grams:
+                for key in self.postings.get(gram, ()):
+                    if key[0] in result_types:
+                        counts[key] += 1
+
+        scores = {key: count / len(query_grams) for key, count in counts.items()}
+        return {key: score for key, score in scores.items() if score >= MIN_TRIGRAM_SCORE}
+
+
+trigram_index = TrigramIndex()
+
+
+def _index_saved(sender, instance, **kwargs):
+    if not trigram_index.built:
+        return
+    for result_type, (model, fields, _, _) in SEARCH_TARGETS.items():
+        if sender is model:
+            text = ' '.join(str(getattr(instance, field) or '') for field in fields)
+            trigram_index.update((result_type, instance.pk), text)
+
+
+def _index_deleted(sender, instance, **kwargs):
+    if not trigram_index.built:
+        return
+    for result_type, (model, _, _, _) in SEARCH_TARGETS.items():
+        if sender is model:
+            trigram_index.remove((result_type, instance.pk))
+
+
+for _model, _, _, _ in SEARCH_TARGETS.values():
+    post_save.connect(_index_saved, sender=_model, dispatch_uid=f'search_index_save_{_model.__name__}')
+    post_delete.connect(_index_deleted, sender=_model, dispatch_uid=f'search_index_delete_{_model.__name__}')
+
+
+def rebuild_on_commit():
+    """For bulk_create/update() of searched rows, which send no signals"""
+    transaction.on_commit(trigram_index.invalidate)
+
+
+def _boolean_query(query):
+    """MySQL boolean-mode query requiring every word, each as a prefix"""
+    return ' '.join(f'+{word}*' for word in _words(query))
+
+
+def _scoped(result_type, queryset, objective_ids):
+    if objective_ids is None:
+        return queryset
+    return queryset.filter(SCOPE_FILTERS[result_type](objective_ids))
+
+
+def _fulltext_scores(query, result_types, limit, objective_ids):
+    scores = {}
+    boolean_query = _boolean_query(query)
+    if not boolean_query:
+        return scores
+    for result_type in result_types:
+        model, fields, _, _ = SEARCH_TARGETS[result_type]
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(f'{table}.{connection.ops.quote_name(field)}' for field in fields)
+        relevance = RawSQL(f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)', [boolean_query])
+        rows = _scoped(result_type, model.objects.all(), objective_ids)
+        rows = rows.annotate(score=relevance).filter(score__gt=0).order_by('-score')
+        for pk, score in rows.values_list('id', 'score')[:limit]:
+            scores[(result_type, pk)] = float(score)
+    return scores
+
+
+def _trigram_scores(query, result_types, objective_ids):
+    scores = trigram_index.search(query, result_types)
+    if objective_ids is None or not scores:
+        return scores
+
+    ids_by_type = defaultdict(list)
+    for result_type, pk in scores:
+        ids_by_type[result_type].append(pk)
+    allowed = set()
+    for result_type, ids in ids_by_type.items():
+        model = SEARCH_TARGETS[result_type][0]
+        rows = _scoped(result_type, model.objects.filter(id__in=ids), objective_ids)
+        allowed.update((result_type, pk) for pk in rows.values_list('id', flat=True))
+    return {key: score for key, score in scores.items() if key in allowed}
+
+
+def search(query, result_types=None, limit=20, objective_ids=None):
+    """
+    Ranked search results as dicts with type, id, title, parent ids and score.
+    With `objective_ids` (ids or a subquery) only rows under those strategic
+    objectives are returned.
+    """
+    result_types = [t for t in (result_types or SEARCH_TARGETS) if t in SEARCH_TARGETS]
+    if connection.vendor == 'mysql':
+        scores = _fulltext_scores(query, result_types, limit, objective_ids)
+    else:
+        scores = _trigram_scores(query, result_types, objective_ids)
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    # Load titles and parents with one query per result type
+    ids_by_type = defaultdict(list)
+    for (result_type, pk), _ in ranked:
+        ids_by_type[result_type].append(pk)
+    rows = {}
+    for result_type, ids in ids_by_type.items():
+        model, _, title_field, parent_fields = SEARCH_TARGETS[result_type]
+        for row in model.objects.filter(id__in=ids).values('id', title_field, *parent_fields):
+            rows[(result_type, row['id'])] = {
+                'type': result_type,
+                'id': row['id'],
+                'title': row[title_field],
+                'parents': {field: row[field] for field in parent_fields if row[field] is not None},
+            }
+
+    results = []
+    for key, score in ranked:
+        if key in rows:
+            results.append(dict(rows[key], score=round(score, 4)))
+    return results
@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
 from .models import (
     Organization, OrganizationUser, StrategicObjective,
     Program, SubProgram, StrategicInitiative, PerformanceMeasure, MainActivity,
-    ActivityBudget, ActivityCostingAssumption, Plan, PlanReview
+    ActivityBudget, ActivityCostingAssumption, Plan, PlanReview, BudgetLineItem
 )
 from django.contrib.auth.models import User
 from decimal import Decimal
@@ -57,11 +58,12 @@ class MainActivitySerializer(serializers.ModelSerializer):
     class Meta:
         model = MainActivity
         fields = '__all__'
+        read_only_fields = ['months_mask', 'quarters_mask', 'rolled_over_from']
     
     def get_budget(self, obj):
         try:
-            budget = ActivityBudget.objects.get(activity=obj)
-            return ActivityBudgetSerializer(budget).data
+            # Through the relation, so prefetched budgets are used
+            return ActivityBudgetSerializer(obj.budget).data
         except ActivityBudget.DoesNotExist:
             return None
 
@@ -72,6 +74,7 @@ class StrategicInitiativeSerializer(serializers.ModelSerializer):
     class Meta:
         model = StrategicInitiative
         fields = '__all__'
+        read_only_fields = ['rolled_over_from']
 
 class ActivityBudgetSerializer(serializers.ModelSerializer):
     activity_name = serializers.CharField(source='activity.name', read_only=True)
@@ -91,6 +94,13 @@ class ActivityBudgetSerializer(serializers.ModelSerializer):
         read_only=True
     )
 
+    # Numeric fields rendered as floats for the frontend
+    NUMERIC_FIELDS = [
+        'estimated_cost_with_tool', 'estimated_cost_without_tool',
+        'government_treasury', 'sdg_funding', 'partners_funding', 'other_funding',
+        'total_funding', 'estimated_cost', 'funding_gap'
+    ]
+
     class Meta:
         model = ActivityBudget
         fields = [
@@ -100,7 +110,7 @@ class ActivityBudgetSerializer(serializers.ModelSerializer):
             'total_funding', 'estimated_cost', 'funding_gap',
             'training_details', 'meeting_workshop_details',
             'procurement_details', 'printing_details', 'supervision_details',
-            'created_at', 'updated_at'
+            'rates_as_of', 'version', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
@@ -135,18 +145,17 @@ class ActivityBudgetSerializer(serializers.ModelSerializer):
         data = super().to_representation(instance)
         
         # Ensure numeric fields are properly formatted
-        numeric_fields = [
-            'estimated_cost_with_tool', 'estimated_cost_without_tool',
-            'government_treasury', 'sdg_funding', 'partners_funding', 'other_funding',
-            'total_funding', 'estimated_cost', 'funding_gap'
-        ]
-        
-        for field in numeric_fields:
+        for field in self.NUMERIC_FIELDS:
             if field in data:
                 data[field] = float(data[field] or 0)
         
         return data
 
+class BudgetLineItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BudgetLineItem
+        fields = '__all__'
+
 class ActivityCostingAssumptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = ActivityCostingAssumption
@@ -194,4 +203,153 @@ class PlanReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ['evaluator', 'evaluator_name', 'reviewed_at']
         
     def get_evaluator_name(self, obj):
-        return obj.evaluator.user.get_full_name() if obj.evaluator and obj.evaluator.user else None
\ No newline at end of file
+        return obj.evaluator.user.get_full_name() if obj.evaluator and obj.evaluator.user else None
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer that builds representations straight from
+    queryset.values() rows, mirroring the output of `serializer_class`
+    without instantiating model objects.
+
+    Plain and related fields are read through their values() lookup and
+    rendered with the mirrored serializer's field. Method fields and model
+    properties are rendered by a `get_<field_name>(row)` method; lookups
+    those methods need go in `extra_lookups`.
+    """
+    serializer_class = None
+    extra_lookups = ()
+
+    def __init__(self, queryset, context=None):
+        self.queryset = queryset
+        self.context = context or {}
+
+    @classmethod
+    def get_columns(cls):
+        """Return (name, lookup, renderer) triples, resolved once per class"""
+        columns = cls.__dict__.get('_columns')
+        if columns is not None:
+            return columns
+
+        model = cls.serializer_class.Meta.model
+        columns = []
+        for name, field in cls.serializer_class().fields.items():
+            if field.write_only:
+                continue
+
+            method = getattr(cls, f'get_{name}', None)
+            if method is not None:
+                columns.append((name, None, method))
+                continue
+
+            if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+                raise ImproperlyConfigured(f'{cls.__name__} must define get_{name}()')
+            try:
+                model._meta.get_field(field.source_attrs[0])
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(f'{cls.__name__} must define get_{name}()')
+
+            # values() already returns the primary key for forward relations
+            renderer = None if isinstance(field, serializers.RelatedField) else field.to_representation
+            columns.append((name, '__'.join(field.source_attrs), renderer))
+
+        cls._columns = columns
+        return columns
+
+    def get_lookups(self):
+        lookups = [lookup for _, lookup, _ in self.get_columns() if lookup]
+        return lookups + [lookup for lookup in self.extra_lookups if lookup not in lookups]
+
+    def prefetch(self, rows):
+        """Hook to batch-load data needed by method fields"""
+
+    def to_representation(self, row):
+        data = {}
+        for name, lookup, renderer in self.get_columns():
+            if lookup is None:
+                data[name] = renderer(self, row)
+                continue
+            value = row[lookup]
+            data[name] = value if value is None or renderer is None else renderer(value)
+        return data
+
+    @property
+    def data(self):
+        rows = list(self.queryset.values(*self.get_lookups()))
+        self.prefetch(rows)
+        return [self.to_representation(row) for row in rows]
+
+    def stream(self, chunk_size=500):
+        """
+        Yield representations chunk by chunk using keyset pagination on the
+        primary key, so only one chunk of rows is held in memory at a time
+        """
+        pk_name = self.queryset.model._meta.pk.attname
+        lookups = self.get_lookups()
+        if pk_name not in lookups:
+            lookups.append(pk_name)
+
+        queryset = self.queryset.order_by(pk_name)
+        last_pk = None
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(chunk.values(*lookups)[:chunk_size])
+            if not rows:
+                return
+            self.prefetch(rows)
+            for row in rows:
+                yield self.to_representation(row)
+            last_pk = rows[-1][pk_name]
+
+class PerformanceMeasureValuesSerializer(ValuesSerializer):
+    serializer_class = PerformanceMeasureSerializer
+
+class ActivityBudgetValuesSerializer(ValuesSerializer):
+    serializer_class = ActivityBudgetSerializer
+    extra_lookups = ('budget_calculation_type',)
+
+    def get_total_funding(self, row):
+        return (
+            row['government_treasury'] +
+            row['sdg_funding'] +
+            row['partners_funding'] +
+            row['other_funding']
+        )
+
+    def get_estimated_cost(self, row):
+        return (
+            row['estimated_cost_with_tool']
+            if row['budget_calculation_type'] == 'WITH_TOOL'
+            else row['estimated_cost_without_tool']
+        )
+
+    def get_funding_gap(self, row):
+        return self.get_estimated_cost(row) - self.get_total_funding(row)
+
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        for field in ActivityBudgetSerializer.NUMERIC_FIELDS:
+            if field in data:
+                data[field] = float(data[field] or 0)
+        return data
+
+class MainActivityValuesSerializer(ValuesSerializer):
+    serializer_class = MainActivitySerializer
+
+    def prefetch(self, rows):
+        # One query for every budget in the batch instead of one per activity
+        budgets = ActivityBudget.objects.filter(activity_id__in=[row['id'] for row in rows])
+        self.budgets = {
+            budget['activity']: budget
+            for budget in ActivityBudgetValuesSerializer(budgets).data
+        }
+
+    def get_budget(self, row):
+        return self.budgets.get(row['id'])
+
+class PlanValuesSerializer(ValuesSerializer):
+    serializer_class = PlanSerializer
+    extra_lookups = ('organization__name',)
+
+    def get_organizationName(self, row):
+        return row['organization__name']
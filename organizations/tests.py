@@ -0,0 +1,1047 @@
+import csv
+import datetime
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+import msgpack
+import openpyxl
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from organizations import archive, revisions
+from organizations.logs import RequestIdFilter, request_id
+from organizations.profiling import ProfilingMiddleware
+from organizations.querypatterns import RepeatedQueries, detect_repeated_queries
+from organizations.readiness import validate_plan
+from organizations.renderers import MessagePackParser, MessagePackRenderer
+from organizations.models import (
+    Organization, OrganizationUser, StrategicObjective, StrategicInitiative, PerformanceMeasure,
+    MainActivity, ActivityBudget, ActivityCostingAssumption, Plan, PlanReview, PlanRevision, Tombstone,
+    IdempotencyKey
+)
+from organizations.rollover import rollover_plan
+from organizations.search import trigram_index
+from organizations.views import OrganizationViewSet, PlanViewSet
+from organizations.serializers import (
+    PerformanceMeasureSerializer, PerformanceMeasureValuesSerializer,
+    MainActivitySerializer, MainActivityValuesSerializer,
+    ActivityBudgetSerializer, ActivityBudgetValuesSerializer,
+    PlanSerializer, PlanValuesSerializer
+)
+
+
+def create_objective(initiatives=2, activities=3):
+    """A strategic objective with initiatives, measures, activities and budgets"""
+    objective = StrategicObjective.objects.create(
+        title='Objective one', description='Improve health', weight=Decimal('100')
+    )
+    for i in range(initiatives):
+        initiative = StrategicInitiative.objects.create(
+            name=f'Initiative {i}', weight=Decimal('10'), strategic_objective=objective
+        )
+        PerformanceMeasure.objects.create(
+            initiative=initiative, name=f'Measure {i}', weight=Decimal('35'),
+            q1_target=1, annual_target=10
+        )
+        for j in range(activities):
+            activity = MainActivity.objects.create(
+                initiative=initiative, name=f'Activity {i}.{j}', weight=Decimal('20'),
+                selected_months=['Tir', 'Meskerem'], selected_quarters=['Q1']
+            )
+            ActivityBudget.objects.create(
+                activity=activity, budget_calculation_type='WITH_TOOL', activity_type='Training',
+                estimated_cost_with_tool=Decimal('1000'), government_treasury=Decimal('500'),
+                training_details={'trainingLocation': 'Gambella', 'numberOfParticipants': 10, 'numberOfDays': 3}
+            )
+    return objective
+
+
+def create_plan(organization, objective, fiscal_year='2017'):
+    return Plan.objects.create(
+        organization=organization, planner_name='planner', type='LEAD_EXECUTIVE',
+        strategic_objective=objective, fiscal_year=fiscal_year,
+        from_date=datetime.date(2024, 7, 8), to_date=datetime.date(2025, 7, 7)
+    )
+
+
+class ValuesSerializerParityTests(TestCase):
+    """The values()-based list serializers render exactly what the ModelSerializers do"""
+
+    def setUp(self):
+        objective = create_objective(activities=2)
+        initiative = objective.initiatives.first()
+        # An activity without a budget and one budgeted without the tool
+        MainActivity.objects.create(
+            initiative=initiative, name='Unbudgeted', weight=Decimal('5'), selected_months=['Hamle']
+        )
+        activity = MainActivity.objects.create(
+            initiative=initiative, name='Manual', weight=Decimal('5'), selected_quarters=['Q2']
+        )
+        ActivityBudget.objects.create(
+            activity=activity, budget_calculation_type='WITHOUT_TOOL',
+            estimated_cost_without_tool=Decimal('250.50'), partners_funding=Decimal('100')
+        )
+        organization = Organization.objects.create(name='MoH', type='MINISTER')
+        create_plan(organization, objective)
+        create_plan(organization, objective, fiscal_year='2018')
+
+    def assertSameOutput(self, values_serializer, serializer, queryset):
+        render = JSONRenderer().render
+        self.assertEqual(
+            render(values_serializer(queryset).data),
+            render(serializer(queryset, many=True).data)
+        )
+
+    def test_performance_measures(self):
+        self.assertSameOutput(
+            PerformanceMeasureValuesSerializer, PerformanceMeasureSerializer, PerformanceMeasure.objects.order_by('id')
+        )
+
+    def test_main_activities(self):
+        self.assertSameOutput(MainActivityValuesSerializer, MainActivitySerializer, MainActivity.objects.order_by('id'))
+
+    def test_activity_budgets(self):
+        self.assertSameOutput(
+            ActivityBudgetValuesSerializer, ActivityBudgetSerializer, ActivityBudget.objects.order_by('id')
+        )
+
+    def test_plans(self):
+        self.assertSameOutput(PlanValuesSerializer, PlanSerializer, Plan.objects.order_by('-updated_at'))
+
+
+class MessagePackRendererTests(TestCase):
+    def setUp(self):
+        create_objective(initiatives=1, activities=2)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('planner', password='x'))
+
+    def test_msgpack_matches_json(self):
+        for url in ('/api/activity-budgets/', '/api/performance-measures/'):
+            as_json = self.client.get(url, HTTP_ACCEPT='application/json')
+            as_msgpack = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+            self.assertEqual(as_msgpack['Content-Type'], 'application/msgpack')
+            self.assertEqual(msgpack.unpackb(as_msgpack.content), as_json.json())
+
+    def test_decimals_round_trip_as_strings(self):
+        data = {'amount': Decimal('1234.50'), 'rates': [Decimal('0.10')], 'on': datetime.date(2024, 7, 8)}
+        rendered = MessagePackRenderer().render(data)
+        # A standard decoder, without any extension hook
+        self.assertEqual(msgpack.unpackb(rendered), {'amount': '1234.50', 'rates': ['0.10'], 'on': '2024-07-08'})
+        self.assertEqual(MessagePackParser().parse(io.BytesIO(rendered))['amount'], '1234.50')
+
+
+class RolloverTests(TestCase):
+    def setUp(self):
+        self.objective = create_objective()
+        self.first = Organization.objects.create(name='MoH', type='MINISTER')
+        self.second = Organization.objects.create(name='EPHI', type='STATE_MINISTER')
+
+    def test_rollover_clones_the_plan_hierarchy(self):
+        plan = create_plan(self.first, self.objective)
+        new_plan, counts = rollover_plan(plan, '2018')
+
+        self.assertEqual(new_plan.fiscal_year, '2018')
+        self.assertEqual(counts, {'initiatives': 2, 'performance_measures': 2, 'main_activities': 6, 'budgets': 6})
+        self.assertEqual(new_plan.initiatives().count(), 2)
+        self.assertEqual(plan.initiatives().count(), 2)
+
+    def test_shared_objective_is_cloned_once(self):
+        first_plan = create_plan(self.first, self.objective)
+        second_plan = create_plan(self.second, self.objective)
+
+        rollover_plan(first_plan, '2018')
+        new_plan, counts = rollover_plan(second_plan, '2018')
+
+        self.assertEqual(counts['initiatives'], 0)
+        self.assertEqual(StrategicInitiative.objects.filter(fiscal_year='2018').count(), 2)
+        self.assertEqual(MainActivity.objects.filter(initiative__fiscal_year='2018').count(), 6)
+        self.assertEqual(PerformanceMeasure.objects.filter(initiative__fiscal_year='2018').count(), 2)
+        self.assertEqual(new_plan.initiatives().count(), 2)
+        self.assertEqual(
+            set(new_plan.initiatives().values_list('rolled_over_from', flat=True)),
+            set(first_plan.initiatives().values_list('id', flat=True))
+        )
+
+
+    def test_undated_initiatives_stay_shared(self):
+        older_plan = create_plan(self.second, self.objective, fiscal_year='2016')
+        plan = create_plan(self.first, self.objective)
+        undated = set(plan.initiatives().values_list('id', flat=True))
+
+        new_plan, _ = rollover_plan(plan, '2018')
+
+        self.assertFalse(StrategicInitiative.objects.filter(id__in=undated, fiscal_year__isnull=False).exists())
+        self.assertEqual(set(older_plan.initiatives().values_list('id', flat=True)), undated)
+        self.assertEqual(set(plan.initiatives().values_list('id', flat=True)), undated)
+        self.assertEqual(set(new_plan.initiatives().values_list('rolled_over_from', flat=True)), undated)
+        self.assertEqual(set(new_plan.initiatives().values_list('fiscal_year', flat=True)), {'2018'})
+
+        # Readiness and revisions read the same initiatives
+        self.assertEqual(
+            {violation['object_id'] for violation in validate_plan(new_plan)['violations']
+             if violation['object_type'] == 'initiative'},
+            set(new_plan.initiatives().values_list('id', flat=True))
+        )
+        self.assertEqual(
+            set(revisions.snapshot(new_plan)['initiatives']),
+            {str(pk) for pk in new_plan.initiatives().values_list('id', flat=True)}
+        )
+
+    def test_rolled_over_plan_can_be_submitted_next_to_last_years(self):
+        plan = create_plan(self.first, self.objective)
+        Plan.objects.filter(pk=plan.pk).update(status='APPROVED')
+        new_plan, _ = rollover_plan(plan, '2018')
+
+        new_plan.status = 'SUBMITTED'
+        new_plan.save()
+
+        evaluator = User.objects.create_user('evaluator', password='x')
+        OrganizationUser.objects.create(user=evaluator, organization=self.first, role='EVALUATOR')
+        client = APIClient()
+        client.force_authenticate(evaluator)
+        response = client.post(
+            '/api/plans/bulk_review/', {'plans': [new_plan.id], 'status': 'APPROVED'}, format='json'
+        )
+        self.assertEqual(response.json()['reviewed'], 1)
+
+        # A second plan for the same year is still refused
+        duplicate = create_plan(self.first, self.objective, fiscal_year='2018')
+        duplicate.status = 'SUBMITTED'
+        with self.assertRaises(ValidationError):
+            duplicate.save()
+
+
+class RolledOverPlanReadTests(TestCase):
+    def setUp(self):
+        self.objective = create_objective()
+        organization = Organization.objects.create(name='MoH', type='MINISTER')
+        user = User.objects.create_user('admin', password='x')
+        OrganizationUser.objects.create(user=user, organization=organization, role='ADMIN')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+        self.plan = create_plan(organization, self.objective)
+        self.new_plan, _ = rollover_plan(self.plan, '2018')
+
+    def initiative_ids(self, plan):
+        response = self.client.get(f'/api/plans/{plan.id}/')
+        self.assertEqual(response.status_code, 200)
+        return {initiative['id'] for initiative in response.json()['objectives'][0]['initiatives']}
+
+    def test_retrieve_shows_the_plans_fiscal_year(self):
+        self.assertEqual(self.initiative_ids(self.plan), set(self.plan.initiatives().values_list('id', flat=True)))
+        self.assertEqual(self.initiative_ids(self.new_plan), set(self.new_plan.initiatives().values_list('id', flat=True)))
+        self.assertFalse(self.initiative_ids(self.plan) & self.initiative_ids(self.new_plan))
+
+    def test_objective_initiatives_default_to_the_latest_year(self):
+        url = f'/api/strategic-initiatives/?objective={self.objective.id}'
+        self.assertEqual({row['fiscal_year'] for row in self.client.get(url).json()}, {'2018'})
+        # The source year still reads the undated initiatives it was rolled over from
+        self.assertEqual({row['fiscal_year'] for row in self.client.get(f'{url}&fiscal_year=2017').json()}, {None})
+
+        summary = self.client.get(f'/api/strategic-initiatives/weight_summary/?objective={self.objective.id}').json()
+        self.assertEqual(summary['data']['total_initiatives_weight'], 20.0)
+
+
+@override_settings(QUERY_PATTERN_MODE='strict')
+class QueryPatternTests(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(name='MoH', type='MINISTER')
+        self.plans = [create_plan(organization, create_objective(initiatives=3)) for _ in range(3)]
+        user = User.objects.create_user('admin', password='x')
+        OrganizationUser.objects.create(user=user, organization=organization, role='ADMIN')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.initiative = self.plans[0].strategic_objective.initiatives.first()
+
+    def test_read_endpoints_do_not_repeat_queries(self):
+        for url in (
+            '/api/plans/',
+            f'/api/plans/{self.plans[0].id}/',
+            '/api/main-activities/',
+            f'/api/main-activities/?initiative={self.initiative.id}',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+    def test_n_plus_one_fails_in_strict_mode(self):
+        def list_with_n_plus_one(viewset, request, *args, **kwargs):
+            return Response([activity.initiative.name for activity in MainActivity.objects.all()])
+
+        with mock.patch.object(OrganizationViewSet, 'list', list_with_n_plus_one), \
+                self.assertLogs('django.request', 'ERROR'), self.assertRaises(RepeatedQueries) as raised:
+            self.client.get('/api/organizations/')
+        self.assertIn('GET /api/organizations/ repeated 1 query', str(raised.exception))
+        self.assertIn('at organizations/tests.py', str(raised.exception))
+
+    def test_detect_repeated_queries(self):
+        with self.assertRaises(RepeatedQueries):
+            with detect_repeated_queries(threshold=3):
+                [activity.initiative.name for activity in MainActivity.objects.all()]
+        with detect_repeated_queries(threshold=3):
+            [activity.initiative.name for activity in MainActivity.objects.select_related('initiative')]
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        trigram_index.invalidate()
+        self.objective = create_objective()
+        self.other_objective = StrategicObjective.objects.create(
+            title='Objective two', description='Expand immunization', weight=Decimal('50')
+        )
+        StrategicInitiative.objects.create(
+            name='Immunization outreach', weight=Decimal('10'), strategic_objective=self.other_objective
+        )
+        self.organization = Organization.objects.create(name='MoH', type='MINISTER')
+        other_organization = Organization.objects.create(name='EPHI', type='STATE_MINISTER')
+        self.plan = create_plan(self.organization, self.objective)
+        create_plan(other_organization, self.other_objective)
+
+        user = User.objects.create_user('planner', password='x')
+        OrganizationUser.objects.create(user=user, organization=self.organization, role='PLANNER')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def search(self, query):
+        response = self.client.get('/api/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_results_are_limited_to_the_users_organizations(self):
+        self.assertTrue(self.search('activity'))
+        self.assertEqual(self.search('immunization'), [])
+
+        other = User.objects.create_user('other', password='x')
+        OrganizationUser.objects.create(
+            user=other, organization=Organization.objects.get(name='EPHI'), role='PLANNER'
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(
+            {(row['type'], row['title']) for row in self.search('immunization')},
+            {('objective', 'Objective two'), ('initiative', 'Immunization outreach')}
+        )
+        self.assertEqual(self.search('activity'), [])
+
+    def test_rolled_over_rows_are_indexed(self):
+        self.assertTrue(self.search('activity'))
+        with self.captureOnCommitCallbacks(execute=True):
+            new_plan, _ = rollover_plan(self.plan, '2018')
+        new_ids = set(MainActivity.objects.filter(initiative__fiscal_year='2018').values_list('id', flat=True))
+        found = {row['id'] for row in self.search('activity') if row['type'] == 'main_activity'}
+        self.assertTrue(new_ids & found)
+
+
+class PlanImportTests(TestCase):
+    header = ['type', 'name', 'weight', 'objective', 'initiative', 'q1_target', 'annual_target', 'months', 'quarters']
+    rows = [
+        ['initiative', 'Outreach', '10', 'Objective one', '', '', '', '', ''],
+        ['measure', 'Coverage', '35', '', 'Outreach', '1', '10', '', ''],
+        ['activity', 'Campaign', '30', '', 'Outreach', '', '', 'JUL, AUG', ''],
+        ['activity', 'Training', '20', '', 'Outreach', '', '', '', 'Q1'],
+    ]
+
+    def setUp(self):
+        StrategicObjective.objects.create(title='Objective one', description='Improve health', weight=Decimal('100'))
+        user = User.objects.create_user('planner', password='x')
+        OrganizationUser.objects.create(
+            user=user, organization=Organization.objects.create(name='MoH', type='MINISTER'), role='PLANNER'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def csv(self, rows):
+        content = io.StringIO()
+        csv.writer(content).writerows([self.header] + rows)
+        return SimpleUploadedFile('plan.csv', content.getvalue().encode())
+
+    def xlsx(self, rows):
+        workbook = openpyxl.Workbook()
+        for row in [self.header] + rows:
+            workbook.active.append(row)
+        content = io.BytesIO()
+        workbook.save(content)
+        return SimpleUploadedFile('plan.xlsx', content.getvalue())
+
+    def upload(self, upload, **data):
+        return self.client.post('/api/plans/import/', {'file': upload, **data}, format='multipart')
+
+    def counts(self):
+        return (StrategicInitiative.objects.count(), PerformanceMeasure.objects.count(), MainActivity.objects.count())
+
+    def test_dry_run_writes_nothing(self):
+        for upload in (self.csv(self.rows), self.xlsx(self.rows)):
+            response = self.upload(upload, dry_run='true')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                response.json(),
+                {'dry_run': True, 'errors': [], 'counts': {'initiatives': 1, 'performance_measures': 1, 'main_activities': 2}}
+            )
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_csv_import(self):
+        response = self.upload(self.csv(self.rows), fiscal_year='2017')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['counts'], {'initiatives': 1, 'performance_measures': 1, 'main_activities': 2})
+
+        initiative = StrategicInitiative.objects.get()
+        self.assertEqual((initiative.name, initiative.fiscal_year), ('Outreach', '2017'))
+        self.assertEqual(initiative.performance_measures.get().annual_target, Decimal('10'))
+        campaign, training = initiative.main_activities.order_by('name')
+        self.assertEqual(len(campaign.selected_months), 2)
+        self.assertEqual(training.selected_quarters, ['Q1'])
+
+    def test_xlsx_import(self):
+        response = self.upload(self.xlsx(self.rows))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counts(), (1, 1, 2))
+
+    def test_invalid_rows_are_reported_and_nothing_is_written(self):
+        rows = self.rows + [
+            ['measure', 'Reach', '5', '', 'Outreach', '', '', '', ''],
+            ['activity', 'Survey', '10', '', 'Outreach', '', '', 'Someday', ''],
+            ['activity', 'Audit', '10', '', 'Missing', '', '', '', 'Q2'],
+            ['budget', 'Fuel', '5', '', '', '', '', '', ''],
+        ]
+        for upload in (self.csv(rows), self.xlsx(rows)):
+            response = self.upload(upload)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['errors'], [
+                {'row': 6, 'detail': 'Total weight of performance measures (40.00%) cannot exceed 35%'},
+                {'row': 7, 'detail': 'Unknown month "Someday"'},
+                {'row': 8, 'detail': 'Initiative "Missing" not found'},
+                {'row': 9, 'detail': 'type must be initiative, measure or activity'},
+            ])
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_unreadable_files(self):
+        response = self.upload(SimpleUploadedFile('plan.txt', b'type,name'))
+        self.assertEqual(response.json(), {'detail': 'Upload a .csv or .xlsx file'})
+        response = self.upload(SimpleUploadedFile('plan.xlsx', b'not a workbook'))
+        self.assertEqual(response.json(), {'detail': 'The XLSX file could not be read'})
+
+
+class PlanReadinessTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='MoH', type='MINISTER')
+        user = User.objects.create_user('planner', password='x')
+        OrganizationUser.objects.create(user=user, organization=self.organization, role='PLANNER')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def ready_plan(self):
+        objective = create_objective()
+        for initiative in objective.initiatives.all():
+            MainActivity.objects.create(
+                initiative=initiative, name='Closing', weight=Decimal('5'), selected_quarters=['Q4']
+            )
+        return create_plan(self.organization, objective)
+
+    def submit(self, plan):
+        return self.client.post(f'/api/plans/{plan.id}/submit/')
+
+    def rules(self, response):
+        return sorted(violation['rule'] for violation in response.json()['report']['violations'])
+
+    def test_ready_plan_is_submitted(self):
+        plan = self.ready_plan()
+        self.assertTrue(self.client.get(f'/api/plans/{plan.id}/readiness/').json()['is_ready'])
+
+        response = self.submit(plan)
+        self.assertEqual(response.status_code, 200)
+        plan.refresh_from_db()
+        self.assertEqual(plan.status, 'SUBMITTED')
+        self.assertEqual(PlanRevision.objects.get(plan=plan).reason, 'SUBMITTED')
+
+    def test_plan_without_initiatives_is_not_submitted(self):
+        objective = StrategicObjective.objects.create(title='Empty', description='', weight=Decimal('100'))
+        plan = create_plan(self.organization, objective)
+
+        response = self.submit(plan)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.rules(response), ['no_initiatives'])
+        plan.refresh_from_db()
+        self.assertEqual(plan.status, 'DRAFT')
+
+    def test_weight_mismatches_are_reported(self):
+        plan = self.ready_plan()
+        activity = MainActivity.objects.filter(name='Closing').first()
+        MainActivity.objects.filter(pk=activity.pk).update(weight=Decimal('1'))
+        measure = PerformanceMeasure.objects.first()
+        PerformanceMeasure.objects.filter(pk=measure.pk).update(weight=Decimal('30'))
+        budget = ActivityBudget.objects.first()
+        ActivityBudget.objects.filter(pk=budget.pk).update(government_treasury=Decimal('1500'))
+        StrategicObjective.objects.create(title='Another', description='', weight=Decimal('10'))
+
+        response = self.submit(plan)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.rules(response), ['activities_weight', 'budget_funding', 'measures_weight', 'objectives_total']
+        )
+        violations = {violation['rule']: violation for violation in response.json()['report']['violations']}
+        self.assertEqual(violations['activities_weight']['object_id'], activity.initiative_id)
+        self.assertEqual(violations['measures_weight']['object_id'], measure.initiative_id)
+        self.assertEqual(violations['budget_funding']['object_id'], budget.id)
+
+    def test_report_queries_do_not_grow_with_plans(self):
+        self.ready_plan()
+        with CaptureQueriesContext(connection) as few:
+            report = self.client.get('/api/plans/readiness_report/').json()
+        self.assertEqual((report['ready'], report['not_ready']), (1, 0))
+
+        for _ in range(3):
+            create_plan(self.organization, create_objective())
+        with CaptureQueriesContext(connection) as many:
+            report = self.client.get('/api/plans/readiness_report/').json()
+        self.assertEqual(report['not_ready'], 4)
+        self.assertEqual(len(few), len(many))
+
+
+class RecordRevisionsTests(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(name='MoH', type='MINISTER')
+        self.plans = [create_plan(organization, create_objective(initiatives=1, activities=1)) for _ in range(6)]
+
+    def test_batch_matches_single_revisions(self):
+        revisions.record_revisions(self.plans[:3], reason='SUBMITTED')
+        for plan in self.plans[3:]:
+            revisions.record_revision(plan, reason='SUBMITTED')
+        measure = PerformanceMeasure.objects.filter(initiative__strategic_objective=self.plans[0].strategic_objective).get()
+        measure.annual_target = 20
+        measure.save()
+
+        new_revisions = revisions.record_revisions(self.plans, reason='APPROVED')
+
+        self.assertEqual(len(new_revisions), 1)
+        self.assertEqual(new_revisions[0].data, [{
+            'op': 'replace',
+            'path': ['initiatives', str(measure.initiative_id), 'performance_measures', str(measure.id), 'annual_target'],
+            'value': '20.00'
+        }])
+        for plan in self.plans:
+            number = PlanRevision.objects.filter(plan=plan).count()
+            self.assertEqual(revisions.reconstruct(plan, number), revisions.snapshot(plan))
+
+    def test_query_count_does_not_grow_with_plans(self):
+        with CaptureQueriesContext(connection) as few:
+            revisions.record_revisions(self.plans[:2])
+        with CaptureQueriesContext(connection) as many:
+            revisions.record_revisions(self.plans[2:])
+        self.assertEqual(len(few), len(many))
+
+
+class BulkReviewTests(TestCase):
+    def setUp(self):
+        objective = create_objective()
+        self.administered = Organization.objects.create(name='MoH', type='MINISTER')
+        self.evaluated = Organization.objects.create(name='EPHI', type='STATE_MINISTER')
+        self.plans = [create_plan(self.administered, objective), create_plan(self.evaluated, objective)]
+        Plan.objects.update(status='SUBMITTED')
+
+        user = User.objects.create_user('reviewer', password='x')
+        OrganizationUser.objects.create(user=user, organization=self.administered, role='ADMIN')
+        self.evaluator = OrganizationUser.objects.create(user=user, organization=self.evaluated, role='EVALUATOR')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_plans_outside_the_evaluators_organizations_fail(self):
+        response = self.client.post(
+            '/api/plans/bulk_review/', {'plans': [plan.id for plan in self.plans], 'status': 'APPROVED'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['ok'] for result in results], [False, True])
+        self.assertEqual(results[0]['detail'], 'Not an evaluator for this organization')
+
+        self.assertEqual(Plan.objects.get(pk=self.plans[0].pk).status, 'SUBMITTED')
+        self.assertEqual(PlanReview.objects.get().evaluator, self.evaluator)
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        objective = create_objective(initiatives=1, activities=3)
+        self.organization = Organization.objects.create(name='MoH', type='MINISTER')
+        self.plans = [create_plan(self.organization, objective), create_plan(self.organization, objective, '2018')]
+        user = User.objects.create_user('planner', password='x')
+        OrganizationUser.objects.create(user=user, organization=self.organization, role='PLANNER')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def cursor(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['X-Sync-Cursor']
+
+    def sync(self, url, cursor):
+        response = self.client.get(url, {'updated_since': cursor})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_and_deletions_after_the_cursor_come_back(self):
+        cursor = self.cursor('/api/main-activities/')
+        changed, deleted, unchanged = MainActivity.objects.order_by('id')
+        deleted_id = deleted.id
+        changed.name = 'Renamed'
+        changed.save()
+        deleted.delete()
+        added = MainActivity.objects.create(
+            initiative=changed.initiative, name='Added', weight=Decimal('5'), selected_quarters=['Q3']
+        )
+
+        data = self.sync('/api/main-activities/', cursor)
+        self.assertEqual({row['id'] for row in data['results']}, {changed.id, added.id})
+        self.assertEqual(data['deleted'], [deleted_id])
+        # The deleted activity's budget went with it
+        budgets = self.sync('/api/activity-budgets/', cursor)
+        self.assertEqual(budgets['results'], [])
+        self.assertEqual(len(budgets['deleted']), 1)
+
+        # Nothing has changed since the new cursor
+        data = self.sync('/api/main-activities/', data['cursor'])
+        self.assertEqual((data['results'], data['deleted']), ([], []))
+
+    def test_values_serialized_lists(self):
+        cursor = self.cursor('/api/plans/')
+        changed, deleted = self.plans
+        deleted_id = deleted.id
+        changed.executive_name = 'Director'
+        changed.save()
+        deleted.delete()
+
+        data = self.sync('/api/plans/', cursor)
+        self.assertEqual([row['id'] for row in data['results']], [changed.id])
+        self.assertEqual(data['results'][0]['executive_name'], 'Director')
+        self.assertEqual(data['deleted'], [deleted_id])
+
+    def test_bad_and_expired_cursors(self):
+        response = self.client.get('/api/plans/', {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+        expired = timezone.now() - datetime.timedelta(days=settings.TOMBSTONE_RETENTION_DAYS + 1)
+        response = self.client.get('/api/plans/', {'updated_since': expired.isoformat()})
+        self.assertEqual(response.status_code, 410)
+
+    def test_purge_keeps_tombstones_within_retention(self):
+        now = timezone.now()
+        for days in (1, settings.TOMBSTONE_RETENTION_DAYS - 1, settings.TOMBSTONE_RETENTION_DAYS + 1):
+            Tombstone.objects.create(model='plan', object_id=days, deleted_at=now - datetime.timedelta(days=days))
+
+        call_command('purge_tombstones', stdout=io.StringIO())
+        self.assertEqual(
+            sorted(Tombstone.objects.values_list('object_id', flat=True)), [1, settings.TOMBSTONE_RETENTION_DAYS - 1]
+        )
+
+        call_command('purge_tombstones', days=2, stdout=io.StringIO())
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [1])
+
+        # A cursor still inside the window sees the deletions it needs
+        cursor = (now - datetime.timedelta(days=2)).isoformat()
+        self.assertEqual(self.sync('/api/plans/', cursor)['deleted'], [1])
+
+
+class UpdateBudgetVersionTests(TestCase):
+    def setUp(self):
+        create_objective(initiatives=1, activities=1)
+        self.budget = ActivityBudget.objects.get()
+        user = User.objects.create_user('planner', password='x')
+        OrganizationUser.objects.create(
+            user=user, organization=Organization.objects.create(name='MoH', type='MINISTER'), role='PLANNER'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.url = f'/api/main-activities/{self.budget.activity_id}/update_budget/'
+        self.data = {
+            'budget_calculation_type': 'WITH_TOOL', 'estimated_cost_with_tool': 1000, 'government_treasury': 700
+        }
+
+    def test_if_match_is_checked_against_the_budget(self):
+        stale = self.budget.version
+        self.budget.government_treasury = Decimal('600')
+        self.budget.save()
+
+        # The activity itself is unchanged, so its version still matches
+        response = self.client.post(
+            self.url, self.data, format='json', HTTP_IF_MATCH=f'"{stale}"'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.government_treasury, Decimal('600'))
+
+        response = self.client.post(
+            self.url, self.data, format='json', HTTP_IF_MATCH=f'"{self.budget.version}"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], self.budget.version + 1)
+
+
+class IdempotencyKeyTests(TestCase):
+    url = '/api/plans/'
+
+    def setUp(self):
+        self.organization = Organization.objects.create(name='MoH', type='MINISTER')
+        self.objective = create_objective(initiatives=1, activities=1)
+        self.user = User.objects.create_user('planner', password='x')
+        OrganizationUser.objects.create(user=self.user, organization=self.organization, role='PLANNER')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.data = {
+            'organization': self.organization.id, 'planner_name': 'planner', 'type': 'LEAD_EXECUTIVE',
+            'strategic_objective': self.objective.id, 'fiscal_year': '2017',
+            'from_date': '2024-07-08', 'to_date': '2025-07-07'
+        }
+
+    def post(self, data=None, key='key-1'):
+        return self.client.post(self.url, data or self.data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        location = {'Location': '/api/plans/1/'}
+        with mock.patch.object(PlanViewSet, 'get_success_headers', return_value=location):
+            first = self.post()
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(
+            IdempotencyKey.objects.get().headers, {'ETag': first['ETag'], 'Location': '/api/plans/1/'}
+        )
+
+        retry = self.post()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['ETag'], first['ETag'])
+        self.assertEqual(retry['Location'], '/api/plans/1/')
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Plan.objects.count(), 1)
+
+    def test_key_reused_for_another_request_is_refused(self):
+        self.assertEqual(self.post().status_code, 201)
+        response = self.post({**self.data, 'fiscal_year': '2018'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Plan.objects.count(), 1)
+
+    def test_retry_while_the_first_attempt_runs_conflicts(self):
+        retries = []
+        create = PlanViewSet.perform_create
+
+        def perform_create(viewset, serializer):
+            retries.append(self.post())
+            create(viewset, serializer)
+
+        with mock.patch.object(PlanViewSet, 'perform_create', perform_create):
+            self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(retries[0].status_code, 409)
+        self.assertEqual(Plan.objects.count(), 1)
+
+    def test_server_error_frees_the_key(self):
+        with mock.patch.object(PlanViewSet, 'perform_create', side_effect=RuntimeError('boom')), \
+                self.assertLogs('django.request', 'ERROR'), self.assertRaises(RuntimeError):
+            self.post()
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('planner', password='x'))
+
+    def test_failed_sub_request_is_logged(self):
+        calls = [{'method': 'GET', 'url': '/api/organizations/'}, {'method': 'GET', 'url': '/api/plans/'}]
+        with mock.patch.object(OrganizationViewSet, 'list', side_effect=RuntimeError('boom')), \
+                self.assertLogs('organizations.batch', 'ERROR') as logs:
+            response = self.client.post('/api/batch/', {'requests': calls}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['responses']], [500, 200])
+        self.assertIn('GET /api/organizations/', logs.output[0])
+        self.assertEqual(logs.records[0].exc_info[0], RuntimeError)
+
+
+class RequestIdLoggingTests(TestCase):
+    def test_django_request_records_carry_the_request_id(self):
+        with self.assertLogs('django.request', 'WARNING') as logs:
+            response = self.client.get('/api/plans/', HTTP_X_REQUEST_ID='req-42')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response['X-Request-ID'], 'req-42')
+
+        # Django logs the response after the middleware has reset the id
+        record = logs.records[0]
+        self.assertIsNone(request_id.get())
+        RequestIdFilter().filter(record)
+        self.assertEqual(record.request_id, 'req-42')
+
+
+# A 409 reads the row's current state after the failed save, which a
+# TestCase's wrapping transaction would no longer allow
+class BatchPreconditionTests(TransactionTestCase):
+    def setUp(self):
+        create_objective(initiatives=1, activities=2)
+        self.first, self.second = MainActivity.objects.order_by('id')
+        self.first.name = 'Renamed'
+        self.first.save()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('planner', password='x'))
+
+    def batch(self, calls, **headers):
+        response = self.client.post('/api/batch/', {'requests': calls}, format='json', **headers)
+        self.assertEqual(response.status_code, 200)
+        return [result['status'] for result in response.json()['responses']]
+
+    def rename(self, activity, name, **call):
+        return {'method': 'PATCH', 'url': f'/api/main-activities/{activity.id}/', 'body': {'name': name}, **call}
+
+    def test_batch_if_match_is_not_applied_to_its_calls(self):
+        calls = [self.rename(self.first, 'First'), self.rename(self.second, 'Second')]
+        self.assertEqual(self.batch(calls, HTTP_IF_MATCH=f'"{self.first.version}"'), [200, 200])
+
+    def test_calls_carry_their_own_if_match(self):
+        calls = [
+            self.rename(self.first, 'First', if_match=f'"{self.first.version}"'),
+            self.rename(self.second, 'Second', if_match=f'"{self.second.version + 1}"'),
+        ]
+        self.assertEqual(self.batch(calls), [200, 409])
+        self.second.refresh_from_db()
+        self.assertNotEqual(self.second.name, 'Second')
+
+
+class StaticAssetTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        for name in ('app.js', 'app.js.br', 'app.js.gz'):
+            with open(os.path.join(self.root.name, name), 'w') as f:
+                f.write(name)
+
+    def encoding(self, accept_encoding):
+        with override_settings(STATIC_ROOT=self.root.name):
+            response = self.client.get('/static/app.js', HTTP_ACCEPT_ENCODING=accept_encoding)
+        self.assertEqual(response.status_code, 200)
+        return response.get('Content-Encoding')
+
+    def test_encoding_follows_q_values(self):
+        self.assertEqual(self.encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(self.encoding('br;q=0, gzip'), 'gzip')
+        self.assertEqual(self.encoding('gzip;q=1, br;q=0.5'), 'gzip')
+        self.assertEqual(self.encoding('*;q=0.5, br;q=0'), 'gzip')
+        self.assertIsNone(self.encoding('gzip;q=0'))
+        self.assertIsNone(self.encoding('xbr, identity'))
+
+    def test_api_responses_are_not_compressed(self):
+        self.client.force_login(User.objects.create_user('planner', password='x'))
+        response = self.client.get('/api/organizations/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        store_setting = override_settings(PROFILE_STORE_DIR=store.name)
+        store_setting.enable()
+        self.addCleanup(store_setting.disable)
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+
+    def test_only_the_value_1_asks_for_a_profile(self):
+        self.assertIn('X-Profile-Id', self.client.get('/api/organizations/', HTTP_X_PROFILE='1'))
+        self.assertIn('X-Profile-Id', self.client.get('/api/organizations/', {'_profile': '1'}))
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/organizations/', HTTP_X_PROFILE='0'))
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/organizations/'))
+
+        self.client.force_login(User.objects.create_user('planner', password='x'))
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/organizations/', HTTP_X_PROFILE='1'))
+
+    def test_other_requests_do_not_load_the_user(self):
+        middleware = ProfilingMiddleware(lambda request: HttpResponse())
+        # Without a user attribute, any look at request.user would raise
+        request = RequestFactory().get('/static/app.js', HTTP_X_PROFILE='0')
+        self.assertNotIn('X-Profile-Id', middleware(request))
+
+
+class ArchivedPlanReadTests(TestCase):
+    def setUp(self):
+        self.objective = create_objective()
+        StrategicInitiative.objects.update(fiscal_year='2017')
+        organization = Organization.objects.create(name='MoH', type='MINISTER')
+        user = User.objects.create_user('admin', password='x')
+        OrganizationUser.objects.create(user=user, organization=organization, role='ADMIN')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+        self.plan = create_plan(organization, self.objective)
+        Plan.objects.filter(pk=self.plan.pk).update(status='APPROVED')
+
+    def test_archived_plan_shows_its_archived_initiatives(self):
+        expected = self.client.get(f'/api/plans/{self.plan.id}/').json()['objectives']
+        list(archive.archive_fiscal_year('2017'))
+        # A newer year's initiative under the same objective must not show up
+        StrategicInitiative.objects.create(
+            name='Next year', weight=Decimal('10'), strategic_objective=self.objective, fiscal_year='2018'
+        )
+
+        response = self.client.get(f'/api/plans/{self.plan.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['archived'])
+        objectives = response.json()['objectives']
+        self.assertEqual(len(objectives[0]['initiatives']), 2)
+        self.assertEqual(objectives, expected)
+
+
+class ArchiveRoundTripTests(TestCase):
+    def setUp(self):
+        create_objective()
+        StrategicInitiative.objects.update(fiscal_year='2017')
+        organization = Organization.objects.create(name='MoH', type='MINISTER')
+        self.plan = create_plan(organization, StrategicObjective.objects.get())
+        self.new_plan, _ = rollover_plan(self.plan, '2018')
+        Plan.objects.filter(pk=self.plan.pk).update(status='APPROVED')
+
+    def lineage(self):
+        return (
+            dict(StrategicInitiative.objects.filter(fiscal_year='2018').values_list('id', 'rolled_over_from')),
+            dict(MainActivity.objects.filter(initiative__fiscal_year='2018').values_list('id', 'rolled_over_from'))
+        )
+
+    def test_archive_and_restore_keep_the_next_years_lineage(self):
+        lineage = self.lineage()
+        old_initiatives = set(self.plan.initiatives().values_list('id', flat=True))
+        self.assertEqual(set(lineage[0].values()), old_initiatives)
+
+        list(archive.archive_fiscal_year('2017'))
+        self.assertEqual(self.lineage(), lineage)
+        self.assertFalse(StrategicInitiative.objects.filter(id__in=old_initiatives).exists())
+        self.assertEqual(
+            set(Tombstone.objects.filter(model='strategicinitiative').values_list('object_id', flat=True)),
+            old_initiatives
+        )
+        self.assertEqual(Tombstone.objects.filter(model='mainactivity').count(), 6)
+        self.assertEqual(Tombstone.objects.filter(model='plan').get().object_id, self.plan.id)
+
+        list(archive.restore_fiscal_year('2017'))
+        self.assertEqual(self.lineage(), lineage)
+        self.assertEqual(
+            set(StrategicInitiative.objects.filter(id__in=lineage[0].values()).values_list('fiscal_year', flat=True)),
+            {'2017'}
+        )
+        self.assertEqual(MainActivity.objects.filter(id__in=lineage[1].values()).count(), 6)
+
+    def test_batches_do_not_query_per_row(self):
+        with CaptureQueriesContext(connection) as few:
+            list(archive.archive_fiscal_year('2017'))
+        list(archive.restore_fiscal_year('2017'))
+        create_objective(initiatives=4)
+        StrategicInitiative.objects.filter(fiscal_year__isnull=True).update(fiscal_year='2017')
+        with CaptureQueriesContext(connection) as many:
+            list(archive.archive_fiscal_year('2017'))
+        self.assertEqual(len(few), len(many))
+
+
+class CostingAssumptionListTests(TestCase):
+    def setUp(self):
+        rate = {'activity_type': 'Training', 'location': 'Gambella', 'cost_type': 'per_diem'}
+        self.old = ActivityCostingAssumption.objects.create(amount=Decimal('1000'), **rate)
+        ActivityCostingAssumption.objects.filter(pk=self.old.pk).update(effective_from=datetime.date(2020, 1, 1))
+        self.current = ActivityCostingAssumption.objects.create(amount=Decimal('1100'), **rate)
+        self.future = ActivityCostingAssumption.objects.create(
+            amount=Decimal('1400'), effective_from=timezone.localdate() + datetime.timedelta(days=30), **rate
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('planner', password='x'))
+
+    def ids(self, query=''):
+        response = self.client.get(f'/api/activity-costing-assumptions/{query}')
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()]
+
+    def test_list_defaults_to_the_rates_in_effect_today(self):
+        self.assertEqual(self.ids(), [self.current.id])
+        self.assertEqual(self.ids('?as_of=2021-06-01'), [self.old.id])
+        self.assertEqual(sorted(self.ids('?history=1')), sorted([self.old.id, self.current.id, self.future.id]))
+
+    def test_detail_reads_any_version(self):
+        response = self.client.get(f'/api/activity-costing-assumptions/{self.future.id}/')
+        self.assertEqual(response.status_code, 200)
+
+
+class CostingScenarioTests(TestCase):
+    url = '/api/activity-budgets/scenario/'
+    overrides = {'overrides': [{'cost_type': 'per_diem', 'location': 'Gambella', 'amount': 2000}]}
+
+    def setUp(self):
+        objective = create_objective(initiatives=1, activities=2)
+        for budget in ActivityBudget.objects.all():
+            budget.sync_line_items()
+        self.organization = Organization.objects.create(name='MoH', type='MINISTER')
+        self.other = Organization.objects.create(name='EPHI', type='STATE_MINISTER')
+        create_plan(self.organization, objective)
+        create_plan(self.other, objective)
+        create_plan(self.other, create_objective(initiatives=1, activities=1))
+
+        self.admin = User.objects.create_user('admin', password='x')
+        OrganizationUser.objects.create(user=self.admin, organization=self.organization, role='ADMIN')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_only_admins_of_the_organization_can_run_scenarios(self):
+        planner = User.objects.create_user('planner', password='x')
+        OrganizationUser.objects.create(user=planner, organization=self.organization, role='PLANNER')
+        client = APIClient()
+        client.force_authenticate(planner)
+        self.assertEqual(client.post(self.url, self.overrides, format='json').status_code, 403)
+
+        response = self.client.post(self.url, {**self.overrides, 'organization': self.other.id}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_scenario_covers_the_admins_organizations_from_stored_costs(self):
+        response = self.client.post(self.url, self.overrides, format='json')
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+
+        # Only the objective MoH plans; its two budgets are stored at 1000 each
+        self.assertEqual(result['total']['current'], 2000.0)
+        self.assertGreater(result['total']['delta'], 0)
+        self.assertEqual(result['total']['scenario'], 2000.0 + result['total']['delta'])
+        self.assertEqual([row['organization'] for row in result['by_organization']], [self.organization.id])
+
+
+class PlanReviewVersionTests(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(name='MoH', type='MINISTER')
+        self.plan = create_plan(organization, create_objective())
+        self.plan.status = 'SUBMITTED'
+        self.plan.save()
+        user = User.objects.create_user('evaluator', password='x')
+        OrganizationUser.objects.create(user=user, organization=organization, role='EVALUATOR')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_stale_if_match_writes_no_review(self):
+        stale = self.plan.version
+        self.plan.planner_name = 'someone else'
+        self.plan.save()
+
+        for action, data in (('approve', {}), ('reject', {'feedback': 'Revise'})):
+            response = self.client.post(
+                f'/api/plans/{self.plan.id}/{action}/', data, format='json', HTTP_IF_MATCH=f'"{stale}"'
+            )
+            self.assertEqual(response.status_code, 409)
+        self.assertFalse(PlanReview.objects.exists())
+        self.assertFalse(PlanRevision.objects.exists())
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.status, 'SUBMITTED')
+
+        response = self.client.post(
+            f'/api/plans/{self.plan.id}/approve/', format='json', HTTP_IF_MATCH=f'"{self.plan.version}"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PlanReview.objects.get().id, response.json()['review_id'])
@@ -4,9 +4,10 @@ from .views import (
     OrganizationViewSet, StrategicObjectiveViewSet,
     ProgramViewSet, SubProgramViewSet, StrategicInitiativeViewSet,
     PerformanceMeasureViewSet, MainActivityViewSet,
-    ActivityBudgetViewSet, ActivityCostingAssumptionViewSet,
+    ActivityBudgetViewSet, ActivityCostingAssumptionViewSet, BudgetLineItemViewSet,
     PlanViewSet, PlanReviewViewSet,
-    login_view, logout_view, check_auth
+    login_view, logout_view, check_auth, search_view, batch_view,
+    profile_list, profile_detail, profile_download
 )
 
 router = DefaultRouter()
@@ -19,6 +20,7 @@ router.register(r'performance-measures', PerformanceMeasureViewSet)
 router.register(r'main-activities', MainActivityViewSet)
 router.register(r'activity-budgets', ActivityBudgetViewSet)
 router.register(r'activity-costing-assumptions', ActivityCostingAssumptionViewSet)
+router.register(r'budget-line-items', BudgetLineItemViewSet)
 router.register(r'plans', PlanViewSet)
 router.register(r'plan-reviews', PlanReviewViewSet)
 
@@ -27,6 +29,11 @@ urlpatterns = [
     path('auth/login/', login_view, name='login'),
     path('auth/logout/', logout_view, name='logout'),
     path('auth/check/', check_auth, name='check_auth'),
+    path('search/', search_view, name='search'),
+    path('batch/', batch_view, name='batch'),
+    path('profiles/', profile_list, name='profile-list'),
+    path('profiles/<str:profile_id>/', profile_detail, name='profile-detail'),
+    path('profiles/<str:profile_id>/download/', profile_download, name='profile-download'),
     # Add custom budget update endpoint
     path('main-activities/<str:pk>/budget/', MainActivityViewSet.as_view({'post': 'update_budget'}), name='activity-budget-update'),
 ]
\ No newline at end of file
@@ -3,20 +3,28 @@ from django.urls import path, include
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.exceptions import ParseError
 from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse, FileResponse, Http404
 from django.contrib.auth import authenticate, login, logout
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_protect
-from django.db.models import Sum, Q
+from django.db.models import Sum, Q, Count, Exists, OuterRef, Max
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.db import transaction
-from django.utils.dateparse import parse_date
+from django.utils.dateparse import parse_date, parse_datetime
+from django.conf import settings
+from django.core.cache import cache
 from decimal import Decimal
 import datetime
+import logging
 from .models import (
     Organization, OrganizationUser, StrategicObjective,
     Program, SubProgram, StrategicInitiative, PerformanceMeasure, MainActivity,
-    ActivityBudget, ActivityCostingAssumption, Plan, PlanReview
+    ActivityBudget, ActivityCostingAssumption, Plan, PlanReview, BudgetLineItem, Tombstone,
+    PlanRevision, VersionConflict, check_auth_cache_key, ArchivedPlanReview, ArchivedStrategicInitiative,
+    ARCHIVE_MODELS, FISCAL_MONTHS, FISCAL_QUARTERS, normalize_month, objective_filter, fiscal_year_filter
 )
 from .serializers import (
     OrganizationSerializer, OrganizationUserSerializer,
@@ -24,8 +32,25 @@ from .serializers import (
     SubProgramSerializer, StrategicInitiativeSerializer,
     UserSerializer, PerformanceMeasureSerializer, MainActivitySerializer,
     ActivityBudgetSerializer, ActivityCostingAssumptionSerializer,
-    PlanSerializer, PlanReviewSerializer
+    PlanSerializer, PlanReviewSerializer,
+    PerformanceMeasureValuesSerializer, MainActivityValuesSerializer,
+    PlanValuesSerializer, BudgetLineItemSerializer
 )
+from .renderers import NDJSONRenderer, iter_ndjson, iter_json_array
+from . import search
+from .rollover import rollover_plan
+from .importer import import_plan
+from . import batch
+from .readiness import validate_plan, validate_plans
+from .idempotency import idempotent
+from .reviews import bulk_review, MAX_PLANS as MAX_REVIEWED_PLANS
+from . import revisions
+from . import archive
+from . import profiling
+from . import scenarios
+from .querypatterns import allow_repeated_queries
+
+logger = logging.getLogger(__name__)
 
 @api_view(['POST', 'GET'])
 @permission_classes([permissions.AllowAny])
@@ -47,13 +72,12 @@ def login_view(request):
     
     if user is not None:
         login(request, user)
-        user_orgs = OrganizationUser.objects.filter(user=user)
-        user_orgs_data = OrganizationUserSerializer(user_orgs, many=True).data
+        payload = auth_payload(user)
         
         return Response({
             'success': True, 
-            'user': UserSerializer(user).data,
-            'userOrganizations': user_orgs_data,
+            'user': payload['user'],
+            'userOrganizations': payload['userOrganizations'],
             'message': 'Login successful'
         })
     else:
@@ -75,20 +99,341 @@ def logout_view(request):
     
     return response
 
+def auth_payload(user):
+    """
+    The user and their memberships as returned by login and check_auth,
+    cached per user until a membership, the user or an organization changes
+    """
+    key = check_auth_cache_key(user.pk)
+    payload = cache.get(key)
+    if payload is None:
+        user_orgs = OrganizationUser.objects.filter(user=user).select_related('user', 'organization')
+        payload = {
+            'user': UserSerializer(user).data,
+            'userOrganizations': OrganizationUserSerializer(user_orgs, many=True).data
+        }
+        cache.set(key, payload, settings.CHECK_AUTH_CACHE_SECONDS)
+    return payload
+
 @api_view(['GET'])
 def check_auth(request):
     if request.user.is_authenticated:
-        user_orgs = OrganizationUser.objects.filter(user=request.user)
-        user_orgs_data = OrganizationUserSerializer(user_orgs, many=True).data
-        
-        return Response({
-            'isAuthenticated': True, 
-            'user': UserSerializer(request.user).data,
-            'userOrganizations': user_orgs_data
-        })
+        return Response({'isAuthenticated': True, **auth_payload(request.user)})
     return Response({'isAuthenticated': False})
 
-class OrganizationViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+def search_view(request):
+    """
+    Ranked search over objectives, programs, subprograms, initiatives,
+    performance measures and main activities
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response(
+            {'detail': 'Search query (q) is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Users without an organization role see nothing, as with plans
+    organization_ids = list(
+        OrganizationUser.objects.filter(user=request.user).values_list('organization_id', flat=True)
+    )
+    if not organization_ids:
+        return Response({'query': query, 'results': []})
+
+    types = request.query_params.get('types')
+    result_types = [t.strip() for t in types.split(',')] if types else None
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+
+    return Response({
+        'query': query,
+        # Only what the user's organizations plan
+        'results': search.search(
+            query, result_types, limit,
+            objective_ids=Plan.objects.filter(organization__in=organization_ids).values('strategic_objective')
+        )
+    })
+
+# Sub-requests run one after another share the detector
+@allow_repeated_queries
+@api_view(['POST'])
+def batch_view(request):
+    """
+    Run several API calls in one round trip. Body:
+    {"requests": [{"id": ..., "method": "GET", "url": "/api/programs/?...", "body": {...}, "if_match": "3"}],
+     "parallel": true}
+    Returns {"responses": [{"id": ..., "status": ..., "body": ...}]} in request order.
+    """
+    calls = request.data.get('requests')
+    error = batch.validate(calls)
+    if error:
+        return Response(
+            {'detail': error},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    parallel = bool(request.data.get('parallel', False))
+    return Response({'responses': batch.dispatch(request._request, calls, parallel)})
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_list(request):
+    """Stored request profiles, newest first (see organizations.profiling)"""
+    return Response(profiling.list_profiles())
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_detail(request, profile_id):
+    """A stored profile with its SQL queries and slowest functions"""
+    try:
+        return Response(profiling.load_profile(profile_id))
+    except FileNotFoundError:
+        return Response({'detail': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_download(request, profile_id):
+    """The raw pstats file of a stored profile"""
+    try:
+        path = profiling.pstats_path(profile_id)
+    except FileNotFoundError:
+        return Response({'detail': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{profile_id}.prof',
+                        content_type='application/octet-stream')
+
+def filter_by_plan_scope(queryset, params, prefix):
+    """
+    Limit rows to the strategic objectives planned by ?organization= and/or
+    in ?fiscal_year=. `prefix` is the lookup path from the rows to their
+    initiative (e.g. 'initiative__' for activities).
+    """
+    organization_id = params.get('organization')
+    fiscal_year = params.get('fiscal_year')
+    if not organization_id and not fiscal_year:
+        return queryset
+
+    plans = Plan.objects.all()
+    if organization_id:
+        plans = plans.filter(organization_id=organization_id)
+    if fiscal_year:
+        plans = plans.filter(fiscal_year=fiscal_year)
+    return queryset.filter(objective_filter(plans.values('strategic_objective'), prefix=prefix))
+
+class DeltaSyncMixin:
+    """
+    Incremental sync for list endpoints. With ?updated_since=<cursor> the list
+    returns only rows changed since the cursor, the ids deleted since then and
+    a new cursor. Every list response carries its cursor in X-Sync-Cursor.
+    """
+    sync_cursor_header = 'X-Sync-Cursor'
+
+    def list(self, request, *args, **kwargs):
+        # Taken before querying so changes made during the request are resent next time
+        cursor = timezone.now()
+        since = request.query_params.get('updated_since')
+
+        if since is None:
+            response = super().list(request, *args, **kwargs)
+            response[self.sync_cursor_header] = cursor.isoformat()
+            return response
+
+        since = parse_datetime(since.replace(' ', '+'))
+        if since is None:
+            return Response(
+                {'detail': 'updated_since must be a cursor returned by a previous sync'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, datetime.timezone.utc)
+
+        # Tombstones older than the retention window are purged, so older cursors need a full reload
+        retention = datetime.timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+        if since < cursor - retention:
+            return Response(
+                {'detail': 'Sync cursor has expired, reload the full list'},
+                status=status.HTTP_410_GONE
+            )
+
+        queryset = self.filter_queryset(self.get_queryset()).filter(updated_at__gte=since)
+        values_serializer_class = getattr(self, 'values_serializer_class', None)
+        if values_serializer_class is not None:
+            results = values_serializer_class(queryset, context=self.get_serializer_context()).data
+        else:
+            results = self.get_serializer(queryset, many=True).data
+
+        deleted = Tombstone.objects.filter(
+            model=queryset.model._meta.model_name,
+            deleted_at__gte=since
+        ).values_list('object_id', flat=True).distinct()
+
+        response = Response({
+            'results': results,
+            'deleted': list(deleted),
+            'cursor': cursor.isoformat(),
+        })
+        response[self.sync_cursor_header] = cursor.isoformat()
+        return response
+
+class ValuesListMixin:
+    """
+    Serve GET list requests from a values()-based serializer, skipping
+    model instantiation for read-only collections.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.values_serializer_class(queryset, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+class StreamingListMixin(ValuesListMixin):
+    """
+    Stream GET list requests in chunks when the client opts in with
+    ?stream=json|ndjson or `Accept: application/x-ndjson`, keeping peak
+    memory bounded by the chunk size instead of the table size.
+    """
+    stream_chunk_size = 500
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
+
+    def list(self, request, *args, **kwargs):
+        stream_format = request.query_params.get('stream')
+        if stream_format is None and request.accepted_renderer.format == NDJSONRenderer.format:
+            stream_format = NDJSONRenderer.format
+
+        if stream_format not in ('json', NDJSONRenderer.format):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.values_serializer_class(queryset, context=self.get_serializer_context())
+        items = serializer.stream(self.stream_chunk_size)
+
+        if stream_format == NDJSONRenderer.format:
+            return StreamingHttpResponse(iter_ndjson(items), content_type=NDJSONRenderer.media_type)
+        return StreamingHttpResponse(iter_json_array(items), content_type='application/json')
+
+class ArchiveReadMixin:
+    """
+    Lists asked for an archived fiscal year (?fiscal_year=) also include the
+    rows moved to the archive tables (see organizations.archive), filtered by
+    the same get_queryset(). Other requests never read the archive.
+    """
+    # prefetch_related() lookups the serializer's nested fields need on archived rows
+    archive_prefetch = ()
+    reading_archive = False
+
+    def get_queryset(self):
+        if self.reading_archive:
+            archived_model = ARCHIVE_MODELS[self.queryset.model]
+            return archived_model.objects.order_by(*self.queryset.query.order_by)
+        return super().get_queryset()
+
+    def get_archived_queryset(self):
+        self.reading_archive = True
+        try:
+            return self.filter_queryset(self.get_queryset())
+        finally:
+            self.reading_archive = False
+
+    def get_archived_object(self):
+        """The archived row a detail URL points to, as its hot model (read only)"""
+        self.reading_archive = True
+        try:
+            return archive.as_hot(self.get_object())
+        finally:
+            self.reading_archive = False
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        fiscal_year = request.query_params.get('fiscal_year')
+        if (
+            fiscal_year and response.status_code == status.HTTP_200_OK
+            and isinstance(response.data, list) and archive.is_archived(fiscal_year)
+        ):
+            queryset = self.get_archived_queryset()
+            values_serializer_class = getattr(self, 'values_serializer_class', None)
+            if values_serializer_class is not None:
+                archived = values_serializer_class(queryset, context=self.get_serializer_context()).data
+            else:
+                rows = [archive.as_hot(row) for row in queryset.prefetch_related(*self.archive_prefetch)]
+                archived = self.get_serializer(rows, many=True).data
+            response.data = list(response.data) + list(archived)
+        return response
+
+class IdempotentCreateMixin:
+    """Creates sent with an Idempotency-Key run once; retries replay the first response"""
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+# Serializer used to return the current state of a row in a 409 response
+VERSIONED_SERIALIZERS = {
+    Plan: PlanSerializer,
+    StrategicInitiative: StrategicInitiativeSerializer,
+    PerformanceMeasure: PerformanceMeasureSerializer,
+    MainActivity: MainActivitySerializer,
+    ActivityBudget: ActivityBudgetSerializer,
+}
+
+def parse_if_match(request):
+    """Version from an If-Match header ("3", W/"3" or 3), or None when absent or *"""
+    value = request.headers.get('If-Match', '').strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    value = value.strip('"')
+    if not value or value == '*':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ParseError('If-Match must be a version returned in an ETag')
+
+class VersionedMixin:
+    """
+    Optimistic concurrency for versioned models. Writes are checked against
+    the version the client read, sent as If-Match or as the `version` field,
+    and fail with 409 and the row's current state if it has changed since.
+    Detail and create responses carry the version as their ETag.
+    """
+
+    def get_object(self):
+        instance = super().get_object()
+        if self.request.method in ('PUT', 'PATCH', 'POST'):
+            version = parse_if_match(self.request)
+            if version is not None:
+                instance.version = version
+        return instance
+
+    def handle_exception(self, exc):
+        if isinstance(exc, VersionConflict):
+            return version_conflict_response(exc, self.get_serializer_context())
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            self.action in ('create', 'retrieve', 'update', 'partial_update')
+            and response.status_code in (status.HTTP_200_OK, status.HTTP_201_CREATED)
+            and isinstance(response.data, dict) and 'version' in response.data
+        ):
+            response['ETag'] = f'"{response.data["version"]}"'
+        return super().finalize_response(request, response, *args, **kwargs)
+
+def version_conflict_response(exc, context=None):
+    model = type(exc.instance)
+    current = model.objects.filter(pk=exc.instance.pk).first()
+    if current is None:
+        return Response({'detail': 'This record has been deleted'}, status=status.HTTP_404_NOT_FOUND)
+    response = Response({
+        'detail': 'This record was changed by someone else. Reload it and apply your changes again.',
+        'current': VERSIONED_SERIALIZERS[model](current, context=context).data
+    }, status=status.HTTP_409_CONFLICT)
+    response['ETag'] = f'"{current.version}"'
+    return response
+
+class OrganizationViewSet(IdempotentCreateMixin, DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = Organization.objects.all()
     serializer_class = OrganizationSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -125,11 +470,12 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(orgs, many=True)
         return Response(serializer.data)
 
-class StrategicObjectiveViewSet(viewsets.ModelViewSet):
+class StrategicObjectiveViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = StrategicObjective.objects.all()
     serializer_class = StrategicObjectiveSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         user_orgs = OrganizationUser.objects.filter(user=request.user, role='PLANNER')
         if not user_orgs.exists():
@@ -199,11 +545,12 @@ class StrategicObjectiveViewSet(viewsets.ModelViewSet):
             'message': 'The sum of all strategic objectives weights is exactly 100%.'
         })
 
-class ProgramViewSet(viewsets.ModelViewSet):
+class ProgramViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = Program.objects.all()
     serializer_class = ProgramSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         user_orgs = OrganizationUser.objects.filter(user=request.user, role='PLANNER')
         if not user_orgs.exists():
@@ -267,11 +614,12 @@ class ProgramViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.data)
 
-class SubProgramViewSet(viewsets.ModelViewSet):
+class SubProgramViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = SubProgram.objects.all()
     serializer_class = SubProgramSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         user_orgs = OrganizationUser.objects.filter(user=request.user, role='PLANNER')
         if not user_orgs.exists():
@@ -337,13 +685,16 @@ class SubProgramViewSet(viewsets.ModelViewSet):
 
 
     
-class StrategicInitiativeViewSet(viewsets.ModelViewSet):
+class StrategicInitiativeViewSet(IdempotentCreateMixin, VersionedMixin, ArchiveReadMixin, DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = StrategicInitiative.objects.all()
     serializer_class = StrategicInitiativeSerializer
+    # What the serializer's nested measures and activities (with budgets) read
+    nested_prefetch = ('performance_measures', 'main_activities__budget')
+    archive_prefetch = nested_prefetch
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().prefetch_related(*self.nested_prefetch)
         
         # Filter by parent (objective, program, or subprogram)
         objective_id = self.request.query_params.get('objective')
@@ -351,12 +702,23 @@ class StrategicInitiativeViewSet(viewsets.ModelViewSet):
         subprogram_id = self.request.query_params.get('subprogram')
         created_date = self.request.query_params.get('created_date')
         
+        fiscal_year = self.request.query_params.get('fiscal_year')
+        
         if objective_id:
             queryset = queryset.filter(strategic_objective_id=objective_id)
         elif program_id:
             queryset = queryset.filter(program_id=program_id)
         elif subprogram_id:
             queryset = queryset.filter(subprogram_id=subprogram_id)
+
+        # Once a parent's initiatives were rolled over, its rows span several
+        # years: without ?fiscal_year= show the latest one, not all of them
+        if not fiscal_year and any([objective_id, program_id, subprogram_id]):
+            fiscal_year = queryset.aggregate(latest=Max('fiscal_year'))['latest']
+
+        # Initiatives without a fiscal year belong to every year not rolled over into
+        if fiscal_year:
+            queryset = queryset.filter(fiscal_year_filter(fiscal_year))
             
         # Filter by creation date if provided
         if created_date:
@@ -366,10 +728,13 @@ class StrategicInitiativeViewSet(viewsets.ModelViewSet):
                     # Create a date range for the entire day
                     date_start = datetime.datetime.combine(date_obj, datetime.time.min)
                     date_end = datetime.datetime.combine(date_obj, datetime.time.max)
-                    print(f"Filtering by date range: {date_start} to {date_end}")
+                    logger.debug(
+                        'Filtering initiatives by creation date',
+                        extra={'date_start': date_start, 'date_end': date_end, 'sample_rate': 0.1}
+                    )
                     queryset = queryset.filter(created_at__range=(date_start, date_end))
             except Exception as e:
-                print(f"Error parsing date: {e}")
+                logger.warning('Ignoring invalid created_date filter', extra={'created_date': created_date, 'error': str(e)})
             
         return queryset
 
@@ -412,9 +777,10 @@ class StrategicInitiativeViewSet(viewsets.ModelViewSet):
         
         return Response(initiative_data)
     
-class PerformanceMeasureViewSet(viewsets.ModelViewSet):
+class PerformanceMeasureViewSet(VersionedMixin, DeltaSyncMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = PerformanceMeasure.objects.all()
     serializer_class = PerformanceMeasureSerializer
+    values_serializer_class = PerformanceMeasureValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -423,6 +789,7 @@ class PerformanceMeasureViewSet(viewsets.ModelViewSet):
             return self.queryset.filter(initiative_id=initiative_id)
         return self.queryset
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         user_orgs = OrganizationUser.objects.filter(user=request.user, role='PLANNER')
         if not user_orgs.exists():
@@ -507,9 +874,10 @@ class PerformanceMeasureViewSet(viewsets.ModelViewSet):
             'is_valid': total_weight == Decimal('35')
         })
 
-class MainActivityViewSet(viewsets.ModelViewSet):
+class MainActivityViewSet(IdempotentCreateMixin, VersionedMixin, DeltaSyncMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = MainActivity.objects.all()
     serializer_class = MainActivitySerializer
+    values_serializer_class = MainActivityValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -517,9 +885,55 @@ class MainActivityViewSet(viewsets.ModelViewSet):
         initiative_id = self.request.query_params.get('initiative', None)
         if initiative_id:
             queryset = queryset.filter(initiative_id=initiative_id)
+
+        # Filter by schedule using the bitmask columns (accepts JUL..JUN or Ethiopian month names)
+        month = self.request.query_params.get('month')
+        quarter = self.request.query_params.get('quarter')
+        if month:
+            month = normalize_month(month)
+            if month is None:
+                return queryset.none()
+            queryset = queryset.filter(MainActivity.running_in_month(month))
+        if quarter:
+            quarter = quarter.upper()
+            if quarter not in FISCAL_QUARTERS:
+                return queryset.none()
+            queryset = queryset.filter(MainActivity.running_in_quarter(quarter))
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Activity count and estimated budget per fiscal month and quarter,
+        optionally limited to the plans of an organization and/or fiscal year.
+        Budgets are counted in full in every period an activity runs in.
+        """
+        activities = filter_by_plan_scope(self.get_queryset(), request.query_params, 'initiative__')
+
+        periods = [(month, MainActivity.running_in_month(month)) for month in FISCAL_MONTHS]
+        periods += [(quarter, MainActivity.running_in_quarter(quarter)) for quarter in FISCAL_QUARTERS]
+
+        cost = ActivityBudget.estimated_cost_expression(prefix='budget__')
+        aggregates = {}
+        for period, condition in periods:
+            aggregates[f'{period}_count'] = Count('id', filter=condition)
+            aggregates[f'{period}_budget'] = Sum(cost, filter=condition)
+        totals = activities.aggregate(**aggregates)
+
+        def period_data(key, period):
+            return {
+                key: period,
+                'activity_count': totals[f'{period}_count'],
+                'total_budget': float(totals[f'{period}_budget'] or 0),
+            }
+
+        return Response({
+            'months': [period_data('month', month) for month in FISCAL_MONTHS],
+            'quarters': [period_data('quarter', quarter) for quarter in FISCAL_QUARTERS],
+        })
+
     @action(detail=True, methods=['post'])
+    @idempotent
     def update_budget(self, request, pk=None):
         """Update or create a budget for an activity"""
         activity = self.get_object()
@@ -527,6 +941,11 @@ class MainActivityViewSet(viewsets.ModelViewSet):
         try:
             # Get or create budget
             budget, created = ActivityBudget.objects.get_or_create(activity=activity)
+
+            # If-Match is the budget's version (the row saved here), not the activity's
+            version = parse_if_match(request)
+            if version is not None:
+                budget.version = version
             
             # Update budget with request data
             serializer = ActivityBudgetSerializer(budget, data=request.data, partial=True)
@@ -541,6 +960,8 @@ class MainActivityViewSet(viewsets.ModelViewSet):
             
             return Response(response_data)
             
+        except VersionConflict:
+            raise
         except ValidationError as e:
             return Response(
                 {'detail': str(e)},
@@ -627,8 +1048,16 @@ class MainActivityViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class ActivityBudgetViewSet(viewsets.ModelViewSet):
-    queryset = ActivityBudget.objects.all()
+def parse_as_of(value):
+    """The date of an as_of parameter, or None if it is not a valid YYYY-MM-DD date"""
+    try:
+        return parse_date(str(value))
+    except ValueError:
+        return None
+
+class ActivityBudgetViewSet(IdempotentCreateMixin, VersionedMixin, DeltaSyncMixin, viewsets.ModelViewSet):
+    # activity_name reads the activity
+    queryset = ActivityBudget.objects.select_related('activity')
     serializer_class = ActivityBudgetSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -638,7 +1067,113 @@ class ActivityBudgetViewSet(viewsets.ModelViewSet):
             return self.queryset.filter(activity_id=activity_id)
         return self.queryset
 
-class ActivityCostingAssumptionViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['POST'])
+    def scenario(self, request):
+        """
+        Reprice the tool-based budgets of the admin's organizations under rate
+        overrides, without saving.
+        Body: {"overrides": [{"cost_type": "per_diem", "location": "Adama", "amount": 1300}],
+        "organization": ..., "fiscal_year": ..., "as_of": "YYYY-MM-DD"} (all but overrides
+        optional; the overrides apply on top of the rates in effect on as_of, default today)
+        """
+        organization_ids = list(OrganizationUser.objects.filter(
+            user=request.user, role='ADMIN'
+        ).values_list('organization_id', flat=True))
+        if not organization_ids:
+            return Response(
+                {'detail': 'Only admins can run costing scenarios'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        organization = request.data.get('organization')
+        if organization:
+            if str(organization) not in {str(organization_id) for organization_id in organization_ids}:
+                return Response(
+                    {'detail': 'You can only run costing scenarios for your own organizations'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            organization_ids = [int(organization)]
+
+        try:
+            overrides = scenarios.parse_overrides(request.data.get('overrides'))
+        except ValidationError as e:
+            return Response(
+                {'detail': ' '.join(e.messages)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        as_of = request.data.get('as_of')
+        as_of_date = parse_as_of(as_of) if as_of else None
+        if as_of and as_of_date is None:
+            return Response(
+                {'detail': 'as_of must be a date (YYYY-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        plans = Plan.objects.filter(organization__in=organization_ids)
+        if request.data.get('fiscal_year'):
+            plans = plans.filter(fiscal_year=request.data['fiscal_year'])
+        budgets = ActivityBudget.objects.filter(
+            objective_filter(plans.values('strategic_objective'), prefix='activity__initiative__')
+        )
+        return Response(scenarios.run_scenario(overrides, budgets, as_of_date, organization_ids))
+
+class BudgetLineItemViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = BudgetLineItem.objects.all()
+    serializer_class = BudgetLineItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    # Dimensions the summary can be grouped by, mapped to their lookups
+    GROUP_BY_LOOKUPS = {
+        'cost_type': 'cost_type',
+        'location': 'location',
+        'activity_type': 'budget__activity_type',
+    }
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = filter_by_plan_scope(self.queryset, params, 'budget__activity__initiative__')
+
+        filters = {
+            'budget': 'budget_id',
+            'activity': 'budget__activity_id',
+            'cost_type': 'cost_type',
+            'location': 'location',
+            'activity_type': 'budget__activity_type',
+        }
+        for param, lookup in filters.items():
+            value = params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: value})
+        return queryset
+
+    @action(detail=False, methods=['GET'])
+    def summary(self, request):
+        """Total amount and quantity of line items grouped by one dimension"""
+        group_by = request.query_params.get('group_by', 'cost_type')
+        lookup = self.GROUP_BY_LOOKUPS.get(group_by)
+        if lookup is None:
+            return Response(
+                {'detail': f"group_by must be one of: {', '.join(self.GROUP_BY_LOOKUPS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = self.get_queryset().values(lookup).annotate(
+            total_amount=Sum('amount'),
+            total_quantity=Sum('quantity'),
+            line_items=Count('id')
+        ).order_by(lookup)
+
+        return Response([
+            {
+                group_by: row[lookup],
+                'total_amount': float(row['total_amount'] or 0),
+                'total_quantity': float(row['total_quantity'] or 0),
+                'line_items': row['line_items'],
+            }
+            for row in rows
+        ])
+
+class ActivityCostingAssumptionViewSet(IdempotentCreateMixin, DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = ActivityCostingAssumption.objects.all()
     serializer_class = ActivityCostingAssumptionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -653,12 +1188,44 @@ class ActivityCostingAssumptionViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(activity_type=activity_type)
         if location:
             queryset = queryset.filter(location=location)
+
+        # Only the version of each rate in effect on ?as_of=, by default
+        # today's in lists; ?history=1 lists every version
+        as_of = self.request.query_params.get('as_of')
+        history = str(self.request.query_params.get('history', '')).lower() in ('1', 'true', 'yes')
+        as_of_date = None
+        if as_of:
+            as_of_date = parse_as_of(as_of)
+            if as_of_date is None:
+                raise ParseError('as_of must be a date (YYYY-MM-DD)')
+        elif self.action == 'list' and not history:
+            as_of_date = timezone.localdate()
+        if as_of_date is not None:
+            later_versions = ActivityCostingAssumption.objects.filter(
+                activity_type=OuterRef('activity_type'),
+                location=OuterRef('location'),
+                cost_type=OuterRef('cost_type'),
+                effective_from__gt=OuterRef('effective_from'),
+                effective_from__lte=as_of_date
+            )
+            queryset = queryset.filter(effective_from__lte=as_of_date).exclude(Exists(later_versions))
             
         return queryset
 
-class PlanViewSet(viewsets.ModelViewSet):
+    def handle_exception(self, exc):
+        # Rates in effect are immutable and versions cannot start in the past
+        # (see ActivityCostingAssumption.clean)
+        if isinstance(exc, ValidationError):
+            return Response(
+                {'detail': ' '.join(exc.messages)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().handle_exception(exc)
+
+class PlanViewSet(IdempotentCreateMixin, VersionedMixin, ArchiveReadMixin, DeltaSyncMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Plan.objects.all().order_by('-updated_at')
     serializer_class = PlanSerializer
+    values_serializer_class = PlanValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -671,6 +1238,7 @@ class PlanViewSet(viewsets.ModelViewSet):
         # Get query parameters
         status_filter = self.request.query_params.get('status')
         organization_filter = self.request.query_params.get('organization')
+        fiscal_year = self.request.query_params.get('fiscal_year')
         
         # Base queryset
         queryset = super().get_queryset()
@@ -704,6 +1272,10 @@ class PlanViewSet(viewsets.ModelViewSet):
         # Apply organization filter if provided
         if organization_filter:
             queryset = queryset.filter(organization=organization_filter)
+
+        # Archived years are added by ArchiveReadMixin.list()
+        if fiscal_year:
+            queryset = queryset.filter(fiscal_year=fiscal_year)
         
         return queryset
 
@@ -721,53 +1293,61 @@ class PlanViewSet(viewsets.ModelViewSet):
 
     def retrieve(self, request, *args, **kwargs):
         """Retrieve a plan with its related data"""
-        instance = self.get_object()
+        try:
+            instance = self.get_object()
+            archived = False
+        except Http404:
+            # Plans of archived fiscal years are still readable
+            instance = self.get_archived_object()
+            archived = True
         serializer = self.get_serializer(instance)
         data = serializer.data
+        data['archived'] = archived
         
         # Load related objectives data
-        if instance.strategic_objective:
+        if instance.strategic_objective_id:
             try:
-                # Get the objective data
-                objective = StrategicObjective.objects.get(id=instance.strategic_objective)
-                objective_serializer = StrategicObjectiveSerializer(objective)
-                objective_data = objective_serializer.data
-                
-                # Get related initiatives and their performance measures & activities
-                initiatives = StrategicInitiative.objects.filter(strategic_objective=objective)
-                initiative_data = []
-                
-                for initiative in initiatives:
-                    initiative_serializer = StrategicInitiativeSerializer(initiative)
-                    initiative_item = initiative_serializer.data
-                    
-                    # Get performance measures
-                    performance_measures = PerformanceMeasure.objects.filter(initiative=initiative)
-                    initiative_item['performance_measures'] = PerformanceMeasureSerializer(performance_measures, many=True).data
-                    
-                    # Get main activities with their budgets
-                    main_activities = MainActivity.objects.filter(initiative=initiative)
-                    initiative_item['main_activities'] = MainActivitySerializer(main_activities, many=True).data
-                    
-                    initiative_data.append(initiative_item)
-                    
-                objective_data['initiatives'] = initiative_data
+                # Get the objective with its initiatives, their performance measures & activities
+                objective = instance.strategic_objective
+                objective_data = StrategicObjectiveSerializer(objective).data
+                # Only the plan's fiscal year, as in Plan.initiatives()
+                initiatives = list(objective.initiatives.filter(
+                    fiscal_year_filter(instance.fiscal_year)
+                ).prefetch_related(*StrategicInitiativeViewSet.nested_prefetch))
+                if archived:
+                    # The plan's year was archived with its initiatives, measures and
+                    # activities, including copies taking undated initiatives' place
+                    archived_initiatives = [
+                        archive.as_hot(initiative) for initiative in ArchivedStrategicInitiative.objects.filter(
+                            strategic_objective=objective, fiscal_year=instance.fiscal_year
+                        ).prefetch_related(*StrategicInitiativeViewSet.archive_prefetch)
+                    ]
+                    rolled_over = {initiative.rolled_over_from_id for initiative in archived_initiatives}
+                    initiatives = [
+                        initiative for initiative in initiatives if initiative.pk not in rolled_over
+                    ] + archived_initiatives
+                    initiatives.sort(key=lambda initiative: initiative.pk)
+                objective_data['initiatives'] = StrategicInitiativeSerializer(initiatives, many=True).data
                 data['objectives'] = [objective_data]
-            except Exception as e:
-                print(f"Error loading objective data: {e}")
+            except Exception:
+                logger.exception('Error loading objective data', extra={'plan_id': instance.id})
                 data['objectives'] = []
             
         # Load plan reviews
         try:
-            reviews = PlanReview.objects.filter(plan=instance)
+            if archived:
+                reviews = [archive.as_hot(review) for review in ArchivedPlanReview.objects.filter(plan_id=instance.id)]
+            else:
+                reviews = PlanReview.objects.filter(plan=instance)
             data['reviews'] = PlanReviewSerializer(reviews, many=True).data
-        except Exception as e:
-            print(f"Error loading plan reviews: {e}")
+        except Exception:
+            logger.exception('Error loading plan reviews', extra={'plan_id': instance.id})
             data['reviews'] = []
             
         return Response(data)
 
     @action(detail=True, methods=['POST'])
+    @idempotent
     def submit(self, request, pk=None):
         """Submit a plan for review"""
         plan = self.get_object()
@@ -787,17 +1367,178 @@ class PlanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
+        # Every weight and funding rule must hold before review
+        report = validate_plan(plan)
+        if not report['is_ready']:
+            return Response(
+                {'detail': 'Plan is not ready for submission', 'report': report},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         # Update plan status and submitted date
         plan.status = 'SUBMITTED'
         plan.submitted_at = timezone.now()
-        plan.save()
+        with transaction.atomic():
+            plan.save()
+            revisions.record_revision(plan, request.user, 'SUBMITTED')
         
         return Response({
             'detail': 'Plan submitted successfully',
             'status': plan.status
         })
         
+    @action(detail=True, methods=['GET'])
+    def readiness(self, request, pk=None):
+        """Every weight and funding rule the plan breaks, as checked on submit"""
+        return Response(validate_plan(self.get_object()))
+
+    @action(detail=False, methods=['GET'])
+    def readiness_report(self, request):
+        """Readiness of every plan visible to the user (filters as in the list, e.g. ?organization=)"""
+        reports = validate_plans(self.get_queryset())
+        return Response({
+            'ready': sum(1 for report in reports if report['is_ready']),
+            'not_ready': sum(1 for report in reports if not report['is_ready']),
+            'plans': reports,
+        })
+
+    @action(detail=False, methods=['POST'], url_path='import')
+    def import_rows(self, request):
+        """
+        Import initiatives, performance measures and main activities from an
+        uploaded CSV/XLSX file. With dry_run, only validate. Nothing is written
+        if any row is invalid; every error is returned with its row number.
+        """
+        # Only planners can import plans
+        if not OrganizationUser.objects.filter(user=request.user, role='PLANNER').exists():
+            return Response(
+                {'detail': 'Only planners can import plans'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'detail': 'File is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            errors, counts = import_plan(upload, request.data.get('fiscal_year'), dry_run)
+        except ValidationError as e:
+            return Response(
+                {'detail': ' '.join(e.messages)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = {'dry_run': dry_run, 'errors': errors, 'counts': counts}
+        if errors:
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['GET'])
+    def revisions(self, request, pk=None):
+        """List a plan's revisions, or return one in full with ?number="""
+        plan = self.get_object()
+
+        number = request.query_params.get('number')
+        if number:
+            try:
+                return Response(revisions.reconstruct(plan, int(number)))
+            except (ValueError, PlanRevision.DoesNotExist):
+                return Response(
+                    {'detail': 'Revision not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+        history = plan.revisions.order_by('number').values(
+            'number', 'is_checkpoint', 'reason', 'created_at', 'created_by__username'
+        )
+        return Response([
+            {
+                'number': revision['number'],
+                'is_checkpoint': revision['is_checkpoint'],
+                'reason': revision['reason'],
+                'created_at': revision['created_at'],
+                'created_by': revision['created_by__username'],
+            }
+            for revision in history
+        ])
+
+    @action(detail=True, methods=['GET'])
+    def revision_diff(self, request, pk=None):
+        """
+        Changes between two revisions (?from=&to=), defaulting to the last
+        two, e.g. what changed between a rejection and the resubmission
+        """
+        plan = self.get_object()
+        numbers = list(plan.revisions.order_by('-number').values_list('number', flat=True)[:2])
+        if not numbers:
+            return Response(
+                {'detail': 'Plan has no revisions'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            to_number = int(request.query_params.get('to', numbers[0]))
+            from_number = int(request.query_params.get('from', numbers[-1]))
+            old = revisions.reconstruct(plan, from_number)
+            new = revisions.reconstruct(plan, to_number)
+        except (ValueError, PlanRevision.DoesNotExist):
+            return Response(
+                {'detail': 'Revision not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response({
+            'from': from_number,
+            'to': to_number,
+            'changes': revisions.diff(old, new)
+        })
+
     @action(detail=True, methods=['POST'])
+    def rollover(self, request, pk=None):
+        """Clone a plan and its initiatives, measures, activities and budgets into a new fiscal year"""
+        plan = self.get_object()
+
+        # Only planners can roll plans over
+        if not OrganizationUser.objects.filter(user=request.user, role='PLANNER').exists():
+            return Response(
+                {'detail': 'Only planners can roll over plans'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        fiscal_year = request.data.get('fiscal_year')
+        if not fiscal_year:
+            return Response(
+                {'detail': 'Fiscal year is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        from_date = request.data.get('from_date')
+        to_date = request.data.get('to_date')
+        from_date = parse_date(from_date) if from_date else None
+        to_date = parse_date(to_date) if to_date else None
+
+        user = request.user
+        try:
+            new_plan, counts = rollover_plan(
+                plan, str(fiscal_year), from_date, to_date,
+                planner_name=user.first_name if user.first_name else user.username
+            )
+        except ValidationError as e:
+            return Response(
+                {'detail': ' '.join(e.messages)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = self.get_serializer(new_plan).data
+        data['cloned'] = counts
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['POST'])
+    @idempotent
     def approve(self, request, pk=None):
         """Approve a submitted plan"""
         plan = self.get_object()
@@ -817,21 +1558,23 @@ class PlanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        # Create review record
+        # Review details
         feedback = request.data.get('feedback', '')
         evaluator = user_orgs.first()
         
-        review = PlanReview.objects.create(
-            plan=plan,
-            evaluator=evaluator,
-            status='APPROVED',
-            feedback=feedback,
-            reviewed_at=timezone.now()
-        )
-            
-        # Update plan status
-        plan.status = 'APPROVED'
-        plan.save()
+        # Update plan status first, so a stale If-Match fails before the
+        # review is written, and roll all three writes back together
+        with transaction.atomic():
+            plan.status = 'APPROVED'
+            plan.save()
+            review = PlanReview.objects.create(
+                plan=plan,
+                evaluator=evaluator,
+                status='APPROVED',
+                feedback=feedback,
+                reviewed_at=timezone.now()
+            )
+            revisions.record_revision(plan, request.user, 'APPROVED')
         
         return Response({
             'detail': 'Plan approved successfully',
@@ -839,7 +1582,56 @@ class PlanViewSet(viewsets.ModelViewSet):
             'review_id': review.id
         })
         
+    @action(detail=False, methods=['POST'])
+    def bulk_review(self, request):
+        """
+        Approve or reject many submitted plans at once. Body:
+        {"plans": [ids], "status": "APPROVED" | "REJECTED", "feedback": "..."}
+        Returns an outcome per plan; plans that fail their checks are left unchanged.
+        """
+        # Only evaluators can review plans
+        user_orgs = OrganizationUser.objects.filter(user=request.user, role='EVALUATOR')
+        if not user_orgs.exists():
+            return Response(
+                {'detail': 'Only evaluators can review plans'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        decision = request.data.get('status')
+        if decision not in ('APPROVED', 'REJECTED'):
+            return Response(
+                {'detail': 'Status must be APPROVED or REJECTED'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        feedback = request.data.get('feedback', '')
+        if decision == 'REJECTED' and not feedback:
+            return Response(
+                {'detail': 'Feedback is required when rejecting a plan'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        plan_ids = request.data.get('plans')
+        try:
+            plan_ids = [int(plan_id) for plan_id in plan_ids]
+        except (TypeError, ValueError):
+            plan_ids = None
+        if not plan_ids or len(plan_ids) > MAX_REVIEWED_PLANS:
+            return Response(
+                {'detail': f'Plans must be a list of 1 to {MAX_REVIEWED_PLANS} plan ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        evaluators = {evaluator.organization_id: evaluator for evaluator in user_orgs}
+        outcomes = bulk_review(self.get_queryset(), plan_ids, decision, feedback, evaluators, request.user)
+        return Response({
+            'reviewed': sum(1 for outcome in outcomes if outcome['ok']),
+            'failed': sum(1 for outcome in outcomes if not outcome['ok']),
+            'results': outcomes
+        })
+
     @action(detail=True, methods=['POST'])
+    @idempotent
     def reject(self, request, pk=None):
         """Reject a submitted plan"""
         plan = self.get_object()
@@ -867,20 +1659,22 @@ class PlanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        # Create review record
+        # Review details
         evaluator = user_orgs.first()
         
-        review = PlanReview.objects.create(
-            plan=plan,
-            evaluator=evaluator,
-            status='REJECTED',
-            feedback=feedback,
-            reviewed_at=timezone.now()
-        )
-            
-        # Update plan status
-        plan.status = 'REJECTED'
-        plan.save()
+        # Update plan status first, so a stale If-Match fails before the
+        # review is written, and roll all three writes back together
+        with transaction.atomic():
+            plan.status = 'REJECTED'
+            plan.save()
+            review = PlanReview.objects.create(
+                plan=plan,
+                evaluator=evaluator,
+                status='REJECTED',
+                feedback=feedback,
+                reviewed_at=timezone.now()
+            )
+            revisions.record_revision(plan, request.user, 'REJECTED')
         
         return Response({
             'detail': 'Plan rejected successfully',
@@ -888,7 +1682,7 @@ class PlanViewSet(viewsets.ModelViewSet):
             'review_id': review.id
         })
 
-class PlanReviewViewSet(viewsets.ModelViewSet):
+class PlanReviewViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     queryset = PlanReview.objects.all().order_by('-reviewed_at')
     serializer_class = PlanReviewSerializer
     permission_classes = [permissions.IsAuthenticated]